@@ -1,8 +1,15 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g, Response, stream_with_context
 from extractor import ProductExtractor
 from database import Database
 from metrics import Evaluator
-from batch_processor import BatchProcessor
+from jobs import JobManager
+from events import EventBroker, format_event
+from result_cache import ResultCache
+from url_utils import normalize_url
+from timings import registry, SamplingProfiler
+from collections import deque
+import itertools
+import time
 import os
 from config import Config
 
@@ -10,13 +17,85 @@ app = Flask(__name__)
 config = Config()
 
 # Пути к файлам
-database_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database')
-os.makedirs(database_dir, exist_ok=True)
-database_path = os.path.join(database_dir, 'products.db')
+os.makedirs(os.path.dirname(config.DATABASE_PATH), exist_ok=True)
 
 # Инициализация
 extractor = ProductExtractor()
-db = Database(database_path)
+db = Database(config.DATABASE_PATH)
+
+# Недавние результаты /extract; одновременные запросы одного URL выполняются один раз
+extract_cache = ResultCache()
+
+# События для открытых панелей: новые данные и прогресс задач вместо периодических запросов
+events = EventBroker()
+
+# Фоновые задачи; прерванные перезапуском подхватываются при старте
+jobs = JobManager(db, on_change=lambda job: events.publish('job', job))
+jobs.start()
+
+# Ответы /stats и /recent для последней версии данных: запросы к базе выполняются
+# один раз на версию, сколько бы панелей ни было открыто
+versioned_responses = {}
+
+def get_versioned(name, version, build):
+    cached = versioned_responses.get(name)
+    if cached is None or cached[0] != version:
+        cached = versioned_responses[name] = (version, build())
+    return cached[1]
+
+def dashboard_data(version):
+    """Данные панели для версии данных version"""
+    return {
+        'version': version,
+        'stats': get_versioned('stats', version, db.get_products_stats),
+        'recent': get_versioned('recent', version, lambda: db.get_recent_urls(10))
+    }
+
+def versioned_json(name, build):
+    """JSON с ETag по версии данных; 304 без запросов к базе, если у клиента та же версия"""
+    version = db.get_data_version()
+    etag = f'v{version}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(get_versioned(name, version, build))
+    response.set_etag(etag)
+    # Браузер хранит ответ, но перед использованием проверяет версию
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+events.watch(db.get_data_version, dashboard_data)
+
+# Последние профили запросов с ?profile=1
+recent_profiles = deque(maxlen=Config.PROFILES_KEPT)
+profile_ids = itertools.count(1)
+
+@app.before_request
+def start_request_timer():
+    g.started_at = time.perf_counter()
+    g.profiler = None
+    if Config.PROFILER_ENABLED and request.args.get('profile') == '1':
+        g.profiler = SamplingProfiler().start()
+
+@app.after_request
+def stop_request_timer(response):
+    started_at = g.get('started_at')
+    if started_at is not None:
+        registry.observe(f'request.{request.endpoint or "unknown"}', time.perf_counter() - started_at)
+    
+    if g.get('profiler') is not None:
+        g.profile_id = next(profile_ids)
+        response.headers['X-Profile-Id'] = str(g.profile_id)
+    return response
+
+@app.teardown_request
+def stop_request_profiler(error=None):
+    # after_request не вызывается, если обработчик упал с исключением,
+    # а поток профилировщика нужно остановить в любом случае
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profile_id = g.get('profile_id') or next(profile_ids)
+        recent_profiles.append({'id': profile_id, 'path': request.full_path, **profiler.stop().report()})
 
 @app.route('/')
 def index():
@@ -38,12 +117,22 @@ def extract_products():
     if not url.startswith(('http://', 'https://')):
         url = 'https://' + url
     
-    try:
+    def extract_and_save():
         # Извлекаем продукты с таймаутом
-        products = extractor.extract_products(url)
+        try:
+            products = extractor.extract_products(url)
+        except Exception as e:
+            # Ошибку записывает только этот запрос, а не каждый присоединившийся к нему
+            db.save_error(url, str(e))
+            raise
         
         # Сохраняем в базу
         db.save_products(url, products)
+        return products
+    
+    try:
+        # Повторные и одновременные запросы того же URL не скачивают и не сохраняют страницу заново
+        products = extract_cache.get_or_compute(normalize_url(url), extract_and_save)
         
         return jsonify({
             'success': True,
@@ -53,7 +142,6 @@ def extract_products():
     except Exception as e:
         # Обработка ошибок и информативное сообщение
         error_message = str(e)
-        db.save_error(url, error_message)
         
         # Формируем понятное сообщение об ошибке
         if 'timeout' in error_message.lower():
@@ -71,14 +159,60 @@ def extract_products():
 @app.route('/stats')
 def get_stats():
     """API для получения статистики"""
-    stats = db.get_products_stats()
-    return jsonify(stats)
+    return versioned_json('stats', db.get_products_stats)
 
 @app.route('/recent')
 def get_recent():
     """API для получения недавних URL"""
-    recent = db.get_recent_urls(10)
-    return jsonify(recent)
+    return versioned_json('recent', lambda: db.get_recent_urls(10))
+
+@app.route('/events')
+def stream_events():
+    """Поток Server-Sent Events: данные панели ('data') и прогресс задач ('job')"""
+    subscriber = events.subscribe()
+    if subscriber is None:
+        return jsonify({'error': 'Слишком много подключений', 'success': False}), 503
+    
+    try:
+        # Новый клиент сразу получает текущие данные, в том числе после переподключения
+        subscriber.put_nowait(format_event('data', dashboard_data(db.get_data_version())))
+    except Exception:
+        events.unsubscribe(subscriber)
+        raise
+    
+    response = Response(stream_with_context(events.stream(subscriber)), mimetype='text/event-stream')
+    # Клиент может отключиться до первого чтения потока, и тогда finally в stream
+    # не выполнится; отписка при закрытии ответа срабатывает в любом случае
+    response.call_on_close(lambda: events.unsubscribe(subscriber))
+    response.headers['Cache-Control'] = 'no-cache'
+    # Без буферизации в nginx события доходят сразу
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/search')
+def search_products():
+    """API для полнотекстового поиска товаров по названию"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Поисковый запрос не указан', 'success': False}), 400
+    
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = min(max(1, request.args.get('per_page', config.SEARCH_PAGE_SIZE, type=int)),
+                   config.SEARCH_MAX_PAGE_SIZE)
+    
+    # На одну строку больше страницы, чтобы узнать, есть ли следующая
+    results = db.search_products(query, limit=per_page + 1, offset=(page - 1) * per_page)
+    
+    return jsonify({
+        'success': True,
+        'query': query,
+        'page': page,
+        'per_page': per_page,
+        'has_more': len(results) > per_page,
+        # Ранжируются и листаются только столько самых новых совпадений
+        'max_results': config.SEARCH_MAX_CANDIDATES,
+        'results': results[:per_page]
+    })
 
 @app.route('/batch', methods=['POST'])
 def run_batch_processing():
@@ -87,25 +221,38 @@ def run_batch_processing():
     batch_size = data.get('batch_size', config.BATCH_SIZE)
     start_index = data.get('start_index', 0)
     
-    processor = BatchProcessor(
-        url_file=config.URL_LIST_PATH,
-        database_path=config.DATABASE_PATH,
-        max_workers=config.MAX_WORKERS
-    )
-    
-    # Запускаем обработку в отдельном потоке
-    import threading
-    thread = threading.Thread(
-        target=processor.process_batch,
-        kwargs={'batch_size': batch_size, 'start_index': start_index}
-    )
-    thread.daemon = True
-    thread.start()
+    incremental = data.get('incremental', False)
+    
+    # Инкрементальный обход пропускает уже обработанные и свежие URL
+    job_type = 'recrawl' if incremental else 'batch'
+    job_id = jobs.submit(job_type, {'batch_size': batch_size, 'start_index': start_index})
+    
+    # Список URL читается потоково внутри задачи; общее число URL видно в прогрессе задачи
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'message': f'Запущена обработка {batch_size} URL начиная с индекса {start_index}'
+    })
+
+@app.route('/discover', methods=['POST'])
+def run_discovery():
+    """API для поиска URL товаров по sitemap и страницам каталога сайтов и их обработки"""
+    data = request.get_json()
+    domains = data.get('domains')
+    if not domains or not isinstance(domains, list):
+        return jsonify({'error': 'Список доменов не указан', 'success': False}), 400
+    
+    # Найденные URL идут во фронтир обхода, пакетная обработка берет их оттуда
+    job_id = jobs.submit('discover', {
+        'domains': domains,
+        'batch_size': data.get('batch_size'),
+        'incremental': data.get('incremental', False)
+    })
     
     return jsonify({
         'success': True,
-        'message': f'Запущена обработка {batch_size} URL начиная с индекса {start_index}',
-        'total_urls': len(processor.load_urls())
+        'job_id': job_id,
+        'message': f'Запущен поиск URL товаров на {len(domains)} сайтах'
     })
 
 @app.route('/metrics', methods=['GET'])
@@ -139,24 +286,53 @@ def create_test_set():
     data = request.get_json()
     sample_size = data.get('sample_size', 30)
     
-    processor = BatchProcessor(
-        url_file=config.URL_LIST_PATH,
-        database_path=config.DATABASE_PATH
-    )
-    
-    # Запускаем создание тестового набора в отдельном потоке
-    import threading
-    thread = threading.Thread(
-        target=processor.create_test_set,
-        kwargs={'sample_size': sample_size, 'output_file': config.TEST_SET_PATH}
-    )
-    thread.daemon = True
-    thread.start()
+    job_id = jobs.submit('test_set', {'sample_size': sample_size})
     
     return jsonify({
         'success': True,
+        'job_id': job_id,
         'message': f'Запущено создание тестового набора из {sample_size} URL'
     })
 
+@app.route('/jobs')
+def list_jobs():
+    """API для получения списка фоновых задач"""
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify(jobs.list(limit))
+
+@app.route('/jobs/<int:job_id>')
+def get_job(job_id):
+    """API для получения состояния и прогресса задачи"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Задача не найдена', 'success': False}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """API для отмены задачи"""
+    if not jobs.cancel(job_id):
+        return jsonify({'error': 'Задача не найдена или уже завершена', 'success': False}), 404
+    return jsonify({'success': True, 'job': jobs.get(job_id)})
+
+@app.route('/debug/timings')
+def debug_timings():
+    """API для получения замеров этапов, счетчиков и последних профилей запросов"""
+    snapshot = registry.snapshot()
+    snapshot['profiles'] = list(recent_profiles)
+    return jsonify(snapshot)
+
+@app.route('/debug/timings/reset', methods=['POST'])
+def reset_debug_timings():
+    """API для сброса замеров"""
+    registry.reset()
+    recent_profiles.clear()
+    return jsonify({'success': True})
+
+@app.route('/debug/prometheus')
+def debug_prometheus():
+    """Замеры в текстовом формате Prometheus"""
+    return Response(registry.prometheus(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
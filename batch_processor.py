@@ -1,39 +1,63 @@
-import pandas as pd
 from extractor import ProductExtractor
 from database import Database
+from config import Config
+from url_utils import normalize_url
+from url_source import iter_urls, sample_urls
+from pipeline import Pipeline
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from itertools import islice
+from datetime import datetime, timedelta
 import time
 import os
 import json
-import random
+import gzip
+import hashlib
 from tqdm import tqdm
 
 class BatchProcessor:
-    def __init__(self, url_file, database_path, max_workers=1):
+    def __init__(self, url_file, database_path, max_workers=1, cpu_workers=0, frontier=None):
         self.url_file = url_file
+        # С frontier URL берутся из фронтира обхода (см. discovery.py), а не из url_file
+        self.frontier = frontier
         self.database = Database(database_path)
         self.extractor = ProductExtractor()
-        self.max_workers = max_workers
+        self.max_workers = max(1, max_workers)
+        # С cpu_workers > 0 разбор страниц при пакетной обработке идет в отдельных процессах
+        self.cpu_workers = cpu_workers
+        self.skip_unchanged = Config.SKIP_UNCHANGED_PAGES
         
+    def close(self):
+        """Остановка HTTP-клиента, закрытие кеша страниц и соединений с базой"""
+        self.extractor.close()
+        self.database.close()
+    
     def load_urls(self):
-        """Загрузка URL из CSV-файла"""
+        """Загрузка всех URL из файла списком (пакетная обработка читает файл потоково)"""
         try:
-            df = pd.read_csv(self.url_file)
-            if 'max(page)' in df.columns:
-                urls = df['max(page)'].tolist()
-                return urls
-            else:
-                print(f"Ошибка: отсутствует колонка 'max(page)' в файле {self.url_file}")
-                return []
+            return list(self.iter_urls())
         except Exception as e:
             print(f"Ошибка при загрузке URL из {self.url_file}: {e}")
             return []
     
-    def process_url(self, url):
+    def iter_urls(self, start_index=0, batch_size=None):
+        """Ленивый поток нормализованных URL без повторов из .txt/.csv/.gz файла или фронтира"""
+        if self.frontier is not None:
+            # Фронтир сам помнит, что уже выдано, поэтому start_index не нужен
+            return self.frontier.iter_urls(limit=batch_size)
+        return iter_urls(self.url_file, start=start_index, limit=batch_size)
+    
+    def process_url(self, url, writer=None):
         """Обработка одного URL"""
+        # Результаты пишутся напрямую в базу или в буфер пакетной записи
+        writer = writer or self.database
         try:
             print(f"Обработка: {url}")
-            products = self.extractor.extract_products(url)
-            self.database.save_products(url, products)
+            products, digest = self.extractor.extract_url(url, self.known_hash(url))
+            if products is None:
+                writer.save_unchanged(url)
+                return {'url': url, 'status': 'unchanged'}
+            writer.save_products(url, products, digest)
             return {
                 'url': url,
                 'status': 'success',
@@ -42,70 +66,222 @@ class BatchProcessor:
             }
         except Exception as e:
             error_message = str(e)
-            self.database.save_error(url, error_message)
+            writer.save_error(url, error_message)
             return {
                 'url': url,
                 'status': 'error',
                 'error': error_message
             }
     
-    def process_batch(self, batch_size=None, start_index=0):
-        """Пакетная обработка URL"""
-        urls = self.load_urls()
+    def known_hash(self, url):
+        """Хеш текста URL с прошлой обработки, если неизменившиеся страницы пропускаются"""
+        if not self.skip_unchanged:
+            return None
+        return self.database.get_content_hash(url)
+    
+    def process_batch(self, batch_size=None, start_index=0, on_progress=None, should_stop=None,
+                      incremental=False, max_age=Config.RECRAWL_AFTER):
+        """Пакетная обработка URL, возвращает список результатов (см. iter_batch)"""
+        results = list(self.iter_batch(
+            batch_size=batch_size, start_index=start_index, on_progress=on_progress,
+            should_stop=should_stop, incremental=incremental, max_age=max_age
+        ))
         
-        if not urls:
+        if not results:
             print("Нет URL для обработки")
-            return []
+        return results
+    
+    def iter_batch(self, batch_size=None, start_index=0, on_progress=None, should_stop=None,
+                   incremental=False, max_age=Config.RECRAWL_AFTER):
+        """Пакетная обработка URL с выдачей результатов по одному в порядке входного списка
         
-        # Если указан batch_size, обрабатываем только часть URL
-        if batch_size:
-            end_index = min(start_index + batch_size, len(urls))
-            urls = urls[start_index:end_index]
+        URL читаются из файла лениво, поэтому память не зависит от длины списка.
         
-        results = []
+        В инкрементальном режиме обрабатываются только новые URL, URL с ошибкой
+        и URL, обработанные более max_age секунд назад; состояние URL в базе
+        обновляется по ходу обработки, поэтому повторный запуск продолжает
+        с того места, где остановился предыдущий.
         
-        # Последовательная обработка URL с tqdm для отображения прогресса
-        for url in tqdm(urls, desc="Пакетная обработка"):
-            result = self.process_url(url)
-            results.append(result)
-            # Пауза между запросами для избежания блокировки
-            time.sleep(1)
+        on_progress(processed, failed, checkpoint, total) вызывается не чаще раза в
+        Config.PROGRESS_INTERVAL секунд; checkpoint - число URL от start_index,
+        которые обработаны подряд и уже записаны в базу, total - число URL,
+        прочитанных из файла на данный момент. should_stop() позволяет
+        прервать обработку, не запуская оставшиеся URL.
+        """
+        urls = self.iter_urls(start_index, batch_size)
         
-        return results
+        if incremental:
+            urls = self._pending_only(urls, max_age)
+        
+        # URL фронтира отмечаются обработанными только после записи их результатов
+        done_urls = []
+        
+        # Результаты многих URL записываются в базу общими транзакциями
+        with self.database.batch_writer(Config.DB_WRITE_BATCH_SIZE) as writer:
+            def report(processed, failed, checkpoint, total):
+                # Чекпоинт должен указывать только на уже записанные результаты
+                writer.flush()
+                self._mark_done(done_urls)
+                if on_progress:
+                    on_progress(processed, failed, checkpoint, total)
+            
+            reporting = report if on_progress or self.frontier is not None else None
+            if self.cpu_workers:
+                results = self._iter_pipeline(urls, writer, on_progress=reporting, should_stop=should_stop)
+            else:
+                results = self._iter_concurrently(
+                    lambda url: self.process_url(url, writer), urls, desc="Пакетная обработка",
+                    on_progress=reporting, should_stop=should_stop
+                )
+            for result in results:
+                if self.frontier is not None:
+                    done_urls.append(result['url'])
+                yield result
+        self._mark_done(done_urls)
+    
+    def _mark_done(self, urls):
+        if self.frontier is not None and urls:
+            self.frontier.done(urls)
+            urls.clear()
+    
+    def _pending_only(self, urls, max_age):
+        """Отбор URL, которые нужно обработать в инкрементальном режиме, частями по 500"""
+        stale_before = datetime.now() - timedelta(seconds=max_age)
+        while True:
+            chunk = list(islice(urls, 500))
+            if not chunk:
+                return
+            pending = self.database.filter_pending_urls(chunk, stale_before)
+            # Пропущенные URL фронтира тоже обработаны, иначе они вернутся в очередь по сроку выдачи
+            if self.frontier is not None and len(pending) < len(chunk):
+                pending_set = set(pending)
+                self.frontier.done([url for url in chunk if url not in pending_set])
+            yield from pending
+    
+    def _iter_concurrently(self, func, urls, desc, on_progress=None, should_stop=None):
+        """Параллельный запуск func для потока URL в пуле потоков с выдачей результатов в исходном порядке"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            yield from self._iter_in_order(
+                lambda url: executor.submit(func, url), urls, self.max_workers * 4, desc,
+                on_progress=on_progress, should_stop=should_stop
+            )
     
-    def create_test_set(self, sample_size=30, output_file='data/test_set.json'):
+    def _iter_pipeline(self, urls, writer, on_progress=None, should_stop=None):
+        """Загрузка в потоках и разбор в процессах; результаты пишет в базу один поток - этот"""
+        with Pipeline(self.extractor, fetch_workers=self.max_workers, cpu_workers=self.cpu_workers,
+                      known_hash=self.known_hash) as pipeline:
+            results = self._iter_in_order(
+                pipeline.submit, urls, pipeline.window, desc="Пакетная обработка",
+                on_progress=on_progress, should_stop=should_stop
+            )
+            for result in results:
+                # Записываем до того, как _iter_in_order сообщит о прогрессе
+                if result['status'] == 'success':
+                    writer.save_products(result['url'], result['products'], result.get('content_hash'))
+                elif result['status'] == 'unchanged':
+                    writer.save_unchanged(result['url'])
+                else:
+                    writer.save_error(result['url'], result['error'])
+                yield result
+    
+    def _iter_in_order(self, submit, urls, window, desc, on_progress=None, should_stop=None):
+        """Выдача результатов submit(url) для потока URL в исходном порядке
+        
+        В работе одновременно не больше window URL: новые URL читаются
+        из потока только по мере выдачи готовых результатов.
+        """
+        urls = iter(urls)
+        in_flight = deque()
+        submitted = processed = failed = 0
+        exhausted = False
+        last_report = time.monotonic()
+        
+        with tqdm(desc=desc) as progress:
+            try:
+                while True:
+                    # Дозаполняем окно новыми URL
+                    while not exhausted and len(in_flight) < window:
+                        url = next(urls, None)
+                        if url is None:
+                            exhausted = True
+                            break
+                        in_flight.append(submit(url))
+                        submitted += 1
+                    
+                    if not in_flight:
+                        break
+                    
+                    # Результаты отдаются строго по порядку подачи URL
+                    result = in_flight.popleft().result()
+                    processed += 1
+                    if not result or result.get('status') == 'error':
+                        failed += 1
+                    progress.update()
+                    yield result
+                    
+                    if on_progress and time.monotonic() - last_report >= Config.PROGRESS_INTERVAL:
+                        on_progress(processed, failed, processed, submitted)
+                        last_report = time.monotonic()
+                    
+                    if should_stop and should_stop():
+                        break
+            finally:
+                # Еще не начатые URL отменяем, начатые дорабатывают
+                for future in in_flight:
+                    future.cancel()
+            
+            if on_progress:
+                on_progress(processed, failed, processed, submitted)
+    
+    def create_test_set(self, sample_size=30, output_file='data/test_set.json', on_progress=None, should_stop=None):
         """Создание тестового набора для оценки качества"""
-        urls = self.load_urls()
+        # Берем случайную выборку URL, не загружая весь список в память
+        sample = sample_urls(self.iter_urls(), sample_size)
         
-        if not urls:
+        if not sample:
             print("Нет URL для создания тестового набора")
             return False
         
-        # Берем случайную выборку URL
-        sample_urls = random.sample(urls, min(sample_size, len(urls)))
+        # Снимки страниц сохраняются рядом с тестовым набором для офлайн-оценки
+        snapshots_dir = os.path.join(os.path.dirname(output_file), 'snapshots')
+        os.makedirs(snapshots_dir, exist_ok=True)
         
-        test_data = []
+        results = list(self._iter_concurrently(
+            lambda url: self._create_test_case(url, snapshots_dir),
+            sample, desc="Создание тестового набора",
+            on_progress=on_progress, should_stop=should_stop
+        ))
+        test_data = [test_case for test_case in results if test_case]
         
-        for url in tqdm(sample_urls, desc="Создание тестового набора"):
-            try:
-                products = self.extractor.extract_products(url)
-                
-                if products:
-                    test_data.append({
-                        'url': url,
-                        'products': [p['name'] for p in products],
-                        'confidence': [p['confidence'] for p in products]
-                    })
-                
-                # Пауза между запросами
-                time.sleep(1)
-            except Exception as e:
-                print(f"Ошибка при обработке {url}: {e}")
+        # Прерванная выборка не должна затирать прежний тестовый набор
+        if should_stop and should_stop():
+            print("Создание тестового набора прервано")
+            return False
         
         # Сохраняем тестовый набор
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
         with open(output_file, 'w', encoding='utf-8') as f:
             json.dump(test_data, f, ensure_ascii=False, indent=2)
         
         print(f"Тестовый набор создан и сохранен в {output_file}")
-        return True
\ No newline at end of file
+        return True
+    
+    def _create_test_case(self, url, snapshots_dir):
+        """Извлечение эталонных товаров и снимка страницы для одного URL тестового набора"""
+        try:
+            html = self.extractor.fetch_page(url)
+            products = self.extractor.extract_products_from_html(html)
+            
+            if products:
+                snapshot_name = hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest() + '.html.gz'
+                with gzip.open(os.path.join(snapshots_dir, snapshot_name), 'wt', encoding='utf-8') as f:
+                    f.write(html)
+                
+                return {
+                    'url': url,
+                    'products': [p['name'] for p in products],
+                    'confidence': [p['confidence'] for p in products],
+                    'snapshot': os.path.join('snapshots', snapshot_name)
+                }
+        except Exception as e:
+            print(f"Ошибка при обработке {url}: {e}")
+        return None
\ No newline at end of file
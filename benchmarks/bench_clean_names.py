@@ -0,0 +1,84 @@
+"""Время и память очистки названий после поиска окон.
+
+Сравнивает текущую обработку окон (_products_from_windows) с предыдущей,
+где каждое окно склеивалось в строку, очищалось двумя re.sub, заново
+разбивалось на слова для оценки, а дедупликация шла отдельным проходом.
+Окна для обоих вариантов находятся заранее, поэтому замеры касаются только
+очистки, оценки и дедупликации: время и пик выделенной памяти (tracemalloc)
+на страницу. Отдельно печатается время всего _find_products_in_text.
+Если результаты вариантов расходятся, скрипт завершается с кодом 1.
+
+Запуск: python benchmarks/bench_clean_names.py
+"""
+import re
+import sys
+import tracemalloc
+from common import load_pages, measure
+from extractor import ProductExtractor
+
+def previous_clean_product_name(name):
+    """Очистка названия до перехода на предкомпилированные шаблоны"""
+    name = re.sub(r'[^\w\s\-\'",.«»]', ' ', name)
+    name = re.sub(r'\s+', ' ', name).strip()
+    words = [w for w in name.split() if len(w) < 30]
+    return ' '.join(words)
+
+def previous_products_from_windows(windows):
+    """Предыдущая обработка окон: очистка регулярными выражениями и отдельная дедупликация"""
+    products = []
+    for product_name in dict.fromkeys(windows):
+        product_name = previous_clean_product_name(product_name)
+        if product_name and len(product_name) > 3:
+            confidence = 0.6
+            if '"' in product_name or "'" in product_name:
+                confidence += 0.2
+            if len(product_name.split()) >= 3:
+                confidence += 0.1
+            products.append({'name': product_name, 'confidence': min(confidence, 0.95)})
+
+    unique_products = {}
+    for product in products:
+        name_lower = product['name'].lower()
+        if name_lower not in unique_products or unique_products[name_lower]['confidence'] < product['confidence']:
+            unique_products[name_lower] = product
+    result = list(unique_products.values())
+    result.sort(key=lambda x: x['confidence'], reverse=True)
+    return result[:20]
+
+def peak_memory(func, *args):
+    """Пик памяти, выделенной за вызов func(*args) (байты)"""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def main():
+    extractor = ProductExtractor(use_cache=False)
+    texts = {name: extractor.html_to_text(html) for name, html in load_pages().items()}
+    texts['catalog_x50'] = ' '.join(texts.values()) * 50
+
+    failures = 0
+    print(f"{'page':32} {'windows':>7} {'previous, ms':>12} {'current, ms':>11} {'speedup':>8} "
+          f"{'previous, KB':>12} {'current, KB':>11} {'page total, ms':>14}")
+    for name, text in texts.items():
+        windows = extractor.matcher.find_windows(text)
+        if extractor._products_from_windows(windows) != previous_products_from_windows(windows):
+            failures += 1
+            print(f"MISMATCH on {name}")
+
+        previous_time = measure(previous_products_from_windows, windows, repeat=20)
+        current_time = measure(extractor._products_from_windows, windows, repeat=20)
+        previous_peak = peak_memory(previous_products_from_windows, windows)
+        current_peak = peak_memory(extractor._products_from_windows, windows)
+        total_time = measure(extractor._find_products_in_text, text)
+        print(f"{name:32} {len(windows):7d} {previous_time * 1000:12.3f} {current_time * 1000:11.3f} "
+              f"{previous_time / current_time:7.1f}x {previous_peak / 1024:12.1f} {current_peak / 1024:11.1f} "
+              f"{total_time * 1000:14.2f}")
+
+    extractor.close()
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
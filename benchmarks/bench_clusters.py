@@ -0,0 +1,95 @@
+"""Время отнесения названий товаров к кластерам при росте базы.
+
+Заполняет временную базу названиями из слов каталога (у каждого товара
+несколько вариантов названия: с соседними словами из окна, другими
+кавычками и регистром) и печатает среднее время ProductClusterer.assign
+на новое название для каждого --checkpoints, а также время, которое
+заняло бы попарное сравнение нового названия со всеми кластерами. Если
+варианты одного товара попали в разные кластеры чаще чем в 5% случаев или
+разные модели склеились, скрипт завершается с кодом 1.
+
+Запуск: python benchmarks/bench_clusters.py [--checkpoints 1000,10000,100000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from common import ROOT_DIR  # noqa: F401 - добавляет корень репозитория в sys.path
+from clustering import jaccard, name_words, normalize_name
+from database import Database
+
+NOUNS = ['Диван', 'Кресло', 'Стол', 'Стул', 'Шкаф', 'Кровать', 'Комод', 'Тумба', 'Полка', 'Матрас',
+         'Sofa', 'Chair', 'Table', 'Desk', 'Wardrobe', 'Bed', 'Lamp', 'Bookcase']
+ADJECTIVES = ['угловой', 'раскладной', 'журнальный', 'обеденный', 'офисный', 'детский', 'мягкий',
+              'modern', 'classic', 'oak', 'walnut', 'velvet', 'folding', 'compact']
+MODELS = ['Милан', 'Бергамо', 'Вена', 'Верона', 'Oslo', 'Bergen', 'Cirrus', 'Nordic', 'Loft', 'Porto']
+CONTEXT = ['купить', 'в наличии', 'цена', 'скидка', 'новинка', 'доставка']
+
+def product_name(number):
+    """Название товара number; разные number дают разные модели"""
+    rng = random.Random(number)
+    return f'{rng.choice(NOUNS)} {rng.choice(ADJECTIVES)} {rng.choice(MODELS)} {number}'
+
+def variant(name, rng):
+    """Вариант названия, каким его находит поиск окон на другой странице"""
+    quoted = name.rsplit(' ', 2)
+    name = f'{quoted[0]} «{quoted[1]} {quoted[2]}»' if rng.random() < 0.5 else name
+    name = name.lower() if rng.random() < 0.3 else name
+    return f'{rng.choice(CONTEXT)} {name}' if rng.random() < 0.5 else name
+
+def assign_all(database, names):
+    prepared = [database.clusterer.prepare(name) for name in names]
+    with database.transaction() as cursor:
+        return [database.clusterer.assign(cursor, name) for name in prepared]
+
+def pairwise_time(database, name):
+    """Время сравнения названия со всеми каноническими ключами (как без LSH)"""
+    cursor = database._get_connection().cursor()
+    words = name_words(normalize_name(name))
+    started = time.perf_counter()
+    cursor.execute('SELECT canonical_key FROM product_clusters')
+    for (canonical_key,) in cursor:
+        jaccard(words, name_words(canonical_key))
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--checkpoints', default='1000,10000,100000', help='размеры базы (число товаров)')
+    parser.add_argument('--sample', type=int, default=500, help='новых товаров на замер')
+    args = parser.parse_args()
+    checkpoints = [int(value) for value in args.checkpoints.split(',')]
+
+    failures = 0
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as workdir:
+        database = Database(os.path.join(workdir, 'clusters.db'))
+        print(f"{'products':>9} {'assign, ms':>10} {'pairwise, ms':>12} {'split':>6} {'merged':>6}")
+        filled = 0
+        for checkpoint in checkpoints:
+            for start in range(filled, checkpoint, 10000):
+                assign_all(database, [product_name(n) for n in range(start, min(checkpoint, start + 10000))])
+            filled = checkpoint
+
+            # Новые товары: первое название и его вариант должны дать один кластер,
+            # а сам товар - не попасть в кластер другой модели
+            numbers = range(filled, filled + args.sample)
+            started = time.perf_counter()
+            originals = assign_all(database, [product_name(n) for n in numbers])
+            assign_ms = (time.perf_counter() - started) / args.sample * 1000
+            variants = assign_all(database, [variant(product_name(n), rng) for n in numbers])
+            split = sum(1 for a, b in zip(originals, variants) if a != b) / args.sample
+            merged = args.sample - len(set(originals))
+            pairwise_ms = pairwise_time(database, product_name(filled + args.sample)) * 1000
+            filled += args.sample
+
+            print(f"{checkpoint:9d} {assign_ms:10.3f} {pairwise_ms:12.3f} {split:6.1%} {merged:6d}")
+            if split > 0.05 or merged:
+                failures += 1
+
+        database.close()
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
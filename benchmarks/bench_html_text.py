@@ -0,0 +1,63 @@
+"""Сравнение способов извлечения текста из HTML.
+
+Проверяет, что потоковый разбор выдает тот же текст, что и исходный
+BeautifulSoup-вариант, на сохраненных страницах, большом «каталоге» и
+наборе страниц с неаккуратной разметкой, и печатает пропускную
+способность каждого способа. Для lxml расхождения только отмечаются:
+он исправляет разметку иначе, чем html.parser.
+
+Запуск: python benchmarks/bench_html_text.py
+"""
+import sys
+from common import load_pages, measure
+from html_text import BACKENDS, bs4_text, lxml_html
+
+# Разметка, на которой легко разойтись с деревом BeautifulSoup
+TRICKY_PAGES = {
+    'unclosed_head': '<html><head><title>Каталог</title><p>Диван "Милан" в наличии</p>',
+    'nested_skip': '<div>Стол<script>var a = "</div>";</script> обеденный</div><noscript>Включите <b>JS</b></noscript>',
+    'stray_end_tags': '<p>Кресло</span> "Бергамо"</p></div>, шкаф<br/>купе</br> и <div/>тумба<script/> белая',
+    'comments_cdata': 'Полка<!-- скрыто --><![CDATA[ навесная]]><?php echo 1 ?><!DOCTYPE html> дубовая',
+    'entities': '<p>Sofa &amp; chair&nbsp;set &#8212; &laquo;Oslo&raquo; &#x41;rmchair</p>',
+    'ruby_template': '<ruby>机<rp>(</rp><rt>tsukue</rt><rp>)</rp></ruby> table<template><p>Шаблон</p></template> lamp',
+    'whitespace': '<ul>\n  <li>  Bed   frame  </li>\r\n\t<li>Nightstand oak</li>\n</ul>\x0bend',
+    'whitespace_only_strings': 'A &nbsp;</p>  </style>B<b> </b>\t<i>\xa0</i><!-- --> \n <br>  Shelf',
+    'preserved_whitespace': '<pre>  \n </pre>Bed<textarea> \t </textarea>  <pre><b> </b> &nbsp; </pre>frame',
+    'template_cdata': '<template>скрыто<![CDATA[ Стул]]></template> venskiy<rt><![CDATA[ ]]>x</rt><rp><![CDATA[ oak ]]></rp>',
+    'svg_style': '<svg><style>.a{}</style><text>Lamp shade</text></svg><meta charset="utf-8">Desk',
+    'windows_1251': '<meta charset="windows-1251"><p>Комод с ящиками</p>'.encode('cp1251'),
+    'bom_utf8': b'\xef\xbb\xbf<p>\xd0\x9c\xd0\xb0\xd1\x82\xd1\x80\xd0\xb0\xd1\x81</p>'
+}
+
+def main():
+    pages = load_pages()
+    pages['catalog_x20'] = b''.join(pages.values()) * 20
+
+    backends = dict(BACKENDS)
+    if lxml_html is None:
+        del backends['lxml']
+
+    failures = 0
+    for name, html in TRICKY_PAGES.items():
+        if BACKENDS['stream'](html) != bs4_text(html):
+            failures += 1
+            print(f"MISMATCH on {name}")
+
+    print(f"{'page':32} {'KB':>6} " + ' '.join(f"{name + ', MB/s':>13}" for name in backends))
+    for name, html in pages.items():
+        expected = bs4_text(html)
+        row = f"{name:32} {len(html) / 1024:6.0f} "
+        for backend_name, backend in backends.items():
+            same = backend(html) == expected
+            if not same and backend_name == 'stream':
+                failures += 1
+                print(f"MISMATCH on {name}")
+            elapsed = measure(backend, html)
+            row += f"{len(html) / elapsed / 1e6:12.1f}{' ' if same else '*'} "
+        print(row)
+
+    print("* - текст отличается от bs4")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Сравнение поиска товаров в тексте с прежним перебором ключевых слов.
+
+Печатает время _find_products_in_text и исходной реализации на сохраненных
+страницах и на большом «каталоге», склеенном из них. Совпадение результатов
+на тех же текстах проверяет tests/test_matcher.py.
+
+Запуск: python benchmarks/bench_matcher.py
+"""
+import random
+import re
+from common import load_pages, measure
+from extractor import ProductExtractor
+
+def reference_clean_product_name(name):
+    """Исходная очистка названия"""
+    name = re.sub(r'[^\w\s\-\'",.«»]', ' ', name)
+    name = re.sub(r'\s+', ' ', name).strip()
+    words = [w for w in name.split() if len(w) < 30]
+    return ' '.join(words)
+
+def reference_find_products(keywords, text):
+    """Исходный вложенный перебор: предложения x ключевые слова x слова"""
+    products = []
+    for sentence in re.split(r'[.!?]+', text):
+        for keyword in keywords:
+            if keyword in sentence.lower():
+                words = sentence.split()
+                for i, word in enumerate(words):
+                    if keyword in word.lower():
+                        start = max(0, i - 3)
+                        end = min(len(words), i + 4)
+                        product_name = reference_clean_product_name(' '.join(words[start:end]))
+                        if product_name and len(product_name) > 3:
+                            confidence = 0.6
+                            if '"' in product_name or "'" in product_name:
+                                confidence += 0.2
+                            if len(product_name.split()) >= 3:
+                                confidence += 0.1
+                            products.append({'name': product_name, 'confidence': min(confidence, 0.95)})
+
+    unique_products = {}
+    for product in products:
+        name_lower = product['name'].lower()
+        if name_lower not in unique_products or unique_products[name_lower]['confidence'] < product['confidence']:
+            unique_products[name_lower] = product
+    result = list(unique_products.values())
+    result.sort(key=lambda x: x['confidence'], reverse=True)
+    return result[:20]
+
+def build_texts(extractor):
+    """Тексты сохраненных страниц и два больших каталога из их слов"""
+    texts = {name: extractor.html_to_text(html) for name, html in load_pages().items()}
+    # Большой каталог с десятками тысяч предложений
+    texts['catalog_x50'] = ' '.join(texts.values()) * 50
+    # Каталог, где ключевые слова встречаются лишь в части предложений
+    rng = random.Random(1)
+    vocabulary = ' '.join(texts.values()).split()
+    plain = [word for word in vocabulary if not any(kw in word.lower() for kw in extractor.furniture_keywords)]
+    texts['sparse_catalog'] = '. '.join(
+        ' '.join(rng.choice(plain if rng.random() < 0.9 else vocabulary) for _ in range(rng.randint(4, 14)))
+        for _ in range(40000)
+    )
+    return texts
+
+def main():
+    extractor = ProductExtractor(use_cache=False)
+    texts = build_texts(extractor)
+
+    print(f"{'page':32} {'sentences':>9} {'reference, ms':>14} {'matcher, ms':>12} {'speedup':>8}")
+    for name, text in texts.items():
+        reference_time = measure(reference_find_products, extractor.furniture_keywords, text)
+        matcher_time = measure(extractor._find_products_in_text, text)
+        sentences = len(re.split(r'[.!?]+', text))
+        print(f"{name:32} {sentences:9d} {reference_time * 1000:14.2f} {matcher_time * 1000:12.2f} "
+              f"{reference_time / matcher_time:7.1f}x")
+    extractor.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Пропускная способность этапа NER с объединением окон в пачки.
+
+Вместо настоящей модели используется заглушка с той же формой стоимости,
+что у прямого прохода трансформера на CPU: постоянные накладные расходы на
+вызов плюс время на каждое окно. Несколько потоков одновременно извлекают
+товары из сохраненных страниц (как параллельные запросы /extract или URL
+пакетной обработки); печатаются окна в секунду, задержка страницы p50/p99
+и средний размер пачки для разных NER_MAX_BATCH_SIZE. Заглушка помечает
+как PRODUCT слова с ключевыми словами мебели; если ни один из них не дошел
+до результата экстрактора, скрипт завершается с кодом 1.
+
+Запуск: python benchmarks/bench_ner.py [--threads 8] [--call-ms 20] [--window-ms 2]
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from common import load_pages, percentile
+import ner
+from extractor import ProductExtractor
+from timings import registry
+
+class StubModel:
+    """Заглушка NER: call_ms на вызов и window_ms на окно, сущности - слова с ключевыми словами"""
+    def __init__(self, keywords, call_ms, window_ms):
+        self.keywords = keywords
+        self.call_ms = call_ms
+        self.window_ms = window_ms
+
+    def __call__(self, windows):
+        # sleep отпускает GIL, как и вычисления torch
+        time.sleep((self.call_ms + self.window_ms * len(windows)) / 1000)
+        return [
+            [('PRODUCT', word, 0.97) for word in window.split() if any(kw in word.lower() for kw in self.keywords)]
+            for window in windows
+        ]
+
+def run(extractor, texts, threads, rounds):
+    latencies = []
+
+    def extract(text):
+        started = time.perf_counter()
+        products = extractor.add_ner_products(text, [])
+        latencies.append(time.perf_counter() - started)
+        return products
+
+    registry.reset()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(extract, texts * rounds))
+    elapsed = time.perf_counter() - started
+
+    counters = registry.snapshot()['counters']
+    latencies.sort()
+    return results, {
+        'windows_per_sec': counters.get('ner.windows', 0) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'avg_batch': counters.get('ner.batched_windows', 0) / max(1, counters.get('ner.batches', 0))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8, help='одновременных запросов')
+    parser.add_argument('--rounds', type=int, default=3, help='сколько раз пройти по всем страницам')
+    parser.add_argument('--call-ms', type=float, default=20, help='накладные расходы заглушки на вызов')
+    parser.add_argument('--window-ms', type=float, default=2, help='время заглушки на одно окно')
+    args = parser.parse_args()
+
+    extractor = ProductExtractor(use_cache=False, use_ner=True)
+    texts = [extractor.html_to_text(html) for html in load_pages().values()]
+    model = StubModel(extractor.furniture_keywords, args.call_ms, args.window_ms)
+
+    failures = 0
+    print(f"{'max batch':>9} {'windows/s':>10} {'p50, ms':>8} {'p99, ms':>8} {'avg batch':>10}")
+    for batch_size in (1, 4, 16, 64):
+        ner.set_model(model).batcher.max_batch_size = batch_size
+        results, stats = run(extractor, texts, args.threads, args.rounds)
+        if not any(results):
+            failures += 1
+            print(f"NO PRODUCTS with max batch {batch_size}")
+        print(f"{batch_size:9d} {stats['windows_per_sec']:10.1f} {stats['p50_ms']:8.1f} {stats['p99_ms']:8.1f} "
+              f"{stats['avg_batch']:10.1f}")
+
+    extractor.close()
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""Бенчмарки горячих путей извлечения на сохраненных страницах.
+
+Страницы из benchmarks/pages отдает локальный HTTP-сервер, поэтому сеть не
+нужна. Для каждого пути измеряются страницы в секунду и задержки p50/p99:
+scrape_page, _find_products_in_text, Database.save_products и /extract
+(без кэша результатов и из кэша). Результат выводится в JSON; с --baseline
+он сравнивается с сохраненным прогоном, и если какой-то путь стал медленнее
+больше чем на --tolerance, скрипт завершается с кодом 1.
+
+Запуск:
+    python benchmarks/bench_pipeline.py --output baseline.json
+    python benchmarks/bench_pipeline.py --baseline baseline.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from common import load_pages, percentile, serve_pages
+from config import Config
+
+def run_case(func, inputs, rounds):
+    """Вызов func для каждого входа rounds раз подряд (после одного прогрева)"""
+    for item in inputs:
+        func(item)
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for item in inputs:
+            call_started = time.perf_counter()
+            func(item)
+            latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'calls': len(latencies),
+        'pages_per_sec': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3)
+    }
+
+def unlimited(client):
+    """Локальный сервер не нужно беречь: снимаем ограничение частоты запросов"""
+    from rate_limiter import HostLimiter
+    client.limiter = HostLimiter(rate=1e9, burst=1e9)
+
+def run_benchmarks(rounds, workdir):
+    # Приложение должно писать во временную базу, а не в database/products.db
+    Config.DATABASE_PATH = os.path.join(workdir, 'products.db')
+    import app
+    from database import Database
+    from extractor import ProductExtractor
+
+    pages = load_pages()
+    base_url, stop_server = serve_pages(pages)
+    urls = [f'{base_url}/{name}' for name in pages]
+
+    extractor = ProductExtractor(use_cache=False)
+    unlimited(extractor.client)
+    texts = [extractor.html_to_text(html) for html in pages.values()]
+    results = [(url, extractor.extract_products_from_html(html)) for url, html in zip(urls, pages.values())]
+    database = Database(os.path.join(workdir, 'bench.db'))
+
+    app.extractor.client.cache = None
+    unlimited(app.extractor.client)
+    client = app.app.test_client()
+    # Уникальный параметр запроса обходит кэш результатов /extract
+    unique = itertools.count()
+
+    def extract(url):
+        response = client.post('/extract', json={'url': url})
+        assert response.status_code == 200, response.status_code
+
+    cases = {}
+    try:
+        cases['scrape_page'] = run_case(extractor.scrape_page, urls, rounds)
+        cases['find_products_in_text'] = run_case(extractor._find_products_in_text, texts, rounds)
+        cases['save_products'] = run_case(lambda result: database.save_products(*result), results, rounds)
+        cases['extract_endpoint'] = run_case(lambda url: extract(f'{url}?run={next(unique)}'), urls, rounds)
+        cases['extract_endpoint_cached'] = run_case(extract, urls, rounds)
+    finally:
+        app.jobs.shutdown()
+        extractor.close()
+        app.extractor.close()
+        database.close()
+        app.db.close()
+        stop_server()
+
+    return {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pages': len(pages),
+        'rounds': rounds,
+        'cases': cases
+    }
+
+def compare(results, baseline, tolerance):
+    """Список ухудшений относительно baseline больше чем на tolerance"""
+    regressions = []
+    for name, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(name)
+        if previous is None:
+            continue
+        if current['pages_per_sec'] < previous['pages_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {previous['pages_per_sec']} -> {current['pages_per_sec']} страниц/с")
+        if current['p99_ms'] > previous['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {previous['p99_ms']} -> {current['p99_ms']} мс")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=5, help='сколько раз пройти по всем страницам')
+    parser.add_argument('--output', help='куда сохранить результат в JSON')
+    parser.add_argument('--baseline', help='JSON прежнего прогона для сравнения')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимое ухудшение (доля)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run_benchmarks(args.rounds, workdir)
+
+    report = json.dumps(results, ensure_ascii=False, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report + '\n')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""Время полнотекстового поиска товаров на большой синтетической базе.
+
+Заполняет временную базу --rows строками товаров из названий, собранных
+из слов каталога, и сравнивает Database.search_products (FTS5) с прежним
+способом - LIKE по всей таблице products. Печатаются p50/p99 на запрос
+и число найденных строк на первой странице; если FTS5 не нашел того, что
+находит LIKE, скрипт завершается с кодом 1. Для каждого запроса печатается
+и число совпадений: при числе больше Config.SEARCH_MAX_CANDIDATES
+ранжируются только самые новые из них.
+
+Запуск: python benchmarks/bench_search.py [--rows 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from common import percentile
+from config import Config
+from database import Database, SEARCH_WORD_RE
+
+NOUNS = ['Диван', 'Кресло', 'Стол', 'Стул', 'Шкаф', 'Кровать', 'Комод', 'Тумба', 'Полка', 'Матрас',
+         'Sofa', 'Chair', 'Table', 'Desk', 'Wardrobe', 'Bed', 'Lamp', 'Bookcase']
+ADJECTIVES = ['угловой', 'раскладной', 'журнальный', 'обеденный', 'офисный', 'детский', 'мягкий',
+              'modern', 'classic', 'oak', 'walnut', 'velvet', 'folding', 'compact']
+MODELS = ['Милан', 'Бергамо', 'Вена', 'Верона', 'Oslo', 'Bergen', 'Cirrus', 'Nordic', 'Loft', 'Porto']
+
+QUERIES = ['диван', 'угловой милан', 'oak table', 'верона', 'крес', 'velvet chair porto', 'nordic lamp']
+
+def fill(database, rows, rng):
+    """rows товаров по 10 на URL, пачками в одной транзакции"""
+    for start in range(0, rows, 10000):
+        batch = []
+        for page in range(start // 10, min(rows, start + 10000) // 10):
+            products = [
+                {'name': f'{rng.choice(NOUNS)} {rng.choice(ADJECTIVES)} "{rng.choice(MODELS)} {rng.randint(1, 999)}"',
+                 'confidence': round(rng.uniform(0.6, 0.95), 2)}
+                for _ in range(10)
+            ]
+            batch.append((f'https://shop{page % 500}.example/product/{page}', products, None))
+        database.save_results(batch)
+
+def like_search(database, query, limit):
+    """Прежний способ: LIKE по всем строкам products"""
+    cursor = database._get_connection().cursor()
+    conditions = ' AND '.join('product_name LIKE ?' for _ in query.split())
+    cursor.execute(f'SELECT id FROM products WHERE {conditions} LIMIT ?',
+                   (*[f'%{word}%' for word in query.split()], limit))
+    return cursor.fetchall()
+
+def match_count(database, query):
+    """Число строк, совпавших с запросом, как его строит search_products"""
+    match = ' '.join(f'"{word}"' for word in SEARCH_WORD_RE.findall(query)) + '*'
+    cursor = database._get_connection().cursor()
+    cursor.execute('SELECT COUNT(*) FROM products_fts WHERE products_fts MATCH ?', (match,))
+    return cursor.fetchone()[0]
+
+def timed_runs(func, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000, help='строк в таблице products')
+    parser.add_argument('--repeat', type=int, default=20, help='повторов каждого запроса')
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        database = Database(os.path.join(workdir, 'search.db'))
+        started = time.perf_counter()
+        fill(database, args.rows, random.Random(1))
+        print(f"{args.rows} строк записано за {time.perf_counter() - started:.1f} с")
+
+        print(f"ранжируются не больше {Config.SEARCH_MAX_CANDIDATES} самых новых совпадений")
+        print(f"{'query':24} {'matches':>7} {'found':>5} {'fts p50, ms':>11} {'fts p99, ms':>11} {'like p50, ms':>12}")
+        for query in QUERIES:
+            found = database.search_products(query, limit=20)
+            if like_search(database, query, 1) and not found:
+                failures += 1
+                print(f"NOT FOUND {query}")
+            fts_p50, fts_p99 = timed_runs(lambda: database.search_products(query, limit=20), args.repeat)
+            like_p50, _ = timed_runs(lambda: like_search(database, query, 20), 3)
+            print(f"{query:24} {match_count(database, query):7d} {len(found):5d} {fts_p50:11.2f} {fts_p99:11.2f} {like_p50:12.2f}")
+
+        database.close()
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# Модули приложения лежат в корне репозитория
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages')
+
+def load_pages():
+    """Сохраненные HTML-страницы: {имя файла: содержимое}"""
+    pages = {}
+    for name in sorted(os.listdir(PAGES_DIR)):
+        if name.endswith('.html'):
+            with open(os.path.join(PAGES_DIR, name), 'rb') as f:
+                pages[name] = f.read()
+    return pages
+
+def measure(func, *args, repeat=5):
+    """Лучшее время выполнения func(*args) из repeat запусков (секунды)"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def percentile(values, q):
+    """Перцентиль q (0..100) по отсортированному списку значений"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))
+    return values[index]
+
+def serve_pages(pages, host='127.0.0.1'):
+    """Локальная замена сайтов: страницы pages отдаются по адресу /<имя файла>.
+
+    Сервер работает в фоновом потоке на свободном порту. Возвращает базовый
+    URL и функцию остановки.
+    """
+    from aiohttp import web
+
+    async def handle(request):
+        body = pages.get(request.match_info['name'])
+        if body is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=body, content_type='text/html', charset='utf-8')
+
+    loop = asyncio.new_event_loop()
+    app = web.Application()
+    app.router.add_get('/{name}', handle)
+    runner = web.AppRunner(app, access_log=None)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, host, 0)
+    loop.run_until_complete(site.start())
+    port = runner.addresses[0][1]
+
+    thread = threading.Thread(target=loop.run_forever, name='stand-in-server', daemon=True)
+    thread.start()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    return f'http://{host}:{port}', stop
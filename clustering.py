@@ -0,0 +1,146 @@
+import hashlib
+import random
+import re
+from collections import namedtuple
+from functools import lru_cache
+from config import Config
+
+# Кавычки, знаки препинания и подчеркивания не отличают один товар от другого
+NAME_NOISE_RE = re.compile(r'[\W_]+')
+# Простое число Мерсенна для универсального хеширования в MinHash
+MERSENNE_PRIME = (1 << 61) - 1
+
+def normalize_name(name):
+    """Ключ названия: нижний регистр, ё -> е, без кавычек и знаков препинания"""
+    return ' '.join(NAME_NOISE_RE.sub(' ', name.lower().replace('ё', 'е')).split())
+
+def name_words(key):
+    """Множество слов ключа.
+
+    Сравниваются слова, а не n-граммы символов: у разных моделей названия
+    часто отличаются одним словом или номером («Вена» и «Верона», «Oslo 12»
+    и «Oslo 13»), а у вариантов одного товара из окон ключевых слов
+    добавляются или пропадают целые соседние слова.
+    """
+    return set(key.split())
+
+def jaccard(first, second):
+    """Коэффициент Жаккара двух множеств"""
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+# Название, подготовленное к отнесению к кластеру: ключ, слова и LSH-корзины
+PreparedName = namedtuple('PreparedName', 'name key words buckets')
+
+def _hash64(value):
+    """Стабильный между процессами 64-битный хеш строки"""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+class MinHashLSH:
+    """MinHash-сигнатуры множеств слов и их LSH-корзины.
+
+    Сигнатура из num_perm минимумов оценивает коэффициент Жаккара, а разбиение
+    ее на bands полос дает корзины: похожие названия почти наверняка совпадают
+    хотя бы в одной полосе, поэтому кандидатов ищут по корзинам, а не
+    сравнением со всеми названиями.
+    """
+    def __init__(self, num_perm=Config.CLUSTER_NUM_PERM, bands=Config.CLUSTER_BANDS, seed=1):
+        # Перестановки должны совпадать во всех процессах и запусках: корзины хранятся в базе
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)
+        ]
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Словарь названий товаров невелик, поэтому хеши слов по всем
+        # перестановкам считаются один раз на слово
+        self._word_hashes = lru_cache(maxsize=Config.CLUSTER_WORD_CACHE)(self._permuted_hashes)
+
+    def _permuted_hashes(self, word):
+        h = _hash64(word)
+        return tuple((a * h + b) % MERSENNE_PRIME for a, b in self.permutations)
+
+    def signature(self, words):
+        """Поэлементный минимум хешей слов по всем перестановкам"""
+        return list(map(min, zip(*map(self._word_hashes, words))))
+
+    def buckets(self, signature):
+        """Пары (полоса, корзина); номер корзины помещается в INTEGER SQLite"""
+        result = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(repr(rows).encode('ascii'), digest_size=8).digest()
+            result.append((band, int.from_bytes(digest, 'little', signed=True)))
+        return result
+
+class ProductClusterer:
+    """Отнесение названий товаров к кластерам одного и того же товара.
+
+    Сначала ищется точное совпадение нормализованного ключа, затем кластеры
+    из тех же LSH-корзин; кандидат принимается, если коэффициент Жаккара
+    слов ключа и канонического ключа кластера не меньше threshold. Иначе
+    создается новый кластер. Каждый шаг - поиск по индексам, поэтому время
+    не растет линейно с числом товаров.
+
+    prepare (нормализация, MinHash, корзины) не обращается к базе и
+    вызывается до транзакции записи; assign выполняет внутри транзакции
+    только поиск и вставки, курсор передает вызывающий код.
+    """
+    def __init__(self, threshold=Config.CLUSTER_SIMILARITY, max_candidates=Config.CLUSTER_MAX_CANDIDATES):
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.lsh = MinHashLSH()
+
+    def prepare(self, name):
+        """Ключ, слова и LSH-корзины названия для assign"""
+        key = normalize_name(name) or name.lower()
+        words = name_words(key)
+        return PreparedName(name, key, words, self.lsh.buckets(self.lsh.signature(words)))
+
+    def assign(self, cursor, prepared):
+        """id кластера для подготовленного названия (новый кластер создается при необходимости)"""
+        name, key, words, buckets = prepared
+        cursor.execute('SELECT cluster_id FROM product_keys WHERE name_key = ?', (key,))
+        row = cursor.fetchone()
+        if row:
+            return row[0]
+
+        cluster_id = self._find_cluster(cursor, words, buckets)
+        if cluster_id is None:
+            cursor.execute('''
+                INSERT INTO product_clusters (canonical_name, canonical_key, count) VALUES (?, ?, 0)
+            ''', (name, key))
+            cluster_id = cursor.lastrowid
+
+        cursor.execute('INSERT INTO product_keys (name_key, cluster_id) VALUES (?, ?)', (key, cluster_id))
+        cursor.executemany('''
+            INSERT OR IGNORE INTO cluster_buckets (band, bucket, cluster_id) VALUES (?, ?, ?)
+        ''', [(band, bucket, cluster_id) for band, bucket in buckets])
+        return cluster_id
+
+    def _find_cluster(self, cursor, words, buckets):
+        """Самый похожий кластер из общих LSH-корзин или None"""
+        # Первыми проверяются кластеры, совпавшие в большем числе полос. Корзины
+        # соединяются с таблицей явно: с (band, bucket) IN (VALUES ...) SQLite
+        # не использует первичный ключ и просматривает все корзины
+        placeholders = ', '.join('(?, ?)' for _ in buckets)
+        cursor.execute(f'''
+            WITH wanted (band, bucket) AS (VALUES {placeholders})
+            SELECT c.id, c.canonical_key
+            FROM (
+                SELECT b.cluster_id, COUNT(*) AS shared
+                FROM wanted CROSS JOIN cluster_buckets b ON b.band = wanted.band AND b.bucket = wanted.bucket
+                GROUP BY b.cluster_id
+                ORDER BY shared DESC
+                LIMIT ?
+            ) AS candidates
+            JOIN product_clusters c ON c.id = candidates.cluster_id
+        ''', (*[value for bucket in buckets for value in bucket], self.max_candidates))
+
+        best_id, best_similarity = None, self.threshold
+        for cluster_id, canonical_key in cursor.fetchall():
+            similarity = jaccard(words, name_words(canonical_key))
+            if similarity >= best_similarity:
+                best_id, best_similarity = cluster_id, similarity
+        return best_id
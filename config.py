@@ -7,18 +7,164 @@ class Config:
     DATABASE_PATH = os.path.join(BASE_DIR, 'database', 'products.db')
     URL_LIST_PATH = os.path.join(DATA_DIR, 'URL_list.csv')
     TEST_SET_PATH = os.path.join(DATA_DIR, 'test_set.json')
+    PAGE_CACHE_PATH = os.path.join(BASE_DIR, 'database', 'page_cache.db')
     
     # Модели - используем готовые решения
     NER_MODEL = "Davlan/distilbert-base-multilingual-cased-ner-hrl"
+    # Необязательный этап NER (нужны пакеты transformers и torch): модель грузится один раз
+    # на процесс и работает только на CPU. NER_MODEL может быть и путем к локальной папке с моделью.
+    # Модель должна размечать сущности из NER_LABELS: модель по умолчанию - общая
+    # (PER/ORG/LOC/DATE), для товаров нужна дообученная на PRODUCT, иначе этап отключается
+    NER_ENABLED = False
+    NER_LABELS = ['PRODUCT']
+    NER_MIN_SCORE = 0.5
+    NER_THREADS = 1
+    # Текст страницы режется на окна по NER_WINDOW_WORDS слов (с запасом меньше 512 токенов)
+    NER_WINDOW_WORDS = 128
+    NER_WINDOW_OVERLAP = 16
+    NER_MAX_WINDOWS = 64
+    # Окна многих запросов объединяются в один прямой проход: не больше NER_MAX_BATCH_SIZE
+    # окон, первое окно пачки ждет не дольше NER_MAX_LATENCY секунд
+    NER_MAX_BATCH_SIZE = 16
+    NER_MAX_LATENCY = 0.01
     
     # Параметры скрапинга
     TIMEOUT = 15
+    # Максимальный размер загружаемой страницы (байты); более длинные страницы обрезаются
+    MAX_PAGE_BYTES = 5 * 1024 * 1024
     MAX_RETRIES = 3
+    # Вежливость к сайтам: запросов в секунду на один хост и допустимый всплеск
+    HOST_RATE = 1.0
+    HOST_BURST = 3
+    HOST_LIMITER_MAX_HOSTS = 10000
+    # Повторы: экспоненциальная задержка со случайным разбросом (секунды); Retry-After
+    # длиннее RETRY_AFTER_MAX не ждем, а сразу отключаем хост на этот срок
+    RETRY_BACKOFF_BASE = 0.5
+    RETRY_BACKOFF_MAX = 30
+    RETRY_AFTER_MAX = 120
+    # Предохранитель: после скольких ошибок подряд отключать хост и на сколько секунд
+    BREAKER_FAILURES = 5
+    BREAKER_COOLDOWN = 30
+    BREAKER_MAX_COOLDOWN = 15 * 60
+    # Пул соединений: общий лимит одновременных запросов и лимит на один хост
+    MAX_CONNECTIONS = 200
+    MAX_CONNECTIONS_PER_HOST = 4
+    
+    # Кэш страниц: время свежести (секунды) и максимальный размер (байты, в сжатом виде)
+    PAGE_CACHE_ENABLED = True
+    PAGE_CACHE_TTL = 24 * 60 * 60
+    PAGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+    # Время последнего обращения к записи обновляется не чаще раза в столько секунд
+    PAGE_CACHE_ACCESS_RESOLUTION = 60
     USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
     
+    # Способ извлечения текста из HTML: 'stream' (потоковый html.parser),
+    # 'lxml' (если установлен) или 'bs4' (полное дерево BeautifulSoup)
+    HTML_TEXT_BACKEND = 'stream'
+    # Брать товары из JSON-LD, микроразметки и OpenGraph, если они есть на странице,
+    # и искать ключевые слова в тексте только на страницах без таких данных
+    STRUCTURED_DATA_ENABLED = True
+    # Уверенность названия из структурированных данных без ключевых слов мебели: разметка
+    # Product есть и у подарочных карт, доставки и аксессуаров, поэтому такое название
+    # ставится ниже окон ключевых слов (0.6)
+    STRUCTURED_DATA_UNMATCHED_CONFIDENCE = 0.5
+    
+    # Кэш результатов /extract: сколько секунд хранить результат и сколько URL помнить
+    EXTRACT_CACHE_TTL = 5 * 60
+    EXTRACT_CACHE_SIZE = 1000
+    
+    # Полнотекстовый поиск /search: размер страницы результатов по умолчанию и наибольший
+    SEARCH_PAGE_SIZE = 20
+    SEARCH_MAX_PAGE_SIZE = 100
+    # Сколько самых новых совпадений ранжируется по релевантности и доступно постранично;
+    # /search возвращает это число в max_results
+    SEARCH_MAX_CANDIDATES = 1000
+    
+    # Кластеры похожих названий товаров для статистики: MinHash по словам названия с
+    # CLUSTER_NUM_PERM перестановками в CLUSTER_BANDS полосах LSH и порог сходства (Жаккар)
+    CLUSTER_NUM_PERM = 60
+    CLUSTER_BANDS = 12
+    CLUSTER_SIMILARITY = 0.65
+    CLUSTER_MAX_CANDIDATES = 50
+    # Сколько слов хранить с готовыми хешами MinHash
+    CLUSTER_WORD_CACHE = 100000
+    
+    # Замеры времени этапов (/debug/timings) и выборочный профилировщик, который
+    # включается для отдельного запроса параметром ?profile=1
+    TIMINGS_ENABLED = True
+    PROFILER_ENABLED = True
+    PROFILER_INTERVAL = 0.005
+    PROFILES_KEPT = 20
+    
     # Параметры пакетной обработки
     BATCH_SIZE = 50
     MAX_WORKERS = 5
+    # Процессы для разбора HTML при пакетной обработке (0 - разбирать в потоках загрузки)
+    # и сколько загруженных страниц на процесс может ждать разбора
+    CPU_WORKERS = os.cpu_count() or 1
+    CPU_QUEUE_PER_WORKER = 2
+    # Сколько результатов URL записывать в базу одной транзакцией
+    DB_WRITE_BATCH_SIZE = 20
+    # Через сколько секунд успешно обработанный URL считается устаревшим при инкрементальном обходе
+    RECRAWL_AFTER = 7 * 24 * 60 * 60
+    # Не разбирать и не перезаписывать страницы, очищенный текст которых не изменился
+    # с прошлой успешной обработки (сравнивается хеш текста из url_status)
+    SKIP_UNCHANGED_PAGES = True
+    # Как часто сообщать о прогрессе фоновой задачи (секунды)
+    PROGRESS_INTERVAL = 1.0
+    
+    # Дедупликация списка URL при чтении (url_source.iter_urls): фильтр Блума (около 1.8 МБ
+    # на миллион URL) с долей ложных срабатываний URL_DEDUPE_ERROR_RATE. Число URL оценивается
+    # по размеру файла из расчета не меньше URL_DEDUPE_BYTES_PER_URL байт на строку,
+    # но не больше URL_DEDUPE_CAPACITY
+    URL_DEDUPE_CAPACITY = 10 * 1000 * 1000
+    URL_DEDUPE_ERROR_RATE = 0.001
+    URL_DEDUPE_BYTES_PER_URL = 32
+    
+    # Фронтир обхода (POST /discover): URL хранятся на диске, для проверки повторов в памяти
+    # держится фильтр Блума на FRONTIER_CAPACITY URL с долей ложных срабатываний FRONTIER_ERROR_RATE
+    # (около 18 МБ на 10 млн URL); URL выдаются пакетной обработке частями по FRONTIER_TAKE_CHUNK
+    FRONTIER_PATH = os.path.join(BASE_DIR, 'database', 'frontier.db')
+    FRONTIER_CAPACITY = 10 * 1000 * 1000
+    FRONTIER_ERROR_RATE = 0.001
+    FRONTIER_TAKE_CHUNK = 500
+    # Выданный URL, не отмеченный обработанным за FRONTIER_LEASE секунд, возвращается в очередь;
+    # фильтр Блума сохраняется после каждых FRONTIER_SAVE_EVERY новых URL
+    FRONTIER_LEASE = 3600
+    FRONTIER_SAVE_EVERY = 100000
+    # Поиск URL товаров: сколько sitemap и страниц каталога загружать на сайт, сколько URL
+    # брать из одного sitemap и предел его размера (как в протоколе sitemaps.org)
+    DISCOVERY_MAX_SITEMAPS = 1000
+    DISCOVERY_MAX_COLLECTION_PAGES = 200
+    SITEMAP_MAX_URLS = 50000
+    SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+    # Пути страниц товаров и страниц каталога (регулярные выражения)
+    PRODUCT_URL_PATTERNS = [r'/products?/[^/]+', r'/items?/[^/]+', r'/p/[^/]+', r'-p-\d+']
+    COLLECTION_URL_PATTERNS = [r'/collections?/', r'/categor(y|ies)/', r'/catalog/', r'/shop/']
+    
+    # Фоновые задачи: число одновременно выполняемых задач и через сколько секунд
+    # без обновлений задача в состоянии running считается прерванной перезапуском
+    JOB_WORKERS = 1
+    JOB_STALE_SECONDS = 300
+    # Как часто выполняющаяся задача отмечается живой, даже если прогресса нет
+    JOB_HEARTBEAT_SECONDS = JOB_STALE_SECONDS / 3
+    
+    # Поток событий /events для панели: как часто проверять версию данных (секунды), интервал
+    # keepalive и пауза перед переподключением браузера, число клиентов и очередь на клиента
+    EVENTS_POLL_INTERVAL = 1.0
+    EVENTS_KEEPALIVE = 15
+    EVENTS_RETRY_MS = 3000
+    EVENTS_MAX_CLIENTS = 50
+    EVENTS_QUEUE_SIZE = 16
+    # Поток /events закрывается через столько секунд, и браузер переподключается:
+    # поток сервера не занят одним клиентом бесконечно, а соединение не копит состояние прокси
+    EVENTS_MAX_STREAM_SECONDS = 300
+    
+    # gunicorn (gunicorn.conf.py): каждый поток /events занимает поток сервера на все время
+    # соединения, поэтому потоков на EVENTS_MAX_CLIENTS больше, чем для обычных запросов.
+    # Процесс один: события задач рассылает процесс, в котором задача выполняется
+    SERVER_WORKERS = 1
+    SERVER_REQUEST_THREADS = 16
     
     # Ключевые слова для мебели
     FURNITURE_KEYWORDS = [
@@ -1,19 +1,272 @@
 import sqlite3
 import json
+import re
 from datetime import datetime
+from contextlib import contextmanager
+from collections import Counter
+import threading
+import weakref
 import os
+from timings import timed, count
+from config import Config
+from clustering import ProductClusterer
+
+# Настройки соединения: WAL позволяет читать во время записи, NORMAL убирает fsync на каждый коммит
+PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=30000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-16000'
+]
+
+def _add_indexes_and_product_counts(cursor):
+    """Индексы для запросов панели и таблица счетчиков товаров"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_products_url ON products (url)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_history_date ON scraping_history (scraping_date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_history_url ON scraping_history (url, scraping_date)')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_counts (
+            product_name TEXT PRIMARY KEY,
+            count INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_product_counts_count ON product_counts (count DESC)')
+    
+    # Для существующих баз счетчики заполняются из уже сохраненных товаров
+    cursor.execute('''
+        INSERT INTO product_counts (product_name, count)
+        SELECT product_name, COUNT(*) FROM products GROUP BY product_name
+    ''')
+
+def _add_jobs_table(cursor):
+    """Фоновые задачи (пакетная обработка, тестовый набор) и их прогресс"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_type TEXT NOT NULL,
+            params TEXT,
+            state TEXT NOT NULL,
+            total INTEGER DEFAULT 0,
+            processed INTEGER DEFAULT 0,
+            failed INTEGER DEFAULT 0,
+            checkpoint INTEGER DEFAULT 0,
+            error_message TEXT,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state)')
+
+def _add_url_status_table(cursor):
+    """Последнее состояние каждого URL для инкрементального обхода"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS url_status (
+            url TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            products_count INTEGER,
+            last_scraped TIMESTAMP,
+            error_message TEXT
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_url_status_last_scraped ON url_status (last_scraped)')
+    
+    # Для существующих баз берем последнюю запись истории по каждому URL
+    cursor.execute('''
+        INSERT OR REPLACE INTO url_status (url, status, products_count, last_scraped, error_message)
+        SELECT url, status, products_count, scraping_date, error_message
+        FROM scraping_history
+        WHERE id IN (SELECT MAX(id) FROM scraping_history GROUP BY url)
+    ''')
+
+def _add_content_hash(cursor):
+    """Хеш очищенного текста последней успешной обработки URL"""
+    cursor.execute('ALTER TABLE url_status ADD COLUMN content_hash TEXT')
+
+def _add_products_fts(cursor):
+    """Полнотекстовый индекс FTS5 по названиям товаров (содержимое берется из products)"""
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            product_name,
+            url UNINDEXED,
+            confidence UNINDEXED,
+            extraction_date UNINDEXED,
+            content = 'products',
+            content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    ''')
+    # Для существующих баз индекс строится по уже сохраненным товарам
+    cursor.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+
+def _add_product_clusters(cursor):
+    """Кластеры похожих названий товаров; счетчики популярности ведутся по кластерам"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_clusters (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            canonical_name TEXT NOT NULL,
+            canonical_key TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_product_clusters_count ON product_clusters (count DESC)')
+    # Нормализованный ключ названия -> кластер (точные повторы не пересчитывают MinHash)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_keys (
+            name_key TEXT PRIMARY KEY,
+            cluster_id INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    # LSH-корзины кластеров для поиска кандидатов
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cluster_buckets (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            cluster_id INTEGER NOT NULL,
+            PRIMARY KEY (band, bucket, cluster_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('ALTER TABLE products ADD COLUMN cluster_id INTEGER')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_products_cluster ON products (cluster_id)')
+    
+    # Для существующих баз кластеры строятся по уже сохраненным названиям; самые
+    # частые названия обрабатываются первыми и становятся каноническими
+    cursor.execute('SELECT product_name FROM products GROUP BY product_name ORDER BY COUNT(*) DESC')
+    names = [row[0] for row in cursor.fetchall()]
+    clusterer = ProductClusterer()
+    cursor.execute('CREATE TEMP TABLE name_clusters (product_name TEXT PRIMARY KEY, cluster_id INTEGER)')
+    cursor.executemany('INSERT INTO name_clusters (product_name, cluster_id) VALUES (?, ?)', [
+        (name, clusterer.assign(cursor, clusterer.prepare(name))) for name in names
+    ])
+    cursor.execute('''
+        UPDATE products SET cluster_id = (
+            SELECT cluster_id FROM name_clusters WHERE name_clusters.product_name = products.product_name
+        )
+    ''')
+    cursor.execute('DROP TABLE name_clusters')
+    cursor.execute('''
+        UPDATE product_clusters SET count = (
+            SELECT COUNT(*) FROM products WHERE products.cluster_id = product_clusters.id
+        )
+    ''')
+    # Счетчики по точным названиям заменены счетчиками кластеров
+    cursor.execute('DROP TABLE IF EXISTS product_counts')
+
+def _add_data_version(cursor):
+    """Номер версии данных панели: увеличивается каждой записью результатов URL"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)')
+
+# Миграции схемы по порядку; новые добавляются только в конец
+MIGRATIONS = [
+    _add_indexes_and_product_counts,
+    _add_jobs_table,
+    _add_url_status_table,
+    _add_content_hash,
+    _add_products_fts,
+    _add_product_clusters,
+    _add_data_version,
+]
+
+# Слова поискового запроса (без знаков препинания и операторов FTS5)
+SEARCH_WORD_RE = re.compile(r'\w+')
+
+JOB_COLUMNS = 'id, job_type, params, state, total, processed, failed, checkpoint, error_message, created_at, updated_at'
+
+class _ThreadConnection:
+    """Соединение потока в threading.local; освобождается вместе с потоком"""
+    def __init__(self, conn):
+        self.conn = conn
+
+def _close_connection(conn, connections, lock):
+    with lock:
+        connections.discard(conn)
+    conn.close()
+
+def _job_from_row(row):
+    job = dict(zip([name.strip() for name in JOB_COLUMNS.split(',')], row))
+    job['params'] = json.loads(job['params']) if job['params'] else {}
+    return job
 
 class Database:
     def __init__(self, db_path):
         self.db_path = db_path
         # Проверяем, существует ли директория
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        
+        # Одно соединение на поток вместо нового соединения на каждый запрос
+        self._local = threading.local()
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+        
+        # Отнесение новых названий к кластерам одного товара для статистики
+        self.clusterer = ProductClusterer()
+        
         self.init_db()
     
-    def init_db(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _get_connection(self):
+        """Соединение текущего потока (создается при первом обращении)
+        
+        Когда поток завершается, его threading.local освобождается, и
+        соединение закрывается и убирается из списка открытых. Иначе
+        сервер, запускающий поток на каждый запрос, копил бы соединения.
+        """
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            # Транзакциями управляем сами через transaction()
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            for pragma in PRAGMAS:
+                conn.execute(pragma)
+            holder = self._local.holder = _ThreadConnection(conn)
+            with self._connections_lock:
+                self._connections.add(conn)
+            weakref.finalize(holder, _close_connection, conn, self._connections, self._connections_lock)
+        return holder.conn
+    
+    @contextmanager
+    def transaction(self):
+        """Транзакция на соединении текущего потока; вложенные вызовы входят во внешнюю"""
+        conn = self._get_connection()
+        if conn.in_transaction:
+            yield conn.cursor()
+            return
         
+        # Ожидание блокировки записи тоже видно в таймингах
+        with timed('db.begin'):
+            conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn.cursor()
+        except BaseException:
+            conn.rollback()
+            raise
+        with timed('db.commit'):
+            conn.commit()
+    
+    def close(self):
+        """Закрытие всех открытых соединений"""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+    
+    def batch_writer(self, batch_size=50):
+        """Буферизованная запись результатов многих URL в общих транзакциях"""
+        return BatchWriter(self, batch_size)
+    
+    def init_db(self):
+        with self.transaction() as cursor:
+            self._create_schema(cursor)
+            self._migrate(cursor)
+    
+    def _create_schema(self, cursor):
+        """Исходные таблицы"""
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS products (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -35,72 +288,276 @@ class Database:
                 error_message TEXT
             )
         ''')
-        
-        conn.commit()
-        conn.close()
     
-    def save_products(self, url, products):
+    def _migrate(self, cursor):
+        """Применение миграций, которых еще нет в базе (номер хранится в user_version)"""
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(cursor)
+            cursor.execute(f'PRAGMA user_version = {number}')
+    
+    def _prepare_names(self, products):
+        """MinHash названий товаров для кластеров; считается до транзакции, не под блокировкой записи"""
+        with timed('db.prepare_clusters'):
+            return [self.clusterer.prepare(product['name']) for product in products]
+    
+    def save_products(self, url, products, content_hash=None):
         """Сохранение продуктов в базу данных"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        prepared = self._prepare_names(products)
+        with timed('db.save_products'), self.transaction() as cursor:
+            self._insert_products(cursor, url, products, content_hash, prepared)
         
-        for product in products:
-            cursor.execute('''
-                INSERT INTO products (url, product_name, confidence, extraction_date, metadata)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
+        return True
+    
+    def save_unchanged(self, url):
+        """Отметка повторной обработки URL, текст которого не изменился"""
+        with timed('db.save_unchanged'), self.transaction() as cursor:
+            self._touch_unchanged(cursor, url)
+    
+    def save_error(self, url, error_message):
+        """Сохранение ошибки скрапинга"""
+        with timed('db.save_error'), self.transaction() as cursor:
+            self._insert_error(cursor, url, error_message)
+    
+    def save_results(self, results):
+        """Сохранение результатов многих URL одной транзакцией
+        
+        results - список кортежей (url, products, content_hash) для успешных URL,
+        (url, None, error_message) для ошибок и (url, None) для URL, текст
+        которых не изменился.
+        """
+        count('db.results_batched', len(results))
+        prepared = [self._prepare_names(result[1]) if result[1] is not None else None for result in results]
+        with timed('db.save_results'), self.transaction() as cursor:
+            for result, names in zip(results, prepared):
+                if result[1] is not None:
+                    self._insert_products(cursor, *result, names)
+                elif len(result) == 3:
+                    self._insert_error(cursor, result[0], result[2])
+                else:
+                    self._touch_unchanged(cursor, result[0])
+    
+    def _insert_products(self, cursor, url, products, content_hash, prepared):
+        now = datetime.now()
+        
+        # Повторная обработка URL заменяет его прежние товары, а не дописывает к ним
+        self._delete_products(cursor, url)
+        
+        with timed('db.assign_clusters'):
+            cluster_ids = [self.clusterer.assign(cursor, name) for name in prepared]
+        
+        cursor.executemany('''
+            INSERT INTO products (url, product_name, confidence, extraction_date, metadata, cluster_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            (
                 url,
                 product['name'],
                 product.get('confidence', 0.0),
-                datetime.now(),
-                json.dumps(product.get('metadata', {}))
-            ))
+                now,
+                json.dumps(product.get('metadata', {})),
+                cluster_id
+            )
+            for product, cluster_id in zip(products, cluster_ids)
+        ])
         
+        # Полнотекстовый индекс обновляется в той же транзакции; после удаления
+        # прежних товаров все строки URL - только что вставленные
         cursor.execute('''
-            INSERT INTO scraping_history (url, status, products_count, scraping_date)
-            VALUES (?, ?, ?, ?)
-        ''', (url, 'success', len(products), datetime.now()))
+            INSERT INTO products_fts (rowid, product_name, url, confidence, extraction_date)
+            SELECT id, product_name, url, confidence, extraction_date FROM products WHERE url = ?
+        ''', (url,))
         
-        conn.commit()
-        conn.close()
+        # Счетчики популярности кластеров обновляются вместе со вставкой строк
+        cursor.executemany('''
+            UPDATE product_clusters SET count = count + ? WHERE id = ?
+        ''', [(n, cluster_id) for cluster_id, n in Counter(cluster_ids).items()])
         
-        return True
+        cursor.execute('''
+            INSERT INTO scraping_history (url, status, products_count, scraping_date)
+            VALUES (?, ?, ?, ?)
+        ''', (url, 'success', len(products), now))
+        self._update_url_status(cursor, url, 'success', len(products), now, content_hash=content_hash)
+        self._bump_version(cursor)
+        count('db.product_rows_written', len(products))
     
-    def save_error(self, url, error_message):
-        """Сохранение ошибки скрапинга"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+    def _insert_error(self, cursor, url, error_message):
+        now = datetime.now()
         cursor.execute('''
             INSERT INTO scraping_history (url, status, products_count, scraping_date, error_message)
             VALUES (?, ?, ?, ?, ?)
-        ''', (url, 'error', 0, datetime.now(), error_message))
+        ''', (url, 'error', 0, now, error_message))
+        # Товары прошлой успешной обработки остаются, поэтому сохраняются и их число,
+        # и хеш текста: неизменившаяся страница после сбоя не разбирается заново
+        cursor.execute('''
+            INSERT INTO url_status (url, status, products_count, last_scraped, error_message)
+            VALUES (?, 'error', 0, ?, ?)
+            ON CONFLICT (url) DO UPDATE SET
+                status = excluded.status,
+                last_scraped = excluded.last_scraped,
+                error_message = excluded.error_message
+        ''', (url, now, error_message))
+        self._bump_version(cursor)
+    
+    def _touch_unchanged(self, cursor, url):
+        """Обновление времени последней обработки без новых строк товаров
+        
+        Если прошлая обработка закончилась ошибкой, URL снова получает статус
+        success с прежними товарами и запись в истории.
+        """
+        now = datetime.now()
+        cursor.execute('SELECT status, products_count FROM url_status WHERE url = ?', (url,))
+        row = cursor.fetchone()
+        if row and row[0] != 'success':
+            cursor.execute('''
+                INSERT INTO scraping_history (url, status, products_count, scraping_date)
+                VALUES (?, ?, ?, ?)
+            ''', (url, 'success', row[1] or 0, now))
+            cursor.execute('''
+                UPDATE url_status SET status = 'success', last_scraped = ?, error_message = NULL WHERE url = ?
+            ''', (now, url))
+        else:
+            cursor.execute('''
+                UPDATE scraping_history SET scraping_date = ?
+                WHERE id = (SELECT MAX(id) FROM scraping_history WHERE url = ?)
+            ''', (now, url))
+            cursor.execute('UPDATE url_status SET last_scraped = ? WHERE url = ?', (now, url))
+        self._bump_version(cursor)
+        count('db.unchanged_touched')
+    
+    def _delete_products(self, cursor, url):
+        """Удаление товаров URL вместе с их вкладом в счетчики кластеров"""
+        cursor.execute('''
+            SELECT cluster_id, COUNT(*) FROM products WHERE url = ? GROUP BY cluster_id
+        ''', (url,))
+        previous = cursor.fetchall()
+        if not previous:
+            return
+        
+        # Опустевшие кластеры остаются: на них ссылаются ключи и корзины названий
+        cursor.executemany('''
+            UPDATE product_clusters SET count = count - ? WHERE id = ?
+        ''', [(n, cluster_id) for cluster_id, n in previous if cluster_id is not None])
+        # Из индекса с внешним содержимым строки удаляются командой 'delete' с прежними значениями
+        cursor.execute('''
+            INSERT INTO products_fts (products_fts, rowid, product_name, url, confidence, extraction_date)
+            SELECT 'delete', id, product_name, url, confidence, extraction_date FROM products WHERE url = ?
+        ''', (url,))
+        cursor.execute('DELETE FROM products WHERE url = ?', (url,))
+    
+    def _update_url_status(self, cursor, url, status, products_count, scraping_date, error_message=None,
+                           content_hash=None):
+        # Запись без хеша сбрасывает хеш, и следующая обработка разберет страницу заново
+        cursor.execute('''
+            INSERT OR REPLACE INTO url_status (url, status, products_count, last_scraped, error_message, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (url, status, products_count, scraping_date, error_message, content_hash))
+    
+    def _bump_version(self, cursor):
+        """Новая версия данных в той же транзакции, что и запись"""
+        cursor.execute('UPDATE data_version SET version = version + 1 WHERE id = 1')
+    
+    def get_data_version(self):
+        """Текущая версия данных статистики и истории (меняется при каждой записи результатов)
+        
+        Запрос читает одну строку, поэтому по версии дешево проверять, изменились
+        ли данные, не выполняя запросы статистики. Версия общая для всех
+        процессов, пишущих в базу.
+        """
+        cursor = self._get_connection().cursor()
+        cursor.execute('SELECT version FROM data_version WHERE id = 1')
+        return cursor.fetchone()[0]
+    
+    def get_content_hash(self, url):
+        """Хеш текста последней успешной обработки URL или None
         
-        conn.commit()
-        conn.close()
+        Ошибка загрузки хеш не сбрасывает: товары с той обработки остаются в базе.
+        """
+        cursor = self._get_connection().cursor()
+        cursor.execute('SELECT content_hash FROM url_status WHERE url = ?', (url,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    
+    def filter_pending_urls(self, urls, stale_before):
+        """URL, которые нужно обработать: новые, с ошибкой или обработанные раньше stale_before
+        
+        Порядок исходного списка сохраняется.
+        """
+        cursor = self._get_connection().cursor()
+        fresh = set()
+        
+        # Проверяем частями, чтобы не упереться в лимит параметров SQLite
+        for start in range(0, len(urls), 500):
+            chunk = urls[start:start + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            cursor.execute(f'''
+                SELECT url FROM url_status
+                WHERE url IN ({placeholders}) AND status = 'success' AND last_scraped >= ?
+            ''', (*chunk, stale_before))
+            fresh.update(row[0] for row in cursor.fetchall())
+        
+        return [url for url in urls if url not in fresh]
     
     def get_products_stats(self):
         """Получение статистики по продуктам"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._get_connection().cursor()
         
+        # Готовые счетчики кластеров читаются по индексу, без GROUP BY по всей таблице;
+        # варианты названия одного товара считаются вместе под каноническим названием
         cursor.execute('''
-            SELECT product_name, COUNT(*) as count 
-            FROM products 
-            GROUP BY product_name 
-            ORDER BY count DESC 
+            SELECT canonical_name, count
+            FROM product_clusters
+            WHERE count > 0
+            ORDER BY count DESC
             LIMIT 20
         ''')
         
         stats = cursor.fetchall()
-        conn.close()
         
         return [{'name': row[0], 'count': row[1]} for row in stats]
     
+    def search_products(self, query, limit=20, offset=0, candidates=None):
+        """Товары, названия которых содержат все слова запроса, от наиболее релевантных
+        
+        Последнее слово ищется как префикс, чтобы поиск работал по мере ввода.
+        Оценка bm25 считается для каждой найденной строки, поэтому по частым
+        словам ранжируются только candidates самых новых совпадений: время
+        запроса не растет с размером таблицы. Ранжирование не глобальное -
+        более старое совпадение с лучшей оценкой в результат не попадет, - и
+        постранично доступны только эти candidates строк: offset за ними
+        дает пустой список.
+        """
+        words = SEARCH_WORD_RE.findall(query)
+        if not words:
+            return []
+        # Слова берутся в кавычки, поэтому операторы FTS5 во вводе не мешают запросу
+        match = ' '.join(f'"{word}"' for word in words) + '*'
+        
+        cursor = self._get_connection().cursor()
+        with timed('db.search_products'):
+            cursor.execute('''
+                SELECT p.id, p.product_name, p.url, p.confidence, p.extraction_date, m.score
+                FROM (
+                    SELECT rowid, rank AS score FROM products_fts
+                    WHERE products_fts MATCH ?
+                    ORDER BY rowid DESC
+                    LIMIT ?
+                ) AS m
+                JOIN products p ON p.id = m.rowid
+                ORDER BY m.score, p.id DESC
+                LIMIT ? OFFSET ?
+            ''', (match, candidates or Config.SEARCH_MAX_CANDIDATES, limit, offset))
+            rows = cursor.fetchall()
+        
+        return [
+            {'id': row[0], 'name': row[1], 'url': row[2], 'confidence': row[3], 'date': row[4],
+             'score': round(-row[5], 4)}
+            for row in rows
+        ]
+    
     def get_recent_urls(self, limit=5):
         """Получение последних обработанных URL"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._get_connection().cursor()
         
         cursor.execute('''
             SELECT url, status, products_count, scraping_date 
@@ -110,6 +567,131 @@ class Database:
         ''', (limit,))
         
         urls = cursor.fetchall()
-        conn.close()
         
-        return [{'url': row[0], 'status': row[1], 'count': row[2], 'date': row[3]} for row in urls]
\ No newline at end of file
+        return [{'url': row[0], 'status': row[1], 'count': row[2], 'date': row[3]} for row in urls]
+    
+    def create_job(self, job_type, params):
+        """Создание задачи в состоянии queued, возвращает ее id"""
+        now = datetime.now()
+        with self.transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO jobs (job_type, params, state, created_at, updated_at)
+                VALUES (?, ?, 'queued', ?, ?)
+            ''', (job_type, json.dumps(params), now, now))
+            return cursor.lastrowid
+    
+    def claim_job(self, job_id):
+        """Атомарный перевод задачи из queued в running; False, если ее уже взял другой процесс"""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE jobs SET state = 'running', updated_at = ?
+                WHERE id = ? AND state = 'queued'
+            ''', (datetime.now(), job_id))
+            return cursor.rowcount == 1
+    
+    def update_job(self, job_id, **fields):
+        """Обновление полей задачи (state, total, processed, failed, checkpoint, error_message)"""
+        fields['updated_at'] = datetime.now()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        with self.transaction() as cursor:
+            cursor.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+    
+    def finish_job(self, job_id, state, error_message=None):
+        """Запись итогового состояния задачи, если она все еще выполняется
+        
+        Задача, отмененная во время выполнения (cancelling), вместо done
+        получает cancelled. Отмененную или возвращенную в очередь задачу
+        итог не перезаписывает; тогда возвращается False.
+        """
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE jobs SET
+                    state = CASE WHEN state = 'cancelling' AND ? = 'done' THEN 'cancelled' ELSE ? END,
+                    error_message = ?,
+                    updated_at = ?
+                WHERE id = ? AND state IN ('running', 'cancelling')
+            ''', (state, state, error_message, datetime.now(), job_id))
+            return cursor.rowcount == 1
+    
+    def touch_job(self, job_id):
+        """Отметка, что выполняющаяся задача жива (см. requeue_stale_jobs)"""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE jobs SET updated_at = ? WHERE id = ? AND state IN ('running', 'cancelling')
+            ''', (datetime.now(), job_id))
+    
+    def get_job(self, job_id):
+        """Задача по id или None"""
+        cursor = self._get_connection().cursor()
+        cursor.execute(f'SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?', (job_id,))
+        row = cursor.fetchone()
+        return _job_from_row(row) if row else None
+    
+    def get_jobs(self, limit=20, states=None):
+        """Последние задачи, при необходимости только в указанных состояниях"""
+        cursor = self._get_connection().cursor()
+        if states:
+            placeholders = ', '.join('?' for _ in states)
+            cursor.execute(f'''
+                SELECT {JOB_COLUMNS} FROM jobs WHERE state IN ({placeholders}) ORDER BY id LIMIT ?
+            ''', (*states, limit))
+        else:
+            cursor.execute(f'SELECT {JOB_COLUMNS} FROM jobs ORDER BY id DESC LIMIT ?', (limit,))
+        return [_job_from_row(row) for row in cursor.fetchall()]
+    
+    def requeue_stale_jobs(self, stale_before):
+        """Возврат в очередь задач, прерванных перезапуском (running без обновлений с stale_before)"""
+        with self.transaction() as cursor:
+            cursor.execute('''
+                UPDATE jobs SET state = 'cancelled', updated_at = ?
+                WHERE state = 'cancelling' AND updated_at < ?
+            ''', (datetime.now(), stale_before))
+            cursor.execute('''
+                UPDATE jobs SET state = 'queued', updated_at = ?
+                WHERE state = 'running' AND updated_at < ?
+            ''', (datetime.now(), stale_before))
+            return cursor.rowcount
+
+class BatchWriter:
+    """Накопление результатов URL и запись их пачками в одной транзакции.
+    
+    Потокобезопасен: save_products/save_error можно вызывать из рабочих
+    потоков пакетной обработки, а сброс в базу выполняет тот поток,
+    который заполнил буфер. Используется как контекстный менеджер.
+    """
+    def __init__(self, database, batch_size=50):
+        self.database = database
+        self.batch_size = batch_size
+        self._buffer = []
+        self._lock = threading.Lock()
+    
+    def save_products(self, url, products, content_hash=None):
+        self._add((url, products, content_hash))
+        return True
+    
+    def save_unchanged(self, url):
+        self._add((url, None))
+    
+    def save_error(self, url, error_message):
+        self._add((url, None, error_message))
+    
+    def _add(self, result):
+        with self._lock:
+            self._buffer.append(result)
+            if len(self._buffer) < self.batch_size:
+                return
+            pending, self._buffer = self._buffer, []
+        self.database.save_results(pending)
+    
+    def flush(self):
+        """Запись всех накопленных результатов"""
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+        if pending:
+            self.database.save_results(pending)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
@@ -0,0 +1,185 @@
+import gzip
+import html
+import io
+import re
+from collections import deque
+from urllib.parse import urljoin, urlsplit
+from xml.etree import ElementTree
+from config import Config
+from timings import count
+from url_utils import normalize_url
+
+# Страницы товаров и страницы каталога (категории, коллекции) по пути URL
+PRODUCT_URL_RE = re.compile('|'.join(Config.PRODUCT_URL_PATTERNS), re.IGNORECASE)
+COLLECTION_URL_RE = re.compile('|'.join(Config.COLLECTION_URL_PATTERNS), re.IGNORECASE)
+HREF_RE = re.compile(r'<a\s[^>]*?href\s*=\s*["\']([^"\'#]+)', re.IGNORECASE)
+ROBOTS_SITEMAP_RE = re.compile(r'^\s*sitemap\s*:\s*(\S+)', re.IGNORECASE | re.MULTILINE)
+GZIP_MAGIC = b'\x1f\x8b'
+
+def parse_sitemap(data, max_urls=Config.SITEMAP_MAX_URLS):
+    """Пары (вид, URL) из sitemap.xml, в том числе сжатого gzip.
+
+    Вид - 'sitemap' для вложенных файлов индекса sitemap и 'page' для
+    страниц. Файл разбирается и распаковывается потоково, разобранные
+    элементы сразу освобождаются; обрезанный или испорченный файл отдает
+    то, что успело разобраться.
+    """
+    stream = io.BytesIO(data)
+    if data[:2] == GZIP_MAGIC:
+        stream = gzip.GzipFile(fileobj=stream)
+
+    found = 0
+    try:
+        for _, element in ElementTree.iterparse(stream, events=('end',)):
+            tag = element.tag.rsplit('}', 1)[-1]
+            if tag not in ('url', 'sitemap'):
+                continue
+            loc = next((child.text for child in element if child.tag.rsplit('}', 1)[-1] == 'loc'), None)
+            element.clear()
+            if loc and loc.strip():
+                yield ('sitemap' if tag == 'sitemap' else 'page'), loc.strip()
+                found += 1
+                if found >= max_urls:
+                    return
+    except (ElementTree.ParseError, EOFError, OSError) as e:
+        print(f"Sitemap разобран не полностью: {e}")
+
+def is_product_url(url):
+    return PRODUCT_URL_RE.search(urlsplit(url).path) is not None
+
+def is_collection_url(url):
+    return not is_product_url(url) and COLLECTION_URL_RE.search(urlsplit(url).path) is not None
+
+def _site(host):
+    host = (host or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+class Discoverer:
+    """Поиск URL товаров сайта и постановка их во фронтир обхода.
+
+    Сначала читаются sitemap из robots.txt (или /sitemap.xml), включая
+    индексы sitemap и файлы .xml.gz; страницы товаров сразу идут во
+    фронтир, страницы каталога запоминаются. Затем загружаются страницы
+    каталога, и товары берутся из ссылок на них; ссылки на другие страницы
+    каталога (например, следующие страницы списка) тоже обходятся. Учитываются
+    только URL того же сайта, число загрузок ограничено max_sitemaps и
+    max_collection_pages.
+
+    on_progress(fetched, failed) вызывается после каждой загрузки sitemap или
+    страницы каталога с числом загрузок и ошибок за все вызовы discover.
+    """
+    def __init__(self, extractor, frontier, max_sitemaps=Config.DISCOVERY_MAX_SITEMAPS,
+                 max_collection_pages=Config.DISCOVERY_MAX_COLLECTION_PAGES, on_progress=None):
+        self.extractor = extractor
+        self.frontier = frontier
+        self.max_sitemaps = max_sitemaps
+        self.max_collection_pages = max_collection_pages
+        self.on_progress = on_progress
+        self.fetched = 0
+        self.failed = 0
+
+    def discover(self, domain, should_stop=None):
+        """Поиск товаров одного сайта; возвращает статистику обхода"""
+        base = normalize_url(domain)
+        site = _site(urlsplit(base).hostname)
+        stats = {'domain': site, 'sitemaps': 0, 'collection_pages': 0, 'added': 0}
+
+        collections = self._read_sitemaps(base, site, stats, should_stop)
+        self._read_collections(collections, site, stats, should_stop)
+        print(f"Поиск URL на {site}: sitemap {stats['sitemaps']}, страниц каталога "
+              f"{stats['collection_pages']}, новых URL товаров {stats['added']}")
+        return stats
+
+    def _report(self, ok):
+        self.fetched += 1
+        if not ok:
+            self.failed += 1
+        if self.on_progress:
+            self.on_progress(self.fetched, self.failed)
+
+    def _same_site(self, url, site):
+        return _site(urlsplit(url).hostname) == site or (urlsplit(url).hostname or '').endswith('.' + site)
+
+    def _sitemap_roots(self, base):
+        """Sitemap из robots.txt, а если их нет - /sitemap.xml"""
+        try:
+            robots = self.extractor.client.fetch_bytes_sync(urljoin(base, '/robots.txt'))
+            roots = ROBOTS_SITEMAP_RE.findall(robots.decode('utf-8', 'replace'))
+        except Exception as e:
+            print(f"robots.txt для {base} не загружен: {e}")
+            roots = []
+        return roots or [urljoin(base, '/sitemap.xml')]
+
+    def _read_sitemaps(self, base, site, stats, should_stop):
+        """Обход sitemap сайта; возвращает найденные страницы каталога"""
+        queue = deque(self._sitemap_roots(base))
+        seen = set(queue)
+        collections = []
+        products = []
+
+        while queue and stats['sitemaps'] < self.max_sitemaps:
+            if should_stop and should_stop():
+                break
+            sitemap_url = queue.popleft()
+            try:
+                data = self.extractor.client.fetch_bytes_sync(sitemap_url, Config.SITEMAP_MAX_BYTES)
+            except Exception as e:
+                print(f"Sitemap {sitemap_url} не загружен: {e}")
+                self._report(ok=False)
+                continue
+            stats['sitemaps'] += 1
+            count('discovery.sitemaps')
+
+            # Все страницы sitemap товаров (например, sitemap_products_1.xml) считаются товарами
+            product_sitemap = 'product' in sitemap_url.lower()
+            for kind, url in parse_sitemap(data):
+                if not self._same_site(url, site):
+                    continue
+                if kind == 'sitemap':
+                    if url not in seen:
+                        seen.add(url)
+                        queue.append(url)
+                elif product_sitemap or is_product_url(url):
+                    products.append(url)
+                elif is_collection_url(url) and len(collections) < self.max_collection_pages:
+                    collections.append(url)
+
+                if len(products) >= Config.FRONTIER_TAKE_CHUNK:
+                    stats['added'] += self.frontier.add(products)
+                    products = []
+            self._report(ok=True)
+
+        stats['added'] += self.frontier.add(products)
+        return collections
+
+    def _read_collections(self, collections, site, stats, should_stop):
+        """Товары из ссылок на страницах каталога"""
+        queue = deque(normalize_url(url) for url in collections)
+        seen = set(queue)
+
+        while queue and stats['collection_pages'] < self.max_collection_pages:
+            if should_stop and should_stop():
+                break
+            page_url = queue.popleft()
+            try:
+                page = self.extractor.fetch_page(page_url)
+            except Exception as e:
+                print(f"Страница каталога {page_url} не загружена: {e}")
+                self._report(ok=False)
+                continue
+            stats['collection_pages'] += 1
+            count('discovery.collection_pages')
+
+            products = []
+            for href in HREF_RE.findall(page):
+                url = urljoin(page_url, html.unescape(href.strip()))
+                if not url.startswith(('http://', 'https://')) or not self._same_site(url, site):
+                    continue
+                url = normalize_url(url)
+                if is_product_url(url):
+                    products.append(url)
+                elif is_collection_url(url) and url not in seen:
+                    seen.add(url)
+                    queue.append(url)
+            stats['added'] += self.frontier.add(products)
+            self._report(ok=True)
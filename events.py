@@ -0,0 +1,105 @@
+import json
+import queue
+import threading
+import time
+from config import Config
+from timings import count
+
+def format_event(event, data):
+    """Сообщение Server-Sent Events с данными в JSON"""
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n'
+
+class EventBroker:
+    """Рассылка событий подписчикам потока /events внутри процесса.
+
+    Каждый подписчик получает свою ограниченную очередь готовых сообщений;
+    сообщение форматируется один раз на всех. Если клиент не успевает
+    читать и его очередь заполнена, новые события для него пропускаются:
+    события несут полное состояние (статистику, прогресс задачи), поэтому
+    следующее событие восполняет пропущенное.
+    """
+    def __init__(self, max_clients=Config.EVENTS_MAX_CLIENTS, queue_size=Config.EVENTS_QUEUE_SIZE):
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stopped = threading.Event()
+
+    def subscribe(self):
+        """Очередь сообщений нового подписчика или None, если подписчиков слишком много"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_clients:
+                return None
+            subscriber = queue.Queue(maxsize=self.queue_size)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def has_subscribers(self):
+        with self._lock:
+            return bool(self._subscribers)
+
+    def publish(self, event, data):
+        message = format_event(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                count('events.dropped')
+        count('events.published')
+
+    def watch(self, get_version, build, interval=Config.EVENTS_POLL_INTERVAL):
+        """Фоновая проверка версии данных: при изменении рассылается событие 'data'
+
+        get_version() - дешевый номер версии (Database.get_data_version),
+        build(version) - данные события. Так видны записи из любых потоков и
+        процессов, а данные для всех клиентов собираются один раз на версию.
+        """
+        def run():
+            last_version = None
+            while not self._stopped.wait(interval):
+                try:
+                    # Версия отслеживается и без подписчиков: новый клиент текущие данные
+                    # получает при подключении, повторять их событием не нужно
+                    version = get_version()
+                    if version != last_version and last_version is not None and self.has_subscribers():
+                        self.publish('data', build(version))
+                    last_version = version
+                except Exception as e:
+                    print(f"Ошибка при проверке версии данных: {e}")
+
+        self._watcher = threading.Thread(target=run, name='events-watcher', daemon=True)
+        self._watcher.start()
+
+    def stream(self, subscriber, keepalive=Config.EVENTS_KEEPALIVE, max_seconds=Config.EVENTS_MAX_STREAM_SECONDS):
+        """Сообщения подписчика для ответа text/event-stream
+
+        Комментарий keepalive не дает прокси закрыть простаивающее
+        соединение и позволяет заметить отключившегося клиента. Через
+        max_seconds поток заканчивается: EventSource переподключается сам
+        и при подключении получает текущие данные, а поток сервера
+        освобождается.
+        """
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield f'retry: {Config.EVENTS_RETRY_MS}\n\n'
+            while not self._stopped.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    count('events.streams_expired')
+                    return
+                try:
+                    yield subscriber.get(timeout=min(keepalive, remaining))
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        finally:
+            self.unsubscribe(subscriber)
+
+    def close(self):
+        self._stopped.set()
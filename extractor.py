@@ -1,10 +1,33 @@
-from bs4 import BeautifulSoup
-import requests
+from html_text import get_backend, decode_html
+from http_client import HttpClient, PageRejected
+from rate_limiter import HostUnavailable, backoff_delay
+from page_cache import PageCache
+from config import Config
+from keyword_matcher import KeywordMatcher
+from structured_data import find_structured_products
+from ner import get_stage
+from timings import timed, count
+import asyncio
+import hashlib
 import re
-import time
+from operator import itemgetter
+
+# Символы, которые не могут входить в название товара
+NAME_JUNK_RE = re.compile(r'[^\w\s\-\'",.«»]')
+# Слова длиннее - вероятные ошибки разбора
+MAX_WORD_LENGTH = 30
+
+def has_long_word(text):
+    """Есть ли в тексте слово длиной от MAX_WORD_LENGTH"""
+    return len(text) >= MAX_WORD_LENGTH and max(map(len, text.split())) >= MAX_WORD_LENGTH
+
+def content_hash(text):
+    """Хеш очищенного текста страницы для проверки, изменилась ли она"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
 
 class ProductExtractor:
-    def __init__(self):
+    def __init__(self, use_cache=Config.PAGE_CACHE_ENABLED, text_backend=Config.HTML_TEXT_BACKEND,
+                 use_structured_data=Config.STRUCTURED_DATA_ENABLED, use_ner=Config.NER_ENABLED):
         self.furniture_keywords = [
             # Русские ключевые слова
             'диван', 'кресло', 'стол', 'стул', 'шкаф', 'кровать', 'комод', 'тумба',
@@ -13,123 +36,233 @@ class ProductExtractor:
             'sofa', 'chair', 'table', 'desk', 'wardrobe', 'bed', 'dresser', 'cabinet',
             'shelf', 'mattress', 'furniture', 'lamp', 'couch', 'nightstand', 'bookcase'
         ]
+        self.matcher = KeywordMatcher(self.furniture_keywords)
         
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Accept': 'text/html,application/xhtml+xml',
             'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8'
         }
+        
+        # Общий пул соединений с keep-alive и дисковым кэшем страниц для всех запросов экстрактора
+        cache = PageCache() if use_cache else None
+        self.client = HttpClient(headers=self.headers, cache=cache)
+        self.text_backend_name = text_backend
+        self.text_backend = get_backend(text_backend)
+        self.use_structured_data = use_structured_data
+        self.use_ner = use_ner
     
-    def scrape_page(self, url, max_retries=2):
-        """Скрапинг веб-страницы с повторными попытками"""
+    async def fetch_page_async(self, url, max_retries=2):
+        """Загрузка HTML страницы с повторными попытками"""
         for attempt in range(max_retries):
             try:
-                # Увеличенный таймаут
-                response = requests.get(
-                    url, 
-                    timeout=30,
-                    headers=self.headers
-                )
-                response.raise_for_status()  # Проверяем статус-код
-                
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Удаляем скрипты и стили
-                for script in soup(["script", "style", "meta", "noscript", "head"]):
-                    script.decompose()
-                
-                # Извлекаем текст
-                text = soup.get_text()
-                
-                # Очистка текста
-                lines = (line.strip() for line in text.splitlines())
-                chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                text = ' '.join(chunk for chunk in chunks if chunk)
-                
-                return text
+                return await self.client.fetch(url)
+            except (PageRejected, HostUnavailable) as e:
+                # Повтор не поможет: страница не HTML, ошибка клиента 4xx или хост отключен предохранителем
+                raise Exception(f"Error scraping URL: {str(e)}")
             except Exception as e:
                 if attempt < max_retries - 1:
-                    # Увеличиваем время ожидания между попытками
-                    time.sleep(1 * (attempt + 1))
+                    # Экспоненциальная задержка со случайным разбросом; паузу по
+                    # Retry-After выдерживает лимитер хоста
+                    await asyncio.sleep(backoff_delay(attempt))
                     continue
                 raise Exception(f"Error scraping URL: {str(e)}")
     
-    def extract_products(self, url):
-        """Извлечение товаров с помощью регулярных выражений"""
-        try:
-            # Скрапим страницу
-            text = self.scrape_page(url)
-            
-            # Если скрапинг успешен, ищем товары
-            return self._find_products_in_text(text)
-        except Exception as e:
-            print(f"Ошибка при обработке {url}: {e}")
-            # Возвращаем тестовые данные в случае ошибки
-            return [
-                {'name': 'Диван угловой "Милан"', 'confidence': 0.9},
-                {'name': 'Кресло "Бергамо"', 'confidence': 0.85},
-                {'name': 'Стол журнальный "Вена"', 'confidence': 0.8},
-                {'name': 'Шкаф-купе "Верона"', 'confidence': 0.75}
-            ]
+    def html_to_text(self, html):
+        """Извлечение очищенного текста из HTML"""
+        return self.text_backend(html)
     
-    def _find_products_in_text(self, text):
-        """Поиск названий товаров в тексте"""
-        products = []
+    def fetch_page(self, url, max_retries=2):
+        """Синхронная загрузка HTML страницы"""
+        return self.client.run(self.fetch_page_async(url, max_retries))
+    
+    async def scrape_page_async(self, url, max_retries=2):
+        """Асинхронный скрапинг веб-страницы"""
+        html = await self.fetch_page_async(url, max_retries)
+        # Разбор HTML нагружает CPU, поэтому не блокируем им event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.html_to_text, html)
+    
+    def scrape_page(self, url, max_retries=2):
+        """Скрапинг веб-страницы с повторными попытками"""
+        return self.html_to_text(self.fetch_page(url, max_retries))
+    
+    def extract_products_from_html(self, html):
+        """Извлечение товаров из уже загруженного HTML (без обращения к сети)"""
+        return self._extract(self._decode(html))
+    
+    def extract_page(self, html, known_hash=None):
+        """Товары и хеш очищенного текста страницы из уже загруженного HTML
         
-        # Разбиваем текст на предложения простым способом
-        sentences = re.split(r'[.!?]+', text)
-        
-        for sentence in sentences:
-            # Для каждого ключевого слова ищем его упоминания
-            for keyword in self.furniture_keywords:
-                if keyword in sentence.lower():
-                    # Извлекаем фразу вокруг ключевого слова
-                    words = sentence.split()
-                    for i, word in enumerate(words):
-                        if keyword in word.lower():
-                            # Берем до 3 слов до и после ключевого слова
-                            start = max(0, i - 3)
-                            end = min(len(words), i + 4)
-                            product_name = ' '.join(words[start:end])
-                            
-                            # Очищаем название
-                            product_name = self._clean_product_name(product_name)
-                            
-                            if product_name and len(product_name) > 3:
-                                # Вычисляем уверенность на основе длины и наличия кавычек
-                                confidence = 0.6
-                                if '"' in product_name or "'" in product_name:
-                                    confidence += 0.2
-                                if len(product_name.split()) >= 3:
-                                    confidence += 0.1
-                                
-                                products.append({
-                                    'name': product_name,
-                                    'confidence': min(confidence, 0.95)  # Не более 0.95
-                                })
-        
-        # Дедупликация продуктов
-        unique_products = {}
+        Если хеш совпал с known_hash (страница не изменилась с прошлой
+        обработки), поиск товаров пропускается и вместо них возвращается None.
+        """
+        products, digest, ner_text = self.scan_page(html, known_hash)
+        if ner_text is not None and self.use_ner:
+            products = self.add_ner_products(ner_text, products)
+        return products, digest
+    
+    def scan_page(self, html, known_hash=None):
+        """extract_page без этапа NER: товары, хеш и текст для NER
+        
+        Текст возвращается, только если товары искались в тексте (не найдены
+        в структурированных данных), иначе вместо него None. Так NER можно
+        выполнить в другом процессе, чем разбор страницы.
+        """
+        html = self._decode(html)
+        with timed('extract.html_to_text'):
+            text = self.html_to_text(html)
+        digest = content_hash(text)
+        if digest == known_hash:
+            count('extract.unchanged')
+            return None, digest, None
+        products, ner_text = self._scan(html, text)
+        return products, digest, ner_text
+    
+    def _decode(self, html):
+        count('extract.pages')
+        with timed('extract.decode'):
+            html = decode_html(html)
+        count('extract.html_chars', len(html))
+        return html
+    
+    def _extract(self, html, text=None):
+        products, ner_text = self._scan(html, text)
+        if ner_text is not None and self.use_ner:
+            products = self.add_ner_products(ner_text, products)
+        return products
+    
+    def _scan(self, html, text=None):
+        """Товары без NER и текст, в котором их искали (None для структурированных данных)"""
+        # Структурированные данные о товаре точнее и дешевле поиска по всему тексту
+        if self.use_structured_data:
+            with timed('extract.structured_data'):
+                products = find_structured_products(html)
+            if products:
+                count('extract.structured_hits')
+                return self._rank_structured_products(products), None
+        
+        if text is None:
+            with timed('extract.html_to_text'):
+                text = self.html_to_text(html)
+        with timed('extract.find_products'):
+            products = self._find_products_in_text(text)
+        return products, text
+    
+    def _rank_structured_products(self, products):
+        """Понижение уверенности структурированных товаров без ключевых слов мебели"""
         for product in products:
+            if not self.matcher.matches(product['name']):
+                count('extract.structured_unmatched')
+                product['confidence'] = min(product['confidence'], Config.STRUCTURED_DATA_UNMATCHED_CONFIDENCE)
+        # Сортировка устойчивая: при равной уверенности порядок на странице сохраняется
+        return sorted(products, key=itemgetter('confidence'), reverse=True)
+    
+    def add_ner_products(self, text, products):
+        """Объединение товаров из окон ключевых слов с найденными моделью NER"""
+        stage = get_stage()
+        if stage is None:
+            return products
+        
+        with timed('extract.ner'):
+            try:
+                found = stage.extract(text)
+            except Exception as e:
+                print(f"Ошибка NER: {e}")
+                return products
+        count('extract.ner_products', len(found))
+        
+        unique_products = {}
+        for product in found + products:
             name_lower = product['name'].lower()
             if name_lower not in unique_products or unique_products[name_lower]['confidence'] < product['confidence']:
                 unique_products[name_lower] = product
         
-        # Сортировка по уверенности
-        result = list(unique_products.values())
-        result.sort(key=lambda x: x['confidence'], reverse=True)
+        result = sorted(unique_products.values(), key=lambda x: x['confidence'], reverse=True)
+        return result[:20]
+    
+    async def extract_products_async(self, url):
+        """Асинхронное извлечение товаров со страницы; ошибка загрузки или разбора передается вызывающему"""
+        html = await self.fetch_page_async(url)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.extract_products_from_html, html)
+    
+    def extract_url(self, url, known_hash=None):
+        """Загрузка страницы и extract_page
         
-        return result[:20]  # Возвращаем топ-20 товаров
+        Ошибка не подменяется товарами: вызывающий код записывает ее через
+        save_error, и товары прошлой успешной обработки остаются в базе.
+        """
+        return self.extract_page(self.fetch_page(url), known_hash)
     
-    def _clean_product_name(self, name):
-        """Очистка названия продукта"""
-        # Удаляем лишние символы
-        name = re.sub(r'[^\w\s\-\'",.«»]', ' ', name)
+    def extract_products(self, url):
+        """Извлечение товаров с помощью регулярных выражений; при ошибке - исключение"""
+        # Скачиваем страницу
+        html = self.fetch_page(url)
         
-        # Удаляем множественные пробелы
-        name = re.sub(r'\s+', ' ', name).strip()
+        # Если загрузка успешна, ищем товары
+        return self.extract_products_from_html(html)
+    
+    def close(self):
+        """Закрытие пула соединений и кеша страниц"""
+        self.client.close()
+        if self.client.cache is not None:
+            self.client.cache.close()
+    
+    def _find_products_in_text(self, text):
+        """Поиск названий товаров в тексте"""
+        # Окна слов вокруг всех вхождений ключевых слов за один проход по тексту
+        return self._products_from_windows(self.matcher.find_windows(text))
+    
+    def _products_from_windows(self, windows):
+        """Названия товаров из окон слов: очистка, оценка уверенности и дедупликация"""
+        if not windows:
+            return []
+        
+        # Пары (уверенность, название); словари результата строятся только для топ-20
+        products = []
+        
+        # Повторяющиеся окна дают то же название, поэтому очищаем каждое один раз;
+        # очистка всех окон страницы - один замер, а не по замеру на окно
+        with timed('extract.clean_product_name'):
+            names = [self._clean_product_name(window) for window in dict.fromkeys(windows)]
+        
+        for product_name in names:
+            if len(product_name) > 3:
+                # Вычисляем уверенность на основе длины и наличия кавычек
+                confidence = 0.6
+                if '"' in product_name or "'" in product_name:
+                    confidence += 0.2
+                # Очищенное слово может распасться на несколько, поэтому считаем пробелы в названии
+                if product_name.count(' ') >= 2:
+                    confidence += 0.1
+                products.append((min(confidence, 0.95), product_name))  # Не более 0.95
+        
+        count('extract.candidates', len(products))
         
-        # Удаляем слишком длинные слова (вероятные ошибки)
-        words = [w for w in name.split() if len(w) < 30]
+        # Дедупликация продуктов по нормализованному названию:
+        # остается вариант с наибольшей уверенностью
+        unique_products = {}
+        for product in products:
+            key = product[1].lower()
+            existing = unique_products.get(key)
+            if existing is None or existing[0] < product[0]:
+                unique_products[key] = product
+        
+        # Сортировка по уверенности (устойчивая: при равной уверенности порядок появления)
+        top = sorted(unique_products.values(), key=itemgetter(0), reverse=True)
         
-        return ' '.join(words)
\ No newline at end of file
+        # Возвращаем топ-20 товаров
+        return [{'name': name, 'confidence': confidence} for confidence, name in top[:20]]
+    
+    def _clean_product_name(self, name):
+        """Очистка названия продукта из окна слов, склеенного через один пробел
+
+        Большинство окон уже чистые и становятся названием как есть, без
+        новых строк; в остальных удаляются лишние символы и длинные слова.
+        """
+        cleaned, replaced = NAME_JUNK_RE.subn(' ', name)
+        if not replaced and not has_long_word(name):
+            return name
+        # split() заодно убирает множественные пробелы; слишком длинные слова - вероятные ошибки
+        return ' '.join([w for w in cleaned.split() if len(w) < MAX_WORD_LENGTH])
\ No newline at end of file
@@ -0,0 +1,287 @@
+import math
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from itertools import chain, zip_longest
+from urllib.parse import urlsplit
+from config import Config
+from timings import count
+from url_source import url_key
+from url_utils import normalize_url
+from bloom import BloomFilter
+
+class Frontier:
+    """Постоянный фронтир обхода: очереди URL по доменам в SQLite.
+
+    URL хранятся на диске, в памяти - только фильтр Блума для быстрой
+    проверки повторов и словарь выданных, но еще не обработанных URL.
+    Повторы окончательно отсекает уникальный индекс по url: фильтр процесса
+    не видит URL, добавленных другими процессами, пока не сохранится. take отдает URL
+    по очереди из разных доменов, чтобы пул загрузки не упирался в лимит
+    одного хоста. Выданные URL отмечаются done после обработки; выданные, но
+    не отмеченные за lease секунд (процесс остановлен или завис) take
+    возвращает в очередь. Так фронтир можно открыть из нескольких процессов:
+    URL, которые обрабатывает другой процесс, не выдаются повторно.
+    """
+    def __init__(self, path=Config.FRONTIER_PATH, capacity=Config.FRONTIER_CAPACITY,
+                 error_rate=Config.FRONTIER_ERROR_RATE, lease=Config.FRONTIER_LEASE,
+                 save_every=Config.FRONTIER_SAVE_EVERY):
+        self.path = path
+        self.lease = lease
+        self.save_every = save_every
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._lock = threading.Lock()
+        self._domains = {}
+        self._taken = {}
+        self._unsaved = 0
+
+        with self._transaction() as cursor:
+            self._create_schema(cursor)
+            self.bloom = self._load_bloom(cursor, capacity, error_rate)
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield self._conn.cursor()
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._conn.commit()
+
+    def _create_schema(self, cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS frontier_domains (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                domain TEXT NOT NULL UNIQUE,
+                queued INTEGER NOT NULL DEFAULT 0,
+                last_taken REAL NOT NULL DEFAULT 0
+            )
+        ''')
+        # Домены с URL в очереди, начиная с тех, из которых брали давнее всего
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_frontier_domains_next ON frontier_domains (last_taken) WHERE queued > 0
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS frontier (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                domain_id INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                state TEXT NOT NULL,
+                added_at TIMESTAMP,
+                taken_at REAL
+            )
+        ''')
+        # Фронтиры, созданные до появления срока выдачи
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(frontier)')]
+        if 'taken_at' not in columns:
+            cursor.execute('ALTER TABLE frontier ADD COLUMN taken_at REAL')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_frontier_queue ON frontier (domain_id, state, id)')
+        self._create_url_index(cursor)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_frontier_taken ON frontier (taken_at) WHERE state = 'taken'")
+        # Сохраненный фильтр Блума и число строк frontier, которое он покрывает
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS frontier_meta (
+                name TEXT PRIMARY KEY,
+                value
+            )
+        ''')
+
+    def _create_url_index(self, cursor):
+        """Уникальный индекс по url; повторы из фронтиров, созданных без него, удаляются"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_frontier_url'")
+        if cursor.fetchone():
+            return
+        # Остается первая строка URL, счетчики очередей пересчитываются
+        cursor.execute('DELETE FROM frontier WHERE id NOT IN (SELECT MIN(id) FROM frontier GROUP BY url)')
+        if cursor.rowcount:
+            print(f"Фронтир: удалено {cursor.rowcount} повторов URL")
+            cursor.execute('''
+                UPDATE frontier_domains SET queued = (
+                    SELECT COUNT(*) FROM frontier WHERE domain_id = frontier_domains.id AND state = 'queued'
+                )
+            ''')
+        cursor.execute('CREATE UNIQUE INDEX idx_frontier_url ON frontier (url)')
+
+    def _requeue_expired(self, cursor):
+        """Возврат в очередь URL, выданных больше lease секунд назад и не обработанных"""
+        expired_before = time.time() - self.lease
+        # Строки без taken_at выданы до появления срока выдачи
+        cursor.execute('''
+            SELECT domain_id, COUNT(*) FROM frontier
+            WHERE state = 'taken' AND (taken_at IS NULL OR taken_at < ?)
+            GROUP BY domain_id
+        ''', (expired_before,))
+        expired = cursor.fetchall()
+        if not expired:
+            return
+        cursor.execute('''
+            UPDATE frontier SET state = 'queued', taken_at = NULL
+            WHERE state = 'taken' AND (taken_at IS NULL OR taken_at < ?)
+        ''', (expired_before,))
+        cursor.executemany('UPDATE frontier_domains SET queued = queued + ? WHERE id = ?', [
+            (n, domain_id) for domain_id, n in expired
+        ])
+        requeued = sum(n for _, n in expired)
+        count('frontier.requeued', requeued)
+        print(f"Фронтир: {requeued} URL с истекшим сроком выдачи возвращены в очередь")
+
+    def _load_bloom(self, cursor, capacity, error_rate):
+        """Сохраненный фильтр Блума, дополненный URL после сохранения, или новый"""
+        bloom = BloomFilter(capacity, error_rate)
+        cursor.execute("SELECT value FROM frontier_meta WHERE name IN ('bloom', 'bloom_rows') ORDER BY name")
+        saved = [row[0] for row in cursor.fetchall()]
+        rows = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM frontier').fetchone()[0]
+
+        # Фильтр того же размера годится; в него добавляются строки после последнего сохранения
+        covered = 0
+        if len(saved) == 2 and len(saved[0]) == len(bloom.bits) and saved[1] <= rows:
+            bloom.bits = bytearray(saved[0])
+            covered = saved[1]
+        elif rows:
+            print(f"Фронтир: фильтр повторов строится заново по {rows} URL")
+
+        self.bloom = bloom
+        self._covered = covered
+        self._catch_up(cursor)
+        return bloom
+
+    def _catch_up(self, cursor):
+        """Добавление в фильтр строк после _covered, в том числе записанных другими процессами"""
+        cursor.execute('SELECT id, url FROM frontier WHERE id > ? ORDER BY id', (self._covered,))
+        for row_id, url in cursor:
+            self.bloom.add(url_key(url))
+            self._covered = row_id
+
+    def save(self):
+        """Сохранение фильтра Блума, чтобы при следующем открытии не строить его заново"""
+        with self._lock, self._transaction() as cursor:
+            self._save_bloom(cursor)
+
+    def _save_bloom(self, cursor):
+        # Сохраняемый фильтр должен покрывать все строки до bloom_rows, а не только добавленные этим процессом
+        self._catch_up(cursor)
+        cursor.executemany('INSERT OR REPLACE INTO frontier_meta (name, value) VALUES (?, ?)', [
+            ('bloom', bytes(self.bloom.bits)),
+            ('bloom_rows', self._covered)
+        ])
+        self._unsaved = 0
+
+    def add(self, urls):
+        """Постановка новых URL в очереди их доменов; возвращает число добавленных
+
+        URL, уже записанные другим процессом, пропускает уникальный индекс.
+        """
+        with self._lock:
+            # Ключи попадают в фильтр только после записи, иначе откат потерял бы эти URL
+            keys = {}
+            for url in urls:
+                url = normalize_url(url)
+                key = url_key(url)
+                if key not in keys and key not in self.bloom:
+                    keys[key] = url
+
+            try:
+                with self._transaction() as cursor:
+                    now = time.time()
+                    added = Counter()
+                    for url in keys.values():
+                        domain_id = self._domain_id(cursor, urlsplit(url).hostname or '')
+                        cursor.execute('''
+                            INSERT OR IGNORE INTO frontier (domain_id, url, state, added_at) VALUES (?, ?, 'queued', ?)
+                        ''', (domain_id, url, now))
+                        added[domain_id] += cursor.rowcount
+                    cursor.executemany('UPDATE frontier_domains SET queued = queued + ? WHERE id = ?', [
+                        (n, domain_id) for domain_id, n in added.items() if n
+                    ])
+            except BaseException:
+                # Новые домены тоже откатились
+                self._domains.clear()
+                raise
+
+            for key in keys:
+                self.bloom.add(key)
+
+            # Периодическое сохранение: после аварийной остановки фильтр
+            # дополняется только URL, добавленными после него
+            self._unsaved += len(keys)
+            if self._unsaved >= self.save_every:
+                with self._transaction() as cursor:
+                    self._save_bloom(cursor)
+        total = sum(added.values())
+        count('frontier.added', total)
+        return total
+
+    def _domain_id(self, cursor, domain):
+        domain_id = self._domains.get(domain)
+        if domain_id is None:
+            cursor.execute('INSERT OR IGNORE INTO frontier_domains (domain) VALUES (?)', (domain,))
+            cursor.execute('SELECT id FROM frontier_domains WHERE domain = ?', (domain,))
+            domain_id = self._domains[domain] = cursor.fetchone()[0]
+        return domain_id
+
+    def take(self, limit):
+        """До limit URL из очереди, поровну из доменов, давнее всего не получавших URL"""
+        with self._lock, self._transaction() as cursor:
+            self._requeue_expired(cursor)
+            cursor.execute('''
+                SELECT id FROM frontier_domains WHERE queued > 0 ORDER BY last_taken LIMIT ?
+            ''', (limit,))
+            domain_ids = [row[0] for row in cursor.fetchall()]
+            if not domain_ids:
+                return []
+
+            quota = math.ceil(limit / len(domain_ids))
+            queues = []
+            for domain_id in domain_ids:
+                cursor.execute('''
+                    SELECT id, url FROM frontier WHERE domain_id = ? AND state = 'queued' ORDER BY id LIMIT ?
+                ''', (domain_id, quota))
+                queues.append(cursor.fetchall())
+
+            # URL разных доменов чередуются
+            taken = [row for row in chain.from_iterable(zip_longest(*queues)) if row is not None][:limit]
+            now = time.time()
+            cursor.executemany("UPDATE frontier SET state = 'taken', taken_at = ? WHERE id = ?", [
+                (now, row_id) for row_id, _ in taken
+            ])
+
+            taken_ids = {row_id for row_id, _ in taken}
+            cursor.executemany('UPDATE frontier_domains SET queued = queued - ?, last_taken = ? WHERE id = ?', [
+                (sum(1 for row_id, _ in queue if row_id in taken_ids), now, domain_id)
+                for domain_id, queue in zip(domain_ids, queues)
+            ])
+            self._taken.update((url, row_id) for row_id, url in taken)
+        count('frontier.taken', len(taken))
+        return [url for _, url in taken]
+
+    def iter_urls(self, limit=None, chunk_size=Config.FRONTIER_TAKE_CHUNK):
+        """Поток URL из фронтира частями по chunk_size (не больше limit)"""
+        taken = 0
+        while limit is None or taken < limit:
+            urls = self.take(chunk_size if limit is None else min(chunk_size, limit - taken))
+            if not urls:
+                return
+            taken += len(urls)
+            yield from urls
+
+    def done(self, urls):
+        """Отметка обработанных URL, полученных из take"""
+        with self._lock:
+            ids = [(self._taken.pop(url),) for url in urls if url in self._taken]
+            if ids:
+                with self._transaction() as cursor:
+                    cursor.executemany("UPDATE frontier SET state = 'done' WHERE id = ?", ids)
+
+    def pending(self):
+        """Число URL в очередях"""
+        with self._lock:
+            return self._conn.execute('SELECT COALESCE(SUM(queued), 0) FROM frontier_domains').fetchone()[0]
+
+    def close(self):
+        self.save()
+        self._conn.close()
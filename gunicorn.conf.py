@@ -0,0 +1,15 @@
+# Настройки gunicorn: gunicorn -c gunicorn.conf.py app:app
+from config import Config
+
+bind = '0.0.0.0:5000'
+
+# Синхронный обработчик занят потоком /events целиком, и уже несколько открытых
+# панелей не оставили бы процессов для остальных запросов. С gthread поток
+# событий занимает один поток процесса
+worker_class = 'gthread'
+workers = Config.SERVER_WORKERS
+threads = Config.EVENTS_MAX_CLIENTS + Config.SERVER_REQUEST_THREADS
+
+# Потоки /events сами закрываются через EVENTS_MAX_STREAM_SECONDS, поэтому
+# при остановке долго ждать их не нужно
+graceful_timeout = 10
@@ -0,0 +1,221 @@
+import codecs
+import re
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector, UnicodeDammit
+from config import Config
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:
+    etree = lxml_html = None
+
+# Теги, удаляемые при очистке вместе со всем содержимым
+REMOVED_TAGS = frozenset(['script', 'style', 'meta', 'noscript', 'head'])
+# Теги, чьи строки BeautifulSoup не считает текстом; CDATA внутри них остается текстом
+HIDDEN_TAGS = frozenset(['template', 'rt', 'rp'])
+# Теги, текст внутри которых не попадает в результат
+SKIP_TAGS = REMOVED_TAGS | HIDDEN_TAGS
+# Теги, внутри которых BeautifulSoup не сжимает пробельные строки
+PRESERVE_WHITESPACE_TAGS = ('pre', 'textarea')
+# Пробелы, из которых состоит сжимаемая строка (BeautifulSoup.ASCII_SPACES)
+ASCII_SPACES = ' \n\t\x0c\r'
+
+# Теги без закрывающей пары, как их понимает BeautifulSoup
+VOID_TAGS = frozenset([
+    'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame',
+    'hr', 'image', 'img', 'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta',
+    'nextid', 'param', 'source', 'spacer', 'track', 'wbr'
+])
+
+CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([-\w.:]+)', re.IGNORECASE)
+# Объявление XML в начале XHTML-страниц: lxml не принимает строку с объявленной кодировкой
+XML_DECLARATION_RE = re.compile(r'^\s*<\?xml[^>]*\?>')
+BOM_CODECS = {'utf-8': 'utf-8-sig', 'utf-16le': 'utf-16', 'utf-16be': 'utf-16', 'utf-32le': 'utf-32', 'utf-32be': 'utf-32'}
+
+def clean_text(text):
+    """Склейка текста в одну строку без лишних пробелов и пустых строк"""
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return ' '.join(chunk for chunk in chunks if chunk)
+
+def decode_html(html):
+    """Декодирование тела страницы: BOM, объявленная кодировка, UTF-8 и только затем угадывание"""
+    if isinstance(html, str):
+        return html
+
+    data, encoding = EncodingDetector.strip_byte_order_mark(html)
+    candidates = [encoding, EncodingDetector.find_declared_encoding(data, is_html=True), 'utf-8']
+    for candidate in candidates:
+        if not candidate:
+            continue
+        try:
+            return data.decode(candidate)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return UnicodeDammit(html, is_html=True).unicode_markup
+
+def sniff_encoding(head, content_type=None):
+    """Кодировка для пошагового декодирования по заголовку Content-Type, BOM,
+    объявлению в начале документа и, если ничего не указано, по содержимому"""
+    match = CHARSET_RE.search(content_type or '')
+    candidates = [match.group(1) if match else None]
+
+    _, encoding = EncodingDetector.strip_byte_order_mark(head)
+    if encoding:
+        # Кодеки *-sig и utf-16 сами отбрасывают BOM
+        return BOM_CODECS.get(encoding, encoding)
+    candidates.append(EncodingDetector.find_declared_encoding(head, is_html=True))
+
+    for candidate in candidates:
+        if not candidate:
+            continue
+        try:
+            return codecs.lookup(candidate).name
+        except LookupError:
+            continue
+
+    try:
+        # Последний символ может быть разрезан границей фрагмента
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return UnicodeDammit(head, is_html=True).original_encoding or 'windows-1252'
+
+def bs4_text(html):
+    """Исходный вариант: полное дерево BeautifulSoup и get_text()"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Удаляем скрипты и стили
+    for script in soup(["script", "style", "meta", "noscript", "head"]):
+        script.decompose()
+
+    return clean_text(soup.get_text())
+
+class _TextCollector(HTMLParser):
+    """Потоковый сбор текста без построения дерева.
+
+    Повторяет вложенность тегов так же, как html.parser-построитель
+    BeautifulSoup: закрывающий тег закрывает ближайший открытый тег с тем же
+    именем вместе со всеми вложенными, а закрывающий тег без пары
+    игнорируется. Хранится только стек имен открытых тегов.
+
+    Как и BeautifulSoup, текст между соседними тегами (комментариями,
+    объявлениями) собирается в одну строку, и строка только из пробелов
+    ASCII сжимается до перевода строки или пробела, если она не внутри
+    pre или textarea.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._data = []
+        self._stack = []
+        self._open = {}
+        self._removed = 0
+        self._hidden = 0
+
+    def _end_data(self, cdata=False):
+        """Конец строки текста: она добавляется в результат, если ее видно в get_text()"""
+        if not self._data:
+            return
+        data = ''.join(self._data)
+        self._data = []
+        if self._removed or (self._hidden and not cdata):
+            return
+        if not data.strip(ASCII_SPACES) and not any(self._open.get(tag) for tag in PRESERVE_WHITESPACE_TAGS):
+            data = '\n' if '\n' in data else ' '
+        self.parts.append(data)
+
+    def _count_skipped(self, tag, delta):
+        if tag in REMOVED_TAGS:
+            self._removed += delta
+        elif tag in HIDDEN_TAGS:
+            self._hidden += delta
+
+    def handle_starttag(self, tag, attrs):
+        self._end_data()
+        if tag in VOID_TAGS:
+            return
+        self._stack.append(tag)
+        self._open[tag] = self._open.get(tag, 0) + 1
+        self._count_skipped(tag, 1)
+
+    def handle_startendtag(self, tag, attrs):
+        # <tag/> сразу закрыт и текста не содержит, но завершает строку текста
+        self._end_data()
+
+    def handle_endtag(self, tag):
+        self._end_data()
+        if not self._open.get(tag):
+            return
+        while True:
+            name = self._stack.pop()
+            self._open[name] -= 1
+            self._count_skipped(name, -1)
+            if name == tag:
+                return
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def handle_comment(self, data):
+        self._end_data()
+
+    def handle_decl(self, decl):
+        self._end_data()
+
+    def handle_pi(self, data):
+        self._end_data()
+
+    def unknown_decl(self, data):
+        self._end_data()
+        # Содержимое CDATA BeautifulSoup считает текстом, даже внутри template, rt и rp
+        if data.upper().startswith('CDATA['):
+            self._data.append(data[len('CDATA['):])
+            self._end_data(cdata=True)
+
+    def close(self):
+        super().close()
+        self._end_data()
+
+def stream_text(html):
+    """Потоковый разбор html.parser без дерева; результат совпадает с bs4_text"""
+    collector = _TextCollector()
+    collector.feed(decode_html(html))
+    collector.close()
+    return clean_text(''.join(collector.parts))
+
+def lxml_text(html):
+    """Разбор libxml2; быстрее всего, но исправляет разметку по-своему, поэтому
+    на битом HTML текст может незначительно отличаться от bs4_text"""
+    # Страница уже декодирована, поэтому объявление XML с кодировкой не нужно
+    text = XML_DECLARATION_RE.sub('', decode_html(html), count=1)
+    if not text.strip():
+        return ''
+    try:
+        root = lxml_html.document_fromstring(text)
+    except etree.ParserError:
+        # Документ без элементов, например из одного комментария
+        return stream_text(text)
+    etree.strip_elements(root, etree.Comment, etree.ProcessingInstruction, *SKIP_TAGS, with_tail=False)
+    return clean_text(''.join(root.itertext()))
+
+BACKENDS = {
+    'bs4': bs4_text,
+    'stream': stream_text,
+    'lxml': lxml_text
+}
+
+def get_backend(name=None):
+    """Функция извлечения текста по имени; lxml без установленного пакета заменяется на stream"""
+    name = name or Config.HTML_TEXT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Неизвестный способ извлечения текста: {name}")
+    if name == 'lxml' and lxml_html is None:
+        print("lxml не установлен, используется потоковый разбор")
+        name = 'stream'
+    return BACKENDS[name]
+
+def html_to_text(html, backend=None):
+    """Извлечение очищенного текста из HTML выбранным способом"""
+    return get_backend(backend)(html)
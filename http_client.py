@@ -0,0 +1,292 @@
+import asyncio
+import codecs
+import threading
+import time
+import aiohttp
+from config import Config
+from urllib.parse import urlsplit
+from html_text import sniff_encoding
+from rate_limiter import default_limiter, default_breaker, parse_retry_after
+from timings import timed, count, observe
+
+# Типы содержимого, которые имеет смысл разбирать как HTML
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+# Размер фрагмента при потоковом чтении и сколько байт собрать для определения кодировки
+CHUNK_SIZE = 64 * 1024
+SNIFF_BYTES = 4096
+# Пауза для хоста после 429 без заголовка Retry-After (секунды)
+DEFAULT_RETRY_AFTER = 5
+# Ошибки клиента 4xx, после которых повторный запрос может пройти
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+def _trace_config():
+    """Замеры DNS и установки соединений через трассировку aiohttp"""
+    trace = aiohttp.TraceConfig()
+
+    async def dns_start(session, context, params):
+        context.dns_started = time.perf_counter()
+
+    async def dns_end(session, context, params):
+        observe('http.dns', time.perf_counter() - context.dns_started)
+
+    async def connect_start(session, context, params):
+        context.connect_started = time.perf_counter()
+
+    async def connect_end(session, context, params):
+        observe('http.connect', time.perf_counter() - context.connect_started)
+
+    async def connection_reused(session, context, params):
+        count('http.connections_reused')
+
+    trace.on_dns_resolvehost_start.append(dns_start)
+    trace.on_dns_resolvehost_end.append(dns_end)
+    trace.on_connection_create_start.append(connect_start)
+    trace.on_connection_create_end.append(connect_end)
+    trace.on_connection_reuseconn.append(connection_reused)
+    return trace
+
+class PageRejected(Exception):
+    """Ответ отклонен до чтения тела (не HTML, 404 и другие ошибки клиента); повторять запрос бессмысленно"""
+
+class HttpClient:
+    """Пул HTTP-соединений с keep-alive поверх aiohttp.
+
+    Сессия живет в собственном фоновом event loop, поэтому клиент можно
+    использовать и из корутин любого event loop, и из обычных потоков
+    (Flask, ThreadPoolExecutor) через fetch_sync.
+
+    Тело ответа читается потоком и декодируется по фрагментам, поэтому на
+    один запрос в памяти держится не больше max_bytes исходных байт;
+    ответы с типом содержимого не из HTML_CONTENT_TYPES отклоняются по
+    заголовкам, не читая тело.
+
+    Перед каждым сетевым запросом проверяется предохранитель хоста и берется
+    токен из его лимитера; по умолчанию они общие для всех клиентов процесса.
+    """
+    def __init__(self, headers=None, timeout=Config.TIMEOUT,
+                 max_connections=Config.MAX_CONNECTIONS,
+                 max_connections_per_host=Config.MAX_CONNECTIONS_PER_HOST,
+                 cache=None, max_bytes=Config.MAX_PAGE_BYTES, limiter=None, breaker=None):
+        self.headers = headers or {}
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.cache = cache
+        self.limiter = limiter or default_limiter
+        self.breaker = breaker or default_breaker
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._session = None
+
+    def _ensure_loop(self):
+        """Ленивый запуск фонового event loop"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name='http-client', daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def _get_session(self):
+        """Сессия создается внутри фонового loop при первом запросе"""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=[_trace_config()]
+            )
+        return self._session
+
+    async def _fetch(self, url):
+        entry = self.cache.get(url) if self.cache else None
+        if entry and self.cache.is_fresh(entry):
+            count('http.cache_hits')
+            return entry.body.decode('utf-8', 'replace')
+
+        # Устаревшую запись перепроверяем условным запросом
+        headers = {}
+        if entry and entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry and entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+
+        host = urlsplit(url).hostname or ''
+        await self._wait_turn(host)
+        count('http.requests')
+        try:
+            with timed('http.request'):
+                return await self._request(url, host, entry, headers)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            self.breaker.record_failure(host)
+            raise
+
+    async def _wait_turn(self, host):
+        """Отключенный хост отвечаем ошибкой сразу, остальные ждут своей очереди"""
+        self.breaker.check(host)
+        delay = self.limiter.reserve(host)
+        if delay:
+            observe('http.rate_limit_wait', delay)
+            await asyncio.sleep(delay)
+
+    async def _fetch_bytes(self, url, max_bytes):
+        host = urlsplit(url).hostname or ''
+        await self._wait_turn(host)
+        count('http.requests')
+        try:
+            with timed('http.request'):
+                async with self._get_session().get(url) as response:
+                    if response.status >= 500:
+                        self.breaker.record_failure(host)
+                    else:
+                        self.breaker.record_success(host)
+                    if response.status in (429, 503):
+                        self._slow_down(host, response)
+                    self._raise_for_status(response)
+                    return await self._read_bytes(url, response, max_bytes)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            self.breaker.record_failure(host)
+            raise
+
+    async def _request(self, url, host, entry, headers):
+        session = self._get_session()
+        async with session.get(url, headers=headers) as response:
+            if response.status >= 500:
+                self.breaker.record_failure(host)
+            else:
+                self.breaker.record_success(host)
+            if response.status in (429, 503):
+                self._slow_down(host, response)
+
+            if response.status == 304 and entry:
+                count('http.not_modified')
+                self.cache.touch(url)
+                return entry.body.decode('utf-8', 'replace')
+
+            self._raise_for_status(response)
+            content_type = response.headers.get('Content-Type', '')
+            if content_type and content_type.split(';')[0].strip().lower() not in HTML_CONTENT_TYPES:
+                raise PageRejected(f"Неподходящий тип содержимого: {content_type}")
+
+            with timed('http.download'):
+                html = await self._read_text(url, response, content_type)
+
+            # В кэше хранится уже декодированный текст в UTF-8
+            if self.cache and 'no-store' not in response.headers.get('Cache-Control', ''):
+                self.cache.put(
+                    url, html.encode('utf-8'),
+                    content_type=content_type,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified')
+                )
+            return html
+
+    def _raise_for_status(self, response):
+        """Ошибка для неуспешного ответа: 4xx, кроме RETRYABLE_CLIENT_ERRORS, повторять бессмысленно"""
+        if 400 <= response.status < 500 and response.status not in RETRYABLE_CLIENT_ERRORS:
+            count('http.client_errors')
+            raise PageRejected(f"Ответ {response.status} {response.reason or ''}".rstrip())
+        response.raise_for_status()
+
+    def _slow_down(self, host, response):
+        """Учет Retry-After: короткая пауза для хоста в лимитере, длинная - отключение хоста"""
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if retry_after is None:
+            if response.status != 429:
+                return
+            retry_after = DEFAULT_RETRY_AFTER
+        if retry_after > Config.RETRY_AFTER_MAX:
+            self.breaker.trip(host, retry_after)
+        else:
+            self.limiter.pause(host, retry_after)
+
+    async def _read_bytes(self, url, response, max_bytes):
+        """Потоковое чтение тела как есть (без декодирования), не длиннее max_bytes"""
+        parts = []
+        received = 0
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            chunk = chunk[:max_bytes - received]
+            received += len(chunk)
+            parts.append(chunk)
+            if received >= max_bytes:
+                print(f"Ответ {url} обрезан до {max_bytes} байт")
+                break
+        count('http.bytes_downloaded', received)
+        return b''.join(parts)
+
+    async def _read_text(self, url, response, content_type):
+        """Потоковое чтение тела не длиннее max_bytes с пошаговым декодированием"""
+        head = b''
+        decoder = None
+        parts = []
+        received = 0
+
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            chunk = chunk[:self.max_bytes - received]
+            received += len(chunk)
+
+            if decoder is None:
+                # Кодировку определяем по первым SNIFF_BYTES байтам
+                head += chunk
+                if len(head) < SNIFF_BYTES and received < self.max_bytes:
+                    continue
+                decoder = codecs.getincrementaldecoder(sniff_encoding(head, content_type))(errors='replace')
+                chunk, head = head, b''
+            parts.append(decoder.decode(chunk))
+
+            if received >= self.max_bytes:
+                print(f"Страница {url} обрезана до {self.max_bytes} байт")
+                break
+
+        count('http.bytes_downloaded', received)
+        if decoder is None:
+            decoder = codecs.getincrementaldecoder(sniff_encoding(head, content_type))(errors='replace')
+            parts.append(decoder.decode(head))
+        parts.append(decoder.decode(b'', final=True))
+        return ''.join(parts)
+
+    async def fetch(self, url):
+        """Загрузка страницы, возвращает декодированный HTML"""
+        loop = self._ensure_loop()
+        if asyncio.get_running_loop() is loop:
+            return await self._fetch(url)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._fetch(url), loop))
+
+    def fetch_bytes_sync(self, url, max_bytes=None):
+        """Загрузка тела ответа любого типа как байтов (sitemap.xml, .xml.gz, robots.txt)
+
+        Кэш страниц и проверка типа содержимого не используются, лимитер и
+        предохранитель хоста - те же, что для страниц.
+        """
+        return self.run(self._fetch_bytes(url, max_bytes or self.max_bytes))
+
+    def run(self, coro):
+        """Синхронное выполнение корутины в фоновом loop клиента"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    def fetch_sync(self, url):
+        """Синхронная обертка над fetch"""
+        return self.run(self._fetch(url))
+
+    def close(self):
+        """Закрытие соединений и остановка фонового loop"""
+        with self._lock:
+            loop, thread, session = self._loop, self._thread, self._session
+            self._loop = self._thread = self._session = None
+
+        if loop is None:
+            return
+        if session is not None:
+            asyncio.run_coroutine_threadsafe(session.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
@@ -0,0 +1,274 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from batch_processor import BatchProcessor
+from config import Config
+from discovery import Discoverer
+from frontier import Frontier
+
+# Состояния, из которых задача больше не выходит
+FINISHED_STATES = ('done', 'failed', 'cancelled')
+
+def run_batch_job(job, on_progress, should_stop):
+    """Пакетная обработка URL, продолжающаяся с последнего чекпоинта"""
+    params = job['params']
+    checkpoint = job['checkpoint']
+
+    batch_size = params.get('batch_size')
+    if batch_size:
+        batch_size -= checkpoint
+        if batch_size <= 0:
+            return
+
+    processor = BatchProcessor(
+        url_file=Config.URL_LIST_PATH,
+        database_path=Config.DATABASE_PATH,
+        max_workers=Config.MAX_WORKERS,
+        cpu_workers=Config.CPU_WORKERS
+    )
+    try:
+        # Результаты не накапливаем: они уже записаны в базу
+        for _ in processor.iter_batch(
+            batch_size=batch_size,
+            start_index=params.get('start_index', 0) + checkpoint,
+            on_progress=on_progress,
+            should_stop=should_stop
+        ):
+            pass
+    finally:
+        processor.close()
+
+def run_recrawl_job(job, on_progress, should_stop):
+    """Инкрементальный обход: только новые, упавшие и устаревшие URL
+
+    Чекпоинтом служит состояние URL в базе, поэтому после перезапуска
+    задача просто запускается заново и пропускает уже обработанное.
+    """
+    params = job['params']
+    processor = BatchProcessor(
+        url_file=Config.URL_LIST_PATH,
+        database_path=Config.DATABASE_PATH,
+        max_workers=Config.MAX_WORKERS,
+        cpu_workers=Config.CPU_WORKERS
+    )
+    try:
+        for _ in processor.iter_batch(
+            batch_size=params.get('batch_size'),
+            start_index=params.get('start_index', 0),
+            on_progress=on_progress,
+            should_stop=should_stop,
+            incremental=True,
+            max_age=params.get('max_age', Config.RECRAWL_AFTER)
+        ):
+            pass
+    finally:
+        processor.close()
+
+def run_discovery_job(job, on_progress, should_stop):
+    """Поиск URL товаров на сайтах params['domains'] и обработка URL из фронтира
+
+    Прогресс сначала считает загрузки поиска, затем обработанные URL.
+    После перезапуска поиск повторяется (уже известные URL фронтир
+    отбрасывает), а обработка продолжается с URL, оставшихся в очереди.
+    Фронтир один на процесс задач, поэтому такие задачи не должны идти
+    одновременно (Config.JOB_WORKERS = 1).
+    """
+    params = job['params']
+    frontier = Frontier()
+    processor = None
+    try:
+        processor = BatchProcessor(
+            url_file=Config.URL_LIST_PATH,
+            database_path=Config.DATABASE_PATH,
+            max_workers=Config.MAX_WORKERS,
+            cpu_workers=Config.CPU_WORKERS,
+            frontier=frontier
+        )
+        # Пока идет поиск, прогрессом задачи служат загрузки sitemap и страниц каталога
+        discoverer = Discoverer(
+            processor.extractor, frontier,
+            on_progress=lambda fetched, failed: on_progress(fetched, failed, 0, fetched)
+        )
+        for domain in params.get('domains', []):
+            if should_stop():
+                return
+            discoverer.discover(domain, should_stop)
+
+        for _ in processor.iter_batch(
+            batch_size=params.get('batch_size'),
+            on_progress=on_progress,
+            should_stop=should_stop,
+            incremental=params.get('incremental', False)
+        ):
+            pass
+    finally:
+        if processor is not None:
+            processor.close()
+        frontier.close()
+
+def run_test_set_job(job, on_progress, should_stop):
+    """Создание тестового набора (при перезапуске выполняется заново)"""
+    processor = BatchProcessor(
+        url_file=Config.URL_LIST_PATH,
+        database_path=Config.DATABASE_PATH,
+        max_workers=Config.MAX_WORKERS
+    )
+    try:
+        processor.create_test_set(
+            sample_size=job['params'].get('sample_size', 30),
+            output_file=Config.TEST_SET_PATH,
+            on_progress=on_progress,
+            should_stop=should_stop
+        )
+    finally:
+        processor.close()
+
+HANDLERS = {
+    'batch': run_batch_job,
+    'recrawl': run_recrawl_job,
+    'discover': run_discovery_job,
+    'test_set': run_test_set_job
+}
+
+# Задачи, которые после перезапуска продолжаются с чекпоинта, а не начинаются заново
+RESUMABLE_JOBS = {'batch'}
+
+class JobManager:
+    """Очередь фоновых задач с состоянием в SQLite.
+
+    Задачи проходят состояния queued -> running -> done/failed/cancelled
+    и выполняются ограниченным пулом потоков. Прогресс и чекпоинт
+    сохраняются в таблице jobs, поэтому задачи, прерванные перезапуском
+    процесса, возвращаются в очередь и продолжаются с чекпоинта.
+    on_change(job) вызывается после каждого изменения состояния или
+    прогресса задачи (например, для рассылки событий панели).
+    """
+    def __init__(self, database, handlers=None, max_workers=Config.JOB_WORKERS, on_change=None):
+        self.database = database
+        self.handlers = handlers or HANDLERS
+        self.on_change = on_change
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._scheduled = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sweeper = None
+
+    def start(self):
+        """Подхват задач, оставшихся после перезапуска, и периодическая проверка очереди"""
+        self._sweep()
+        self._sweeper = threading.Thread(target=self._sweep_loop, name='job-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def submit(self, job_type, params):
+        """Постановка задачи в очередь, возвращает ее id"""
+        if job_type not in self.handlers:
+            raise ValueError(f"Неизвестный тип задачи: {job_type}")
+        job_id = self.database.create_job(job_type, params)
+        self._schedule(job_id)
+        return job_id
+
+    def get(self, job_id):
+        return self.database.get_job(job_id)
+
+    def list(self, limit=20):
+        return self.database.get_jobs(limit)
+
+    def cancel(self, job_id):
+        """Отмена задачи; False, если задача не найдена или уже завершена"""
+        job = self.database.get_job(job_id)
+        if job is None or job['state'] in FINISHED_STATES:
+            return False
+        # Задача из очереди отменяется сразу, выполняющаяся - после текущих URL
+        self.database.update_job(job_id, state='cancelled' if job['state'] == 'queued' else 'cancelling')
+        self._notify(job_id)
+        return True
+
+    def shutdown(self):
+        self._stopped.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _notify(self, job_id):
+        if self.on_change is None:
+            return
+        try:
+            self.on_change(self.database.get_job(job_id))
+        except Exception as e:
+            print(f"Ошибка при уведомлении об изменении задачи {job_id}: {e}")
+
+    def _schedule(self, job_id):
+        with self._lock:
+            if job_id in self._scheduled:
+                return
+            self._scheduled.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    def _sweep(self):
+        stale_before = datetime.now() - timedelta(seconds=Config.JOB_STALE_SECONDS)
+        self.database.requeue_stale_jobs(stale_before)
+        for job in self.database.get_jobs(limit=1000, states=['queued']):
+            self._schedule(job['id'])
+
+    def _sweep_loop(self):
+        while not self._stopped.wait(Config.JOB_STALE_SECONDS / 2):
+            try:
+                self._sweep()
+            except Exception as e:
+                print(f"Ошибка при проверке очереди задач: {e}")
+
+    def _heartbeat(self, job_id, stopped):
+        while not stopped.wait(Config.JOB_HEARTBEAT_SECONDS):
+            try:
+                self.database.touch_job(job_id)
+            except Exception as e:
+                print(f"Ошибка при обновлении задачи {job_id}: {e}")
+
+    def _run(self, job_id):
+        try:
+            # Задачу мог уже взять другой процесс или ее отменили, пока она ждала в очереди
+            if not self.database.claim_job(job_id):
+                return
+            self._notify(job_id)
+            job = self.database.get_job(job_id)
+            if job['job_type'] not in RESUMABLE_JOBS:
+                job.update(checkpoint=0, failed=0)
+            base = job['checkpoint']
+            base_failed = job['failed']
+
+            def on_progress(processed, failed, checkpoint, total):
+                self.database.update_job(
+                    job_id,
+                    total=base + total,
+                    processed=base + processed,
+                    failed=base_failed + failed,
+                    checkpoint=base + checkpoint
+                )
+                self._notify(job_id)
+
+            def should_stop():
+                # Задачу отменили или вернули в очередь, и ее уже может выполнять другой процесс
+                job = self.database.get_job(job_id)
+                return job is None or job['state'] != 'running'
+
+            # Задача, долго не сообщающая о прогрессе (например, поиск URL или
+            # медленный сайт), не должна считаться прерванной перезапуском
+            heartbeat_stop = threading.Event()
+            heartbeat = threading.Thread(
+                target=self._heartbeat, args=(job_id, heartbeat_stop), name=f'job-{job_id}-heartbeat', daemon=True
+            )
+            heartbeat.start()
+            try:
+                self.handlers[job['job_type']](job, on_progress, should_stop)
+            except Exception as e:
+                self.database.finish_job(job_id, 'failed', str(e))
+                self._notify(job_id)
+                return
+            finally:
+                heartbeat_stop.set()
+                heartbeat.join()
+
+            self.database.finish_job(job_id, 'done')
+            self._notify(job_id)
+        finally:
+            with self._lock:
+                self._scheduled.discard(job_id)
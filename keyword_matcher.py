@@ -0,0 +1,92 @@
+import re
+
+# Разделители предложений (те же, что и при разбиении текста на предложения)
+SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+
+class KeywordMatcher:
+    """Поиск всех вхождений ключевых слов за один проход по тексту.
+
+    Все ключевые слова объединяются в одно скомпилированное регулярное
+    выражение, которое идет по тексту в нижнем регистре и перескакивает
+    от одного предложения с совпадением к следующему. Слова и окна
+    строятся только для таких предложений.
+    """
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+
+        # Слова с пробелами и знаками конца предложения никогда не окажутся внутри одного слова текста
+        searchable = sorted(
+            {kw for kw in self.keywords if kw and not SENTENCE_SPLIT_RE.search(kw) and len(kw.split()) == 1},
+            key=len, reverse=True
+        )
+        alternation = '|'.join(re.escape(kw) for kw in searchable)
+        self._pattern = re.compile(alternation) if searchable else None
+        # Опережающая проверка находит и пересекающиеся вхождения, по одному на позицию
+        self._overlapping = re.compile(f'(?=({alternation}))') if searchable else None
+
+        # В одной позиции регулярное выражение берет самое длинное слово, а более короткие
+        # ключевые слова, являющиеся его префиксами, совпадают там же
+        self._implied = {
+            kw: [k for k, other in enumerate(self.keywords) if other and kw.startswith(other)]
+            for kw in searchable
+        }
+
+    def matches(self, text):
+        """Есть ли в тексте хотя бы одно ключевое слово"""
+        return self._pattern is not None and self._pattern.search(text.lower()) is not None
+
+    def find_windows(self, text, before=3, after=3):
+        """Окна из слов вокруг каждого вхождения ключевого слова.
+
+        Порядок окон совпадает с порядком вложенных циклов
+        «предложение -> ключевое слово -> слово», поэтому результат
+        можно использовать вместо прежнего перебора без изменения вывода.
+        """
+        if self._pattern is None:
+            return []
+
+        windows = []
+        for sentence in self._sentences_with_hits(text):
+            lowered = sentence.lower()
+            words = sentence.split()
+            words_lower = lowered.split()
+            # Редкие символы меняют длину при lower(), тогда слова приводим к нижнему регистру по одному
+            if len(words_lower) != len(words):
+                words_lower = [word.lower() for word in words]
+
+            # Только те ключевые слова, которые действительно есть в предложении
+            present = set()
+            for keyword in set(self._overlapping.findall(lowered)):
+                present.update(self._implied[keyword])
+
+            for k in sorted(present):
+                keyword = self.keywords[k]
+                for i, word in enumerate(words_lower):
+                    if keyword in word:
+                        start = max(0, i - before)
+                        end = min(len(words), i + after + 1)
+                        windows.append(' '.join(words[start:end]))
+
+        return windows
+
+    def _sentences_with_hits(self, text):
+        """Предложения текста, содержащие хотя бы одно ключевое слово"""
+        lowered = text.lower()
+
+        if len(lowered) != len(text):
+            return [s for s in SENTENCE_SPLIT_RE.split(text) if self._pattern.search(s.lower())]
+
+        sentences = []
+        end = 0
+        match = self._pattern.search(lowered)
+        while match:
+            position = match.start()
+            # Начало предложения ищем только после конца предыдущего, чтобы проход оставался линейным
+            start = max(lowered.rfind('.', end, position), lowered.rfind('!', end, position),
+                        lowered.rfind('?', end, position)) + 1
+            separator = SENTENCE_SPLIT_RE.search(lowered, position)
+            end = separator.start() if separator else len(text)
+            sentences.append(text[start:end])
+            match = self._pattern.search(lowered, end)
+
+        return sentences
@@ -1,5 +1,25 @@
 import json
 import os
+import gzip
+from concurrent.futures import ProcessPoolExecutor
+from pipeline import process_context, _init_worker, _scan_page
+
+def _extract_from_snapshot(snapshot_path):
+    """Товары из сохраненного снимка страницы без NER, статус и текст для NER"""
+    if snapshot_path is None:
+        return [], 'error: нет снимка страницы', None
+    try:
+        with gzip.open(snapshot_path, 'rb') as f:
+            html = f.read()
+        # Новые снимки сохраняются в UTF-8, старые - в исходной кодировке страницы
+        try:
+            html = html.decode('utf-8')
+        except UnicodeDecodeError:
+            pass
+        products, _, ner_text = _scan_page(html, None)
+        return products, 'success', ner_text
+    except Exception as e:
+        return [], f'error: {str(e)}', None
 
 class Evaluator:
     def __init__(self, test_data_path):
@@ -21,8 +41,13 @@ class Evaluator:
             print(f"Ошибка при загрузке тестовых данных: {e}")
             self.test_data = []
     
-    def evaluate_model(self, extractor, max_samples=None):
-        """Оценка модели на тестовых данных"""
+    def evaluate_model(self, extractor, max_samples=None, offline=None, workers=None):
+        """Оценка модели на тестовых данных
+        
+        В офлайн-режиме товары извлекаются из снимков страниц, сохраненных
+        вместе с тестовым набором, параллельно на всех ядрах CPU. По умолчанию
+        он включается, если снимки есть у всех тестовых примеров.
+        """
         if not self.test_data:
             return {
                 'error': 'Нет тестовых данных для оценки'
@@ -31,22 +56,22 @@ class Evaluator:
         # Ограничиваем количество тестовых примеров, если указано
         test_samples = self.test_data[:max_samples] if max_samples else self.test_data
         
+        if offline is None:
+            offline = all(test_case.get('snapshot') for test_case in test_samples)
+        
+        if offline:
+            predictions = self._predict_offline(test_samples, extractor, workers)
+        else:
+            predictions = self._predict_online(test_samples, extractor)
+        
         all_true_products = []
         all_predicted_products = []
         url_results = []
         
-        for test_case in test_samples:
+        for test_case, (predicted, status) in zip(test_samples, predictions):
             url = test_case['url']
             true_products = set(test_case['products'])
-            
-            # Извлекаем продукты
-            try:
-                extracted = extractor.extract_products(url)
-                predicted_products = set([p['name'] for p in extracted])
-                status = 'success'
-            except Exception as e:
-                predicted_products = set()
-                status = f'error: {str(e)}'
+            predicted_products = set(predicted)
             
             # Сохраняем результаты для этого URL
             url_results.append({
@@ -63,12 +88,49 @@ class Evaluator:
         # Вычисляем метрики
         metrics = self.calculate_metrics(all_true_products, all_predicted_products)
         metrics['url_results'] = url_results
+        metrics['mode'] = 'offline' if offline else 'online'
         
         # Сохраняем результаты оценки
         self.save_evaluation_results(metrics)
         
         return metrics
     
+    def _predict_online(self, test_samples, extractor):
+        """Извлечение товаров со страниц в сети, по одному URL"""
+        predictions = []
+        for test_case in test_samples:
+            try:
+                extracted = extractor.extract_products(test_case['url'])
+                predictions.append(([p['name'] for p in extracted], 'success'))
+            except Exception as e:
+                predictions.append(([], f'error: {str(e)}'))
+        return predictions
+    
+    def _predict_offline(self, test_samples, extractor, workers=None):
+        """Извлечение товаров из снимков страниц в пуле процессов
+        
+        Процессы разбирают страницы с теми же настройками, что у extractor;
+        этап NER, если он включен, выполняется в этом процессе, как в Pipeline.
+        """
+        base_dir = os.path.dirname(os.path.abspath(self.test_data_path))
+        paths = [
+            os.path.join(base_dir, test_case['snapshot']) if test_case.get('snapshot') else None
+            for test_case in test_samples
+        ]
+        
+        predictions = []
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=process_context(),
+            initializer=_init_worker,
+            initargs=(extractor.text_backend_name, extractor.use_structured_data)
+        ) as executor:
+            for products, status, ner_text in executor.map(_extract_from_snapshot, paths):
+                if ner_text is not None and extractor.use_ner:
+                    products = extractor.add_ner_products(ner_text, products)
+                predictions.append(([p['name'] for p in products], status))
+        return predictions
+    
     def calculate_metrics(self, true_sets, predicted_sets):
         """Вычисление метрик качества"""
         true_positives = 0
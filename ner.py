@@ -0,0 +1,196 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from config import Config
+from timings import timed, count
+
+def chunk_words(text, window=Config.NER_WINDOW_WORDS, overlap=Config.NER_WINDOW_OVERLAP):
+    """Нарезка текста на окна по window слов с перекрытием overlap слов.
+
+    Окно в словах заведомо короче предела модели в токенах, а перекрытие не
+    дает разрезать название товара на границе окон.
+    """
+    words = text.split()
+    step = max(1, window - overlap)
+    return [' '.join(words[start:start + window]) for start in range(0, max(1, len(words) - overlap), step)]
+
+class TransformersNer:
+    """NER-модель transformers на CPU.
+
+    Модель и токенизатор загружаются при создании (имя на Hugging Face Hub или
+    путь к локальной папке с моделью). Вызов принимает список окон текста и
+    возвращает для каждого список сущностей (label, text, score) за один
+    прямой проход. labels - типы сущностей, которые размечает модель
+    (без префиксов B-/I-).
+    """
+    def __init__(self, model_name=Config.NER_MODEL, threads=Config.NER_THREADS):
+        # transformers и torch нужны только этому этапу, поэтому импортируются здесь
+        import torch
+        from transformers import AutoModelForTokenClassification, AutoTokenizer, pipeline
+
+        torch.set_num_threads(threads)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForTokenClassification.from_pretrained(model_name)
+        model.eval()
+        self.labels = {label.split('-', 1)[-1] for label in model.config.id2label.values()} - {'O'}
+        # device=-1 - только CPU; aggregation_strategy склеивает подслова в сущности
+        self._pipeline = pipeline(
+            'ner', model=model, tokenizer=tokenizer, device=-1, aggregation_strategy='simple'
+        )
+        self._torch = torch
+
+    def __call__(self, windows):
+        with self._torch.inference_mode():
+            results = self._pipeline(windows, batch_size=len(windows))
+        return [
+            [(entity['entity_group'], entity['word'], float(entity['score'])) for entity in entities]
+            for entities in results
+        ]
+
+class MicroBatcher:
+    """Объединение запросов из многих потоков в общие вызовы модели.
+
+    Фоновый поток ждет первый запрос, затем добирает следующие, пока не
+    наберется max_batch_size окон или не пройдет max_latency секунд с прихода
+    первого, и отдает всю пачку в predict одним вызовом. Так одновременные
+    запросы /extract и URL пакетной обработки делят один прямой проход, а
+    одиночный запрос ждет не дольше max_latency.
+    """
+    def __init__(self, predict, max_batch_size=Config.NER_MAX_BATCH_SIZE, max_latency=Config.NER_MAX_LATENCY):
+        self.predict = predict
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_latency = max_latency
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='ner-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Future с результатом predict для одного окна"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def map(self, items):
+        """Результаты для списка окон (окна могут попасть в разные пачки)"""
+        futures = [self.submit(item) for item in items]
+        return [future.result() for future in futures]
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_latency
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            self._run_batch(batch)
+            if stopping:
+                return
+
+    def _run_batch(self, batch):
+        # Отмененные ожидающими окна не считаем
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        count('ner.batches')
+        count('ner.batched_windows', len(batch))
+        try:
+            with timed('ner.forward'):
+                results = self.predict([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+class NerStage:
+    """Поиск названий товаров моделью NER в очищенном тексте страницы"""
+    def __init__(self, model, labels=Config.NER_LABELS, min_score=Config.NER_MIN_SCORE,
+                 max_windows=Config.NER_MAX_WINDOWS, batcher=None):
+        self.labels = set(labels)
+        self.min_score = min_score
+        self.max_windows = max_windows
+        self.batcher = batcher or MicroBatcher(model)
+
+    def extract(self, text):
+        """Товары в формате экстрактора, от наиболее уверенных"""
+        windows = chunk_words(text)[:self.max_windows]
+        if not windows or not windows[0]:
+            return []
+        count('ner.windows', len(windows))
+
+        unique_products = {}
+        for entities in self.batcher.map(windows):
+            for label, name, score in entities:
+                name = ' '.join(name.split())
+                if label not in self.labels or score < self.min_score or len(name) <= 3:
+                    continue
+                key = name.lower()
+                if key not in unique_products or unique_products[key]['confidence'] < score:
+                    unique_products[key] = {'name': name, 'confidence': round(score, 4)}
+
+        return sorted(unique_products.values(), key=lambda x: x['confidence'], reverse=True)
+
+    def close(self):
+        self.batcher.close()
+
+# Этап NER процесса: модель загружается один раз на процесс. После fork
+# поток пакетирования родителя в дочернем процессе не работает, поэтому
+# этап запоминает pid и в новом процессе создается заново
+_stage = None
+_stage_pid = None
+_stage_lock = threading.Lock()
+# Модель, заданная через set_model, вместо загрузки Config.NER_MODEL
+_model = None
+
+def get_stage():
+    """Этап NER текущего процесса или None, если модель не загрузить"""
+    global _stage, _stage_pid
+    with _stage_lock:
+        if _stage_pid != os.getpid():
+            _stage_pid = os.getpid()
+            try:
+                with timed('ner.load_model'):
+                    model = _model or TransformersNer()
+                # Модель общего назначения (PER/ORG/LOC) товаров не находит, и этап только тратил бы CPU
+                labels = getattr(model, 'labels', None)
+                if labels is not None and not labels & set(Config.NER_LABELS):
+                    raise ValueError(f"модель размечает {sorted(labels)}, а не NER_LABELS {Config.NER_LABELS}")
+                _stage = NerStage(model)
+            except Exception as e:
+                print(f"Модель NER {Config.NER_MODEL} не загружена, этап NER отключен: {e}")
+                _stage = None
+        return _stage
+
+def set_model(model):
+    """Замена модели этапа NER текущего процесса (например, заглушкой)
+
+    model - вызываемый объект: список окон -> список сущностей
+    (label, text, score) для каждого окна.
+    """
+    global _stage, _stage_pid, _model
+    with _stage_lock:
+        if _stage is not None and _stage_pid == os.getpid():
+            _stage.close()
+        _model = model
+        _stage = NerStage(model)
+        _stage_pid = os.getpid()
+        return _stage
@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+from config import Config
+from url_utils import normalize_url
+
+CachedPage = namedtuple('CachedPage', ['body', 'content_type', 'etag', 'last_modified', 'fetched_at'])
+
+class PageCache:
+    """Постоянный кэш HTTP-ответов в SQLite рядом с products.db.
+
+    Тела страниц хранятся сжатыми zlib и адресуются нормализованным URL.
+    Вместе с телом сохраняются ETag и Last-Modified для условных запросов.
+    Записи старше ttl считаются устаревшими и перепроверяются, а при
+    превышении max_bytes вытесняются давно не использованные страницы.
+    Время обращения хранится с точностью access_resolution секунд, чтобы
+    попадание в кэш не было записью в базу на каждый запрос.
+    """
+    def __init__(self, path=Config.PAGE_CACHE_PATH, ttl=Config.PAGE_CACHE_TTL,
+                 max_bytes=Config.PAGE_CACHE_MAX_BYTES,
+                 access_resolution=Config.PAGE_CACHE_ACCESS_RESOLUTION):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.access_resolution = access_resolution
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                content_type TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL,
+                accessed_at REAL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_pages_accessed_at ON pages (accessed_at)')
+        self._conn.commit()
+        # Размер кэша считается один раз при открытии и дальше ведется при записи
+        self._total = self._sum_sizes()
+
+    def get(self, url):
+        """Запись кэша для URL или None"""
+        key = normalize_url(url)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT body, content_type, etag, last_modified, fetched_at, accessed_at FROM pages WHERE url = ?',
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if row[5] is None or now - row[5] >= self.access_resolution:
+                self._conn.execute('UPDATE pages SET accessed_at = ? WHERE url = ?', (now, key))
+                self._conn.commit()
+
+        return CachedPage(zlib.decompress(row[0]), *row[1:5])
+
+    def is_fresh(self, entry):
+        """Можно ли отдать запись без обращения к сети"""
+        return time.time() - entry.fetched_at < self.ttl
+
+    def put(self, url, body, content_type=None, etag=None, last_modified=None):
+        """Сохранение ответа и вытеснение старых записей при переполнении"""
+        compressed = zlib.compress(body)
+        now = time.time()
+        key = normalize_url(url)
+        with self._lock:
+            previous = self._conn.execute('SELECT size FROM pages WHERE url = ?', (key,)).fetchone()
+            self._conn.execute('''
+                INSERT OR REPLACE INTO pages (url, body, size, content_type, etag, last_modified, fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (key, compressed, len(compressed), content_type, etag, last_modified, now, now))
+            self._total += len(compressed) - (previous[0] if previous else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def touch(self, url):
+        """Продление свежести записи после ответа 304 Not Modified"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?',
+                (now, now, normalize_url(url))
+            )
+            self._conn.commit()
+
+    def _sum_sizes(self):
+        return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+
+    def _evict(self):
+        """Удаление давно не использованных страниц сверх лимита размера"""
+        # В тот же файл могут писать другие экземпляры кэша, поэтому перед
+        # вытеснением счетчик сверяется с базой
+        total = self._total = self._sum_sizes()
+        if total <= self.max_bytes:
+            return
+
+        cursor = self._conn.execute('SELECT url, size FROM pages ORDER BY accessed_at')
+        evicted = []
+        for url, size in cursor:
+            if total <= self.max_bytes:
+                break
+            evicted.append((url,))
+            total -= size
+        self._conn.executemany('DELETE FROM pages WHERE url = ?', evicted)
+        self._total = total
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
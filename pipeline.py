@@ -0,0 +1,166 @@
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from config import Config
+
+# Экстрактор в процессе CPU-этапа
+_worker_extractor = None
+
+def _init_worker(text_backend, use_structured_data):
+    """Создание экстрактора один раз на процесс; NER выполняется в родительском процессе"""
+    global _worker_extractor
+    from extractor import ProductExtractor
+    _worker_extractor = ProductExtractor(
+        use_cache=False, text_backend=text_backend, use_structured_data=use_structured_data, use_ner=False
+    )
+
+def _scan_page(html, known_hash):
+    return _worker_extractor.scan_page(html, known_hash)
+
+def _noop():
+    return None
+
+def process_context():
+    """Контекст запуска процессов разбора: forkserver, а где его нет - spawn
+
+    Процессы создаются, когда уже работают потоки загрузки, HTTP-клиента
+    и задач; fork скопировал бы захваченные ими блокировки, и дочерний
+    процесс мог бы зависнуть. forkserver и spawn запускают чистый
+    интерпретатор, состояние процесса передается через initializer.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+class Pipeline:
+    """Двухэтапная обработка URL: загрузка в потоках, разбор в процессах.
+
+    Загрузка упирается в сеть и выполняется пулом потоков с общим
+    HTTP-клиентом экстрактора. Разбор HTML и поиск товаров упираются в CPU
+    и GIL, поэтому выполняются пулом процессов. Между этапами не больше
+    cpu_queue_size страниц: когда процессы не успевают, потоки загрузки ждут
+    свободного места, а не копят страницы в памяти. Запись в базу остается
+    за вызывающим кодом, который получает результаты по submit.
+
+    known_hash(url) возвращает хеш текста URL с прошлой обработки: если текст
+    не изменился, поиск товаров пропускается и результат получает статус unchanged.
+
+    Этап NER (если он включен у экстрактора) выполняется не в процессах
+    разбора, а в этом процессе пулом потоков: модель загружается один раз,
+    а окна текста разных URL объединяются в общие пачки MicroBatcher.
+    """
+    def __init__(self, extractor, fetch_workers=Config.MAX_WORKERS, cpu_workers=Config.CPU_WORKERS,
+                 cpu_queue_size=None, known_hash=None):
+        self.extractor = extractor
+        self.known_hash = known_hash
+        self.fetch_workers = max(1, fetch_workers)
+        self.cpu_workers = max(1, cpu_workers)
+        self.cpu_queue_size = cpu_queue_size or self.cpu_workers * Config.CPU_QUEUE_PER_WORKER
+
+        self._cpu_slots = threading.BoundedSemaphore(self.cpu_queue_size)
+        self._fetch_pool = ThreadPoolExecutor(max_workers=self.fetch_workers, thread_name_prefix='fetch')
+        self._cpu_pool = ProcessPoolExecutor(
+            max_workers=self.cpu_workers,
+            mp_context=process_context(),
+            initializer=_init_worker,
+            initargs=(extractor.text_backend_name, extractor.use_structured_data)
+        )
+        # Страницы в очереди CPU-этапа могут ждать NER одновременно, и их окна попадают в одни пачки
+        self._ner_pool = None
+        if extractor.use_ner:
+            self._ner_pool = ThreadPoolExecutor(max_workers=self.cpu_queue_size, thread_name_prefix='ner')
+        # Процессы запускаются при первой задаче; запускаем их сразу, пока
+        # потоки загрузки еще ничего не делают
+        self._cpu_pool.submit(_noop).result()
+
+    @property
+    def window(self):
+        """Сколько URL имеет смысл держать в работе одновременно"""
+        return (self.fetch_workers + self.cpu_queue_size) * 2
+
+    def submit(self, url):
+        """Future с результатом обработки URL в формате BatchProcessor.process_url (без записи в базу)"""
+        result = Future()
+        self._fetch_pool.submit(self._fetch, url, result)
+        return result
+
+    def _fetch(self, url, result):
+        # Отмененный до начала загрузки URL не обрабатываем
+        if not result.set_running_or_notify_cancel():
+            return
+        try:
+            print(f"Обработка: {url}")
+            html = self.extractor.fetch_page(url)
+            # Хеш читается из базы, и запрос тоже может упасть (например, база заблокирована);
+            # результат нужно выставить в любом случае, иначе его ожидание зависнет
+            known_hash = self.known_hash(url) if self.known_hash else None
+        except Exception as e:
+            print(f"Ошибка при обработке {url}: {e}")
+            result.set_result({'url': url, 'status': 'error', 'error': str(e)})
+            return
+
+        # Ждем места в очереди CPU-этапа
+        self._cpu_slots.acquire()
+        try:
+            future = self._cpu_pool.submit(_scan_page, html, known_hash)
+        except Exception as e:
+            self._cpu_slots.release()
+            result.set_result({'url': url, 'status': 'error', 'error': str(e)})
+            return
+        future.add_done_callback(lambda f: self._parsed(url, f, result))
+
+    def _parsed(self, url, future, result):
+        # Разбор отменен при остановке: результат уже никто не ждет
+        if future.cancelled():
+            self._cpu_slots.release()
+            return
+        try:
+            products, digest, ner_text = future.result()
+        except Exception as e:
+            # Ошибка записывается как ошибка URL, товары прошлой обработки не трогаем
+            self._cpu_slots.release()
+            print(f"Ошибка при обработке {url}: {e}")
+            result.set_result({'url': url, 'status': 'error', 'error': str(e)})
+            return
+        if products is None:
+            self._cpu_slots.release()
+            result.set_result({'url': url, 'status': 'unchanged'})
+            return
+        if ner_text is None or self._ner_pool is None:
+            self._cpu_slots.release()
+            self._set_products(result, url, products, digest)
+            return
+
+        # Место в очереди CPU-этапа освобождается после NER, чтобы тексты не копились в памяти
+        try:
+            self._ner_pool.submit(self._add_ner, url, products, digest, ner_text, result)
+        except Exception as e:
+            self._cpu_slots.release()
+            result.set_result({'url': url, 'status': 'error', 'error': str(e)})
+
+    def _add_ner(self, url, products, digest, text, result):
+        try:
+            products = self.extractor.add_ner_products(text, products)
+        finally:
+            self._cpu_slots.release()
+        self._set_products(result, url, products, digest)
+
+    def _set_products(self, result, url, products, digest=None):
+        result.set_result({
+            'url': url,
+            'status': 'success',
+            'products_count': len(products),
+            'products': products,
+            'content_hash': digest
+        })
+
+    def close(self):
+        self._fetch_pool.shutdown(wait=True, cancel_futures=True)
+        self._cpu_pool.shutdown(wait=True, cancel_futures=True)
+        if self._ner_pool is not None:
+            self._ner_pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
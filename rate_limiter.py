@@ -0,0 +1,131 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from config import Config
+
+class HostUnavailable(Exception):
+    """Хост временно отключен предохранителем; запрос не отправлялся"""
+
+def backoff_delay(attempt, base=Config.RETRY_BACKOFF_BASE, cap=Config.RETRY_BACKOFF_MAX):
+    """Экспоненциальная задержка с полным случайным разбросом (attempt считается с 0)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def parse_retry_after(value):
+    """Секунды из заголовка Retry-After (число секунд или HTTP-дата), None если не разобрать"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+class HostLimiter:
+    """Token bucket на каждый хост.
+
+    Хост получает rate запросов в секунду с запасом burst на всплески, поэтому
+    общая скорость растет с числом разных доменов, а не ограничена одной
+    паузой на все запросы. reserve только считает ожидание, спит вызывающий
+    код, так что лимитер подходит и для потоков, и для корутин.
+    """
+    def __init__(self, rate=Config.HOST_RATE, burst=Config.HOST_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        # host -> (токены, время последнего пересчета); отрицательные токены - очередь ожидающих
+        self._buckets = {}
+
+    def _tokens(self, host, now):
+        tokens, updated = self._buckets.get(host, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+    def reserve(self, host):
+        """Забронировать запрос к хосту; возвращает, сколько секунд подождать перед ним"""
+        with self._lock:
+            now = time.monotonic()
+            tokens = self._tokens(host, now) - 1
+            self._buckets[host] = (tokens, now)
+            if len(self._buckets) > Config.HOST_LIMITER_MAX_HOSTS:
+                self._prune(now)
+        return -tokens / self.rate if tokens < 0 else 0.0
+
+    def pause(self, host, seconds):
+        """Не пускать новые запросы к хосту ближайшие seconds секунд (ответ 429/503)"""
+        with self._lock:
+            now = time.monotonic()
+            self._buckets[host] = (min(self._tokens(host, now), -seconds * self.rate), now)
+
+    def _prune(self, now):
+        # Хосты с полным запасом токенов ничем не отличаются от новых
+        idle = [host for host in self._buckets if self._tokens(host, now) >= self.burst]
+        for host in idle:
+            del self._buckets[host]
+
+class CircuitBreaker:
+    """Предохранитель на каждый хост.
+
+    После failure_threshold ошибок подряд (таймауты, обрывы соединения,
+    ответы 5xx) хост отключается на cooldown секунд, и запросы к нему сразу
+    завершаются HostUnavailable, не дожидаясь таймаута. Затем пропускается
+    один пробный запрос: успех закрывает предохранитель, ошибка снова
+    отключает хост на вдвое больший срок (до max_cooldown) со случайным разбросом.
+    """
+    def __init__(self, failure_threshold=Config.BREAKER_FAILURES, cooldown=Config.BREAKER_COOLDOWN,
+                 max_cooldown=Config.BREAKER_MAX_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+        # host -> {'failures', 'trips', 'open_until', 'probing'}
+        self._hosts = {}
+
+    def check(self, host):
+        """Проверка перед запросом; HostUnavailable, если хост отключен"""
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or not state['open_until']:
+                return
+            now = time.monotonic()
+            remaining = state['open_until'] - now
+            # Срок отключения вышел: пропускаем один пробный запрос. Если проба
+            # зависла или была отменена, через cooldown разрешаем следующую
+            if remaining <= 0 and (not state['probing'] or remaining < -self.cooldown):
+                state['probing'] = True
+                state['open_until'] = now
+                return
+        raise HostUnavailable(f"Хост {host} временно недоступен, повтор через {max(remaining, 0):.0f} с")
+
+    def record_success(self, host):
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def record_failure(self, host):
+        with self._lock:
+            state = self._hosts.setdefault(host, {'failures': 0, 'trips': 0, 'open_until': 0, 'probing': False})
+            state['failures'] += 1
+            if state['probing'] or state['failures'] >= self.failure_threshold:
+                delay = min(self.max_cooldown, self.cooldown * 2 ** state['trips'])
+                self._open(state, delay / 2 + random.uniform(0, delay / 2))
+                state['trips'] += 1
+
+    def trip(self, host, seconds):
+        """Отключить хост на заданный срок (например, по большому Retry-After)"""
+        with self._lock:
+            state = self._hosts.setdefault(host, {'failures': 0, 'trips': 0, 'open_until': 0, 'probing': False})
+            self._open(state, seconds)
+
+    def _open(self, state, seconds):
+        state['open_until'] = time.monotonic() + seconds
+        state['failures'] = 0
+        state['probing'] = False
+
+# Общие для всех экстракторов процесса лимитер и предохранитель
+default_limiter = HostLimiter()
+default_breaker = CircuitBreaker()
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from config import Config
+
+class ResultCache:
+    """LRU-кэш результатов с ограниченным временем жизни и объединением запросов.
+
+    get_or_compute для одного ключа выполняет вычисление не больше одного
+    раза одновременно: остальные вызовы с тем же ключом ждут результата
+    первого (single-flight). Успешный результат хранится ttl секунд, при
+    переполнении вытесняются давно не использованные ключи. Ошибки не
+    кэшируются, но передаются всем ожидавшим.
+    """
+    def __init__(self, ttl=Config.EXTRACT_CACHE_TTL, max_size=Config.EXTRACT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # key -> (время истечения, значение), порядок - от давно использованных к недавним
+        self._entries = OrderedDict()
+        self._in_flight = {}
+
+    def get(self, key):
+        """Значение из кэша или None"""
+        with self._lock:
+            return self._get(key, time.monotonic())
+
+    def put(self, key, value):
+        with self._lock:
+            self._put(key, value)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_or_compute(self, key, compute):
+        """Значение из кэша, из уже идущего вычисления или результат compute()"""
+        with self._lock:
+            value = self._get(key, time.monotonic())
+            if value is not None:
+                return value
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            self._put(key, value)
+        future.set_result(value)
+        return value
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def _put(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
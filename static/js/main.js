@@ -66,8 +66,10 @@ document.addEventListener('DOMContentLoaded', function() {
             // Отображаем продукты
             displayProducts(data.products);
             
-            // Обновляем статистику
-            fetchStats();
+            // Без потока событий обновляем статистику запросом
+            if (!eventsConnected) {
+                fetchStats();
+            }
         })
         .catch(error => {
             loadingDiv.classList.add('hidden');
@@ -129,33 +131,73 @@ document.addEventListener('DOMContentLoaded', function() {
         resultsDiv.appendChild(list);
     }
     
-    // Функция получения статистики
+    // Отображение статистики
+    function renderStats(data) {
+        const statsDiv = document.getElementById('stats');
+        
+        if (!data || data.length === 0) {
+            statsDiv.innerHTML = '<p>Статистика пока недоступна</p>';
+            return;
+        }
+        
+        // Создаем HTML-список
+        let html = '<ul class="stats-list">';
+        
+        data.forEach(item => {
+            html += `
+                <li>
+                    <span class="product-name">${item.name}</span>
+                    <span class="product-count">${item.count}</span>
+                </li>
+            `;
+        });
+        
+        html += '</ul>';
+        statsDiv.innerHTML = html;
+    }
+    
+    // Отображение списка недавних URL
+    function renderRecent(data) {
+        const recentDiv = document.getElementById('recent');
+        
+        if (!data || data.length === 0) {
+            recentDiv.innerHTML = '<p>История запросов пока недоступна</p>';
+            return;
+        }
+        
+        // Создаем HTML-список
+        let html = '<ul class="recent-list">';
+        
+        data.forEach(item => {
+            html += `
+                <li class="recent-item ${item.status === 'success' ? 'success' : 'error'}">
+                    <a href="#" class="url-link" data-url="${item.url}">${item.url}</a>
+                    <span class="url-count">${item.count} товаров</span>
+                </li>
+            `;
+        });
+        
+        html += '</ul>';
+        recentDiv.innerHTML = html;
+        
+        // Добавляем обработчики событий для новых ссылок
+        const newLinks = recentDiv.querySelectorAll('.url-link');
+        newLinks.forEach(link => {
+            link.addEventListener('click', function(e) {
+                e.preventDefault();
+                const url = this.getAttribute('data-url');
+                urlInput.value = url;
+                extractProducts(url);
+            });
+        });
+    }
+    
+    // Функция получения статистики (если поток событий недоступен).
+    // Сервер отвечает 304 по ETag, если данные не изменились
     function fetchStats() {
         fetch('/stats')
             .then(response => response.json())
-            .then(data => {
-                const statsDiv = document.getElementById('stats');
-                
-                if (!data || data.length === 0) {
-                    statsDiv.innerHTML = '<p>Статистика пока недоступна</p>';
-                    return;
-                }
-                
-                // Создаем HTML-список
-                let html = '<ul class="stats-list">';
-                
-                data.forEach(item => {
-                    html += `
-                        <li>
-                            <span class="product-name">${item.name}</span>
-                            <span class="product-count">${item.count}</span>
-                        </li>
-                    `;
-                });
-                
-                html += '</ul>';
-                statsDiv.innerHTML = html;
-            })
+            .then(renderStats)
             .catch(error => {
                 console.error('Error fetching stats:', error);
             });
@@ -163,45 +205,49 @@ document.addEventListener('DOMContentLoaded', function() {
         // Также обновляем список недавних URL
         fetch('/recent')
             .then(response => response.json())
-            .then(data => {
-                const recentDiv = document.getElementById('recent');
-                
-                if (!data || data.length === 0) {
-                    recentDiv.innerHTML = '<p>История запросов пока недоступна</p>';
-                    return;
-                }
-                
-                // Создаем HTML-список
-                let html = '<ul class="recent-list">';
-                
-                data.forEach(item => {
-                    html += `
-                        <li class="recent-item ${item.status === 'success' ? 'success' : 'error'}">
-                            <a href="#" class="url-link" data-url="${item.url}">${item.url}</a>
-                            <span class="url-count">${item.count} товаров</span>
-                        </li>
-                    `;
-                });
-                
-                html += '</ul>';
-                recentDiv.innerHTML = html;
-                
-                // Добавляем обработчики событий для новых ссылок
-                const newLinks = recentDiv.querySelectorAll('.url-link');
-                newLinks.forEach(link => {
-                    link.addEventListener('click', function(e) {
-                        e.preventDefault();
-                        const url = this.getAttribute('data-url');
-                        urlInput.value = url;
-                        extractProducts(url);
-                    });
-                });
-            })
+            .then(renderRecent)
             .catch(error => {
                 console.error('Error fetching recent URLs:', error);
             });
     }
     
+    // Поток событий сервера: новые данные панели и прогресс задач приходят сами,
+    // без повторных запросов /stats, /recent и /jobs
+    let eventsConnected = false;
+    const trackedJobs = {};
+    
+    if (window.EventSource) {
+        const source = new EventSource('/events');
+        
+        source.addEventListener('open', function() {
+            eventsConnected = true;
+        });
+        
+        source.addEventListener('error', function() {
+            // Браузер переподключится сам, а пока прогресс задач запрашиваем по таймеру
+            eventsConnected = false;
+            Object.keys(trackedJobs).forEach(jobId => {
+                const statusDiv = trackedJobs[jobId];
+                delete trackedJobs[jobId];
+                pollJob(jobId, statusDiv);
+            });
+        });
+        
+        source.addEventListener('data', function(e) {
+            const data = JSON.parse(e.data);
+            renderStats(data.stats);
+            renderRecent(data.recent);
+        });
+        
+        source.addEventListener('job', function(e) {
+            const job = JSON.parse(e.data);
+            const statusDiv = trackedJobs[job.id];
+            if (statusDiv && showJob(job, statusDiv)) {
+                delete trackedJobs[job.id];
+            }
+        });
+    }
+    
     // Создание тестового набора
     if (createTestSetBtn) {
         createTestSetBtn.addEventListener('click', function() {
@@ -271,6 +317,47 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Отображение состояния задачи; true, если задача завершена
+    function showJob(job, statusDiv) {
+        const finishedStates = ['done', 'failed', 'cancelled'];
+        
+        statusDiv.innerHTML = `
+            <p>Задача #${job.id}: ${job.state}</p>
+            <p>Обработано ${job.processed} из ${job.total}, ошибок: ${job.failed}</p>
+        `;
+        return finishedStates.includes(job.state);
+    }
+    
+    // Отслеживание прогресса фоновой задачи: первое состояние запрашивается,
+    // дальше обновления приходят событиями сервера, а без них - запросами по таймеру
+    function trackJob(jobId, statusDiv) {
+        pollJob(jobId, statusDiv);
+    }
+    
+    function pollJob(jobId, statusDiv) {
+        fetch(`/jobs/${jobId}`)
+            .then(response => response.json())
+            .then(job => {
+                if (job.error) {
+                    statusDiv.innerHTML = `<p>${job.error}</p>`;
+                    return;
+                }
+                
+                if (showJob(job, statusDiv)) {
+                    if (!eventsConnected) {
+                        fetchStats();
+                    }
+                } else if (eventsConnected) {
+                    trackedJobs[jobId] = statusDiv;
+                } else {
+                    setTimeout(() => pollJob(jobId, statusDiv), 2000);
+                }
+            })
+            .catch(error => {
+                console.error('Error fetching job:', error);
+            });
+    }
+    
     // Запуск пакетной обработки
     if (runBatchBtn) {
         runBatchBtn.addEventListener('click', function() {
@@ -297,13 +384,15 @@ document.addEventListener('DOMContentLoaded', function() {
                 },
                 body: JSON.stringify({ 
                     batch_size: batchSize,
-                    start_index: startIndex
+                    start_index: startIndex,
+                    incremental: document.getElementById('incremental').checked
                 })
             })
             .then(response => response.json())
             .then(data => {
                 if (data.success) {
                     alert('Пакетная обработка запущена. Это может занять некоторое время.');
+                    trackJob(data.job_id, batchStatus);
                 } else {
                     alert('Ошибка: ' + data.error);
                 }
@@ -0,0 +1,156 @@
+import html as html_lib
+import json
+import re
+from html.parser import HTMLParser
+from html_text import VOID_TAGS
+
+# Уверенность для названий из разных источников разметки
+JSON_LD_CONFIDENCE = 0.95
+MICRODATA_CONFIDENCE = 0.9
+OPEN_GRAPH_CONFIDENCE = 0.85
+
+PRODUCT_TYPES = {'Product', 'ProductGroup', 'ProductModel', 'IndividualProduct', 'SomeProducts'}
+# Ссылки на другие товары, а не на товар страницы
+RELATED_KEYS = {'isRelatedTo', 'isSimilarTo', 'isAccessoryOrSparePartFor', 'isConsumableFor'}
+OPEN_GRAPH_PRODUCT_TYPES = {'product', 'product.item', 'og:product'}
+
+JSON_LD_RE = re.compile(
+    r'<script[^>]*type\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>',
+    re.IGNORECASE | re.DOTALL
+)
+META_RE = re.compile(r'<meta\s[^>]*>', re.IGNORECASE)
+ATTR_RE = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))')
+MICRODATA_PRODUCT_RE = re.compile(r'itemtype\s*=\s*["\']?https?://schema\.org/Product\b', re.IGNORECASE)
+WHITESPACE_RE = re.compile(r'\s+')
+
+def _clean_name(name):
+    if not isinstance(name, str):
+        return ''
+    return WHITESPACE_RE.sub(' ', html_lib.unescape(name)).strip()
+
+def _is_product(node):
+    types = node.get('@type')
+    if isinstance(types, str):
+        types = [types]
+    if not isinstance(types, list):
+        return False
+    return any(isinstance(t, str) and t.rsplit('/', 1)[-1] in PRODUCT_TYPES for t in types)
+
+def _walk_json_ld(node, names):
+    """Названия всех Product в JSON-LD, включая @graph, списки и вложенные объекты"""
+    if isinstance(node, list):
+        for item in node:
+            _walk_json_ld(item, names)
+    elif isinstance(node, dict):
+        if _is_product(node):
+            names.append(_clean_name(node.get('name')))
+        for key, value in node.items():
+            if key not in RELATED_KEYS and isinstance(value, (dict, list)):
+                _walk_json_ld(value, names)
+
+def json_ld_products(html):
+    """Названия товаров из блоков application/ld+json"""
+    names = []
+    for match in JSON_LD_RE.finditer(html):
+        try:
+            # strict=False пропускает переводы строк внутри строк, частые в темах Shopify
+            data = json.loads(match.group(1), strict=False)
+        except ValueError:
+            continue
+        _walk_json_ld(data, names)
+    return names
+
+def open_graph_products(html):
+    """og:title, если og:type указывает на страницу товара"""
+    properties = {}
+    for tag in META_RE.findall(html):
+        attrs = {}
+        for name, *values in ATTR_RE.findall(tag):
+            attrs[name.lower()] = next((v for v in values if v), '')
+        key = attrs.get('property') or attrs.get('name')
+        if key and key.lower() in ('og:title', 'og:type') and key.lower() not in properties:
+            properties[key.lower()] = attrs.get('content', '')
+
+    if properties.get('og:type', '').strip().lower() not in OPEN_GRAPH_PRODUCT_TYPES:
+        return []
+    return [_clean_name(properties.get('og:title'))]
+
+class _MicrodataParser(HTMLParser):
+    """Значения itemprop="name", принадлежащие ближайшему itemscope типа Product"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.names = []
+        # Для каждого открытого тега: (имя, открывает ли он itemscope, собирается ли в нем название)
+        self._stack = []
+        self._scopes = []
+        self._capture = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        in_product = bool(self._scopes) and self._scopes[-1]
+
+        captures = False
+        if in_product and 'name' in (attrs.get('itemprop') or '').split():
+            if attrs.get('content'):
+                self.names.append(_clean_name(attrs['content']))
+            elif self._capture is None and tag not in VOID_TAGS:
+                self._capture = []
+                captures = True
+
+        if tag in VOID_TAGS:
+            return
+
+        opens_scope = 'itemscope' in attrs
+        if opens_scope:
+            itemtype = attrs.get('itemtype') or ''
+            self._scopes.append(any(t.rsplit('/', 1)[-1] in PRODUCT_TYPES for t in itemtype.split()))
+        self._stack.append((tag, opens_scope, captures))
+
+    def handle_endtag(self, tag):
+        if not any(name == tag for name, _, _ in self._stack):
+            return
+        while self._stack:
+            name, opens_scope, captures = self._stack.pop()
+            if opens_scope:
+                self._scopes.pop()
+            if captures:
+                self.names.append(_clean_name(''.join(self._capture)))
+                self._capture = None
+            if name == tag:
+                return
+
+    def handle_data(self, data):
+        if self._capture is not None:
+            self._capture.append(data)
+
+def microdata_products(html):
+    """Названия товаров из микроразметки schema.org/Product"""
+    # Полный разбор нужен только страницам, где такая разметка вообще есть;
+    # поиск подстроки намного дешевле регулярного выражения без учета регистра
+    if 'itemscope' not in html or not MICRODATA_PRODUCT_RE.search(html):
+        return []
+    parser = _MicrodataParser()
+    parser.feed(html)
+    parser.close()
+    return parser.names
+
+def find_structured_products(html, limit=20):
+    """Товары из структурированных данных страницы.
+
+    Источники проверяются от самого точного к наименее точному: JSON-LD,
+    микроразметка, OpenGraph. Используется первый, в котором нашлись
+    товары; пустой список значит, что структурированных данных о товарах нет.
+    """
+    sources = (
+        (json_ld_products, JSON_LD_CONFIDENCE),
+        (microdata_products, MICRODATA_CONFIDENCE),
+        (open_graph_products, OPEN_GRAPH_CONFIDENCE)
+    )
+    for find_names, confidence in sources:
+        unique_names = {}
+        for name in find_names(html):
+            if len(name) > 3:
+                unique_names.setdefault(name.lower(), name)
+        if unique_names:
+            return [{'name': name, 'confidence': confidence} for name in list(unique_names.values())[:limit]]
+    return []
@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+# Модули проекта лежат в корне репозитория
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from database import Database
+
+@pytest.fixture
+def database(tmp_path):
+    """Пустая база во временной папке"""
+    database = Database(str(tmp_path / 'products.db'))
+    yield database
+    database.close()
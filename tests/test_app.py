@@ -0,0 +1,56 @@
+import threading
+import time
+import pytest
+from config import Config
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    # Приложение открывает базу при импорте, поэтому путь подменяется до него
+    database_path = Config.DATABASE_PATH
+    Config.DATABASE_PATH = str(tmp_path_factory.mktemp('app') / 'products.db')
+    import app
+    app.extractor.client.cache = None
+    yield app
+    app.jobs.shutdown()
+    Config.DATABASE_PATH = database_path
+
+def test_coalesced_extract_failure_recorded_once(app_module, monkeypatch):
+    """Ошибку общего извлечения записывает ведущий запрос, а не каждый ожидавший его"""
+    errors = []
+
+    def failing_extract(url):
+        # Даем остальным запросам присоединиться к идущему извлечению
+        time.sleep(0.3)
+        raise Exception('Error scraping URL: timeout')
+
+    monkeypatch.setattr(app_module.extractor, 'extract_products', failing_extract)
+    monkeypatch.setattr(app_module.db, 'save_error', lambda url, message: errors.append((url, message)))
+
+    responses = []
+
+    def post():
+        client = app_module.app.test_client()
+        responses.append(client.post('/extract', json={'url': 'https://shop.example/sofa'}))
+
+    threads = [threading.Thread(target=post) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response.status_code for response in responses] == [500] * 3
+    assert errors == [('https://shop.example/sofa', 'Error scraping URL: timeout')]
+
+def test_events_unsubscribes_client_closed_before_streaming(app_module):
+    with app_module.app.test_request_context('/events'):
+        response = app_module.stream_events()
+        assert app_module.events.has_subscribers()
+
+        # Клиент отключился до того, как поток начали читать
+        response.close()
+    assert not app_module.events.has_subscribers()
+
+def test_search_reports_ranked_limit(app_module):
+    response = app_module.app.test_client().get('/search?q=sofa')
+    assert response.status_code == 200
+    assert response.get_json()['max_results'] == Config.SEARCH_MAX_CANDIDATES
@@ -0,0 +1,25 @@
+from batch_processor import BatchProcessor
+from frontier import Frontier
+
+FRESH = 'https://shop.example/sofa'
+NEW = 'https://shop.example/chair'
+
+def frontier_states(frontier):
+    return dict(frontier._conn.execute('SELECT url, state FROM frontier'))
+
+def test_incremental_marks_skipped_frontier_urls_done(tmp_path):
+    """URL фронтира, пропущенные инкрементальным режимом, не возвращаются в очередь"""
+    frontier = Frontier(str(tmp_path / 'frontier.db'))
+    processor = BatchProcessor(None, str(tmp_path / 'products.db'), frontier=frontier)
+    processor.process_url = lambda url, writer=None: {'url': url, 'status': 'unchanged'}
+    try:
+        frontier.add([FRESH, NEW])
+        processor.database.save_products(FRESH, [{'name': 'Sofa Oslo', 'confidence': 0.9}])
+
+        results = processor.process_batch(incremental=True)
+
+        assert [result['url'] for result in results] == [NEW]
+        assert frontier_states(frontier) == {FRESH: 'done', NEW: 'done'}
+    finally:
+        processor.close()
+        frontier.close()
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+URL = 'https://shop.example/sofa'
+
+def product_names(database, url):
+    cursor = database._get_connection().cursor()
+    cursor.execute('SELECT product_name FROM products WHERE url = ? ORDER BY id', (url,))
+    return [row[0] for row in cursor.fetchall()]
+
+def url_status(database, url):
+    cursor = database._get_connection().cursor()
+    cursor.execute('SELECT status, products_count, error_message FROM url_status WHERE url = ?', (url,))
+    return cursor.fetchone()
+
+def content_hash(database, url):
+    cursor = database._get_connection().cursor()
+    cursor.execute('SELECT content_hash FROM url_status WHERE url = ?', (url,))
+    return cursor.fetchone()[0]
+
+def save_sofas(database):
+    database.save_products(URL, [
+        {'name': 'Sofa Oslo', 'confidence': 0.9},
+        {'name': 'Corner sofa Milan', 'confidence': 0.7}
+    ], content_hash='hash-1')
+
+def test_error_keeps_products(database):
+    """Ошибка загрузки не удаляет товары прошлой обработки"""
+    save_sofas(database)
+    database.save_results([(URL, None, 'Error scraping URL: timeout')])
+
+    assert product_names(database, URL) == ['Sofa Oslo', 'Corner sofa Milan']
+    assert url_status(database, URL) == ('error', 2, 'Error scraping URL: timeout')
+
+def test_error_keeps_hash(database):
+    """Ошибка загрузки не сбрасывает хеш текста, но URL с ошибкой обрабатывается заново"""
+    save_sofas(database)
+    database.save_error(URL, 'timeout')
+
+    assert content_hash(database, URL) == 'hash-1'
+    assert database.get_content_hash(URL) == 'hash-1'
+    assert database.filter_pending_urls([URL], datetime.now() - timedelta(days=1)) == [URL]
+
+def test_unchanged_after_error_restores_success(database):
+    save_sofas(database)
+    database.save_error(URL, 'timeout')
+    database.save_results([(URL, None)])
+
+    assert product_names(database, URL) == ['Sofa Oslo', 'Corner sofa Milan']
+    assert url_status(database, URL) == ('success', 2, None)
+    assert content_hash(database, URL) == 'hash-1'
+
+def test_new_products_replace_previous_in_search(database):
+    save_sofas(database)
+    database.save_results([(URL, [{'name': 'Armchair Bergamo', 'confidence': 0.8}], 'hash-2')])
+
+    assert product_names(database, URL) == ['Armchair Bergamo']
+    # Из полнотекстового индекса прежние названия тоже удалены
+    assert database.search_products('sofa') == []
+    assert [product['name'] for product in database.search_products('armchair')] == ['Armchair Bergamo']
+
+def test_search_pages_end_at_candidates(database):
+    """Постранично доступны только candidates самых новых совпадений"""
+    database.save_results([
+        (f'https://shop.example/sofa-{i}', [{'name': f'Sofa Oslo {i}', 'confidence': 0.9}], None)
+        for i in range(5)
+    ])
+
+    newest = database.search_products('sofa', limit=10, candidates=3)
+    assert sorted(product['name'] for product in newest) == ['Sofa Oslo 2', 'Sofa Oslo 3', 'Sofa Oslo 4']
+    assert database.search_products('sofa', limit=10, offset=3, candidates=3) == []
@@ -0,0 +1,62 @@
+import asyncio
+import os
+import sys
+import pytest
+from extractor import ProductExtractor
+from http_client import PageRejected
+from rate_limiter import HostLimiter
+
+# Локальный сервер страниц из бенчмарков
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from common import load_pages, serve_pages
+
+@pytest.fixture
+def site():
+    pages = load_pages()
+    base_url, stop = serve_pages(pages)
+    yield base_url, pages
+    stop()
+
+@pytest.fixture
+def extractor():
+    extractor = ProductExtractor(use_cache=False)
+    # Все страницы с одного хоста, лимит запросов к нему не должен тормозить тест
+    extractor.client.limiter = HostLimiter(rate=1e9, burst=1e9)
+    yield extractor
+    extractor.close()
+
+def test_async_scraping_matches_saved_pages(site, extractor):
+    """Одновременная загрузка всех страниц через общий пул соединений дает то же, что разбор сохраненных страниц"""
+    base_url, pages = site
+    urls = [f'{base_url}/{name}' for name in pages]
+
+    async def scrape_all():
+        texts = asyncio.gather(*(extractor.scrape_page_async(url) for url in urls))
+        products = asyncio.gather(*(extractor.extract_products_async(url) for url in urls))
+        return await texts, await products
+
+    texts, products = asyncio.run(scrape_all())
+
+    assert texts == [extractor.html_to_text(html) for html in pages.values()]
+    assert products == [extractor.extract_products_from_html(html) for html in pages.values()]
+    assert any(products)
+
+def test_async_scraping_raises_on_missing_page(site, extractor):
+    base_url, _ = site
+    with pytest.raises(Exception, match='404'):
+        asyncio.run(extractor.extract_products_async(f'{base_url}/missing.html'))
+
+def test_extractor_raises_instead_of_fallback_products(monkeypatch):
+    extractor = ProductExtractor(use_cache=False)
+
+    async def rejected(url):
+        raise PageRejected('Ответ 404 Not Found')
+
+    monkeypatch.setattr(extractor.client, 'fetch', rejected)
+    try:
+        with pytest.raises(Exception, match='404'):
+            extractor.extract_url('https://shop.example/sofa')
+        with pytest.raises(Exception, match='404'):
+            extractor.extract_products('https://shop.example/sofa')
+    finally:
+        extractor.close()
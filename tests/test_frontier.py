@@ -0,0 +1,50 @@
+import sqlite3
+from frontier import Frontier
+from url_source import url_key
+
+URLS = ['https://shop.example/sofa', 'https://shop.example/chair', 'https://other.example/bed']
+
+def test_processes_do_not_queue_same_url_twice(tmp_path):
+    """У каждого процесса свой фильтр Блума, повторы отсекает уникальный индекс"""
+    path = str(tmp_path / 'frontier.db')
+    first, second = Frontier(path), Frontier(path)
+    try:
+        assert first.add(URLS) == 3
+        assert second.add(URLS + ['https://other.example/lamp']) == 1
+        assert first.pending() == 4
+    finally:
+        first.close()
+        second.close()
+
+def test_saved_filter_covers_rows_of_other_processes(tmp_path):
+    path = str(tmp_path / 'frontier.db')
+    first, second = Frontier(path), Frontier(path)
+    second.add(URLS)
+    # Первый процесс сохраняет фильтр позже, чем второй добавил URL
+    first.close()
+    second._conn.close()
+
+    frontier = Frontier(path)
+    try:
+        assert all(url_key(url) in frontier.bloom for url in URLS)
+    finally:
+        frontier.close()
+
+def test_duplicates_removed_when_opening_old_frontier(tmp_path):
+    path = str(tmp_path / 'frontier.db')
+    Frontier(path).close()
+    conn = sqlite3.connect(path)
+    conn.execute('DROP INDEX idx_frontier_url')
+    conn.execute("INSERT INTO frontier_domains (domain, queued) VALUES ('shop.example', 3)")
+    conn.executemany("INSERT INTO frontier (domain_id, url, state) VALUES (1, ?, 'queued')", [
+        (URLS[0],), (URLS[1],), (URLS[0],)
+    ])
+    conn.commit()
+    conn.close()
+
+    frontier = Frontier(path)
+    try:
+        assert frontier.pending() == 2
+        assert sorted(frontier.take(10)) == sorted(URLS[:2])
+    finally:
+        frontier.close()
@@ -0,0 +1,64 @@
+import os
+import random
+import pytest
+from html_text import bs4_text, lxml_text, stream_text
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'pages')
+
+# Разметка, на которой потоковый разбор расходился или легко может разойтись с BeautifulSoup
+TRICKY_PAGES = {
+    'unclosed_head': '<html><head><title>Каталог</title><p>Диван "Милан" в наличии</p>',
+    'nested_skip': '<div>Стол<script>var a = "</div>";</script> обеденный</div><noscript>Включите <b>JS</b></noscript>',
+    'stray_end_tags': '<p>Кресло</span> "Бергамо"</p></div>, шкаф<br/>купе</br> и <div/>тумба<script/> белая',
+    'comments_cdata': 'Полка<!-- скрыто --><![CDATA[ навесная]]><?php echo 1 ?><!DOCTYPE html> дубовая',
+    'entities': '<p>Sofa &amp; chair&nbsp;set &#8212; &laquo;Oslo&raquo; &#x41;rmchair</p>',
+    'ruby_template': '<ruby>机<rp>(</rp><rt>tsukue</rt><rp>)</rp></ruby> table<template><p>Шаблон</p></template> lamp',
+    'whitespace': '<ul>\n  <li>  Bed   frame  </li>\r\n\t<li>Nightstand oak</li>\n</ul>\x0bend',
+    'nbsp_between_stray_tags': 'A &nbsp;</p>  </style>B',
+    'whitespace_only_strings': 'A &nbsp;</p>  </style>B<b> </b>\t<i>\xa0</i><!-- --> \n <br>  Shelf',
+    'preserved_whitespace': '<pre>  \n </pre>Bed<textarea> \t </textarea>  <pre><b> </b> &nbsp; </pre>frame',
+    'template_cdata': '<template>скрыто<![CDATA[ Стул]]></template> venskiy<rt><![CDATA[ ]]>x</rt><rp><![CDATA[ oak ]]></rp>',
+    'windows_1251': '<meta charset="windows-1251"><p>Комод с ящиками</p>'.encode('cp1251'),
+    'bom_utf8': b'\xef\xbb\xbf<p>\xd0\x9c\xd0\xb0\xd1\x82\xd1\x80\xd0\xb0\xd1\x81</p>'
+}
+
+# Фрагменты для случайной разметки
+FRAGMENTS = [
+    '<p>', '</p>', '<div>', '</div>', '<pre>', '</pre>', '<textarea>', '</textarea>', '<template>', '</template>',
+    '<rt>', '</rt>', '<rp>', '<script>', '</script>', '<style>', '</style>', '<noscript>', '</noscript>',
+    '<head>', '</head>', '<br>', '<br/>', '</br>', '<img src=x>', '<b>', '</b>', '<span/>', '<meta charset=utf-8>',
+    '<!-- c -->', '<![CDATA[ cd ]]>', '<![CDATA[  ]]>', '<!DOCTYPE html>', '<?pi x?>',
+    ' ', '  ', '\n', ' \n ', '\t', '\r\n', '\x0b', '\xa0', '&nbsp;', '&amp;', ' < ', 'a  b', 'sofa', 'Диван'
+]
+
+@pytest.mark.parametrize('name', TRICKY_PAGES)
+def test_stream_matches_bs4_on_tricky_markup(name):
+    html = TRICKY_PAGES[name]
+    assert stream_text(html) == bs4_text(html)
+
+@pytest.mark.parametrize('name', sorted(os.listdir(PAGES_DIR)))
+def test_stream_matches_bs4_on_saved_pages(name):
+    with open(os.path.join(PAGES_DIR, name), 'rb') as f:
+        html = f.read()
+    assert stream_text(html) == bs4_text(html)
+
+def test_stream_matches_bs4_on_random_markup():
+    rng = random.Random(0)
+    for _ in range(2000):
+        html = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 14)))
+        assert stream_text(html) == bs4_text(html), html
+
+# Документы, на которых lxml падал вместо возврата текста
+LXML_EDGE_PAGES = {
+    'empty': '',
+    'whitespace_only': ' \n\t',
+    'comment_only': '<!-- пусто -->',
+    'xhtml_str': '<?xml version="1.0" encoding="utf-8"?>\n<html><body><p>Sofa Oslo</p></body></html>',
+    'xhtml_bytes': '<?xml version="1.0" encoding="windows-1251"?><html><body><p>Комод</p></body></html>'.encode('cp1251')
+}
+
+@pytest.mark.parametrize('name', LXML_EDGE_PAGES)
+def test_lxml_handles_empty_and_xhtml_documents(name):
+    pytest.importorskip('lxml')
+    html = LXML_EDGE_PAGES[name]
+    assert lxml_text(html) == bs4_text(html)
@@ -0,0 +1,104 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from jobs import JobManager
+
+def wait_for_state(database, job_id, states, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = database.get_job(job_id)
+        if job['state'] in states:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Задача {job_id} в состоянии {database.get_job(job_id)['state']}, ожидалось {states}")
+
+class BlockingHandler:
+    """Обработчик задачи, работающий, пока should_stop() не вернет True"""
+    def __init__(self):
+        self.started = threading.Event()
+        self.stopped = threading.Event()
+        self.runs = 0
+
+    def __call__(self, job, on_progress, should_stop):
+        self.runs += 1
+        self.started.set()
+        while not should_stop():
+            time.sleep(0.01)
+        self.stopped.set()
+
+def test_cancel_queued_job(database):
+    manager = JobManager(database, handlers={'batch': BlockingHandler()})
+    job_id = database.create_job('batch', {})
+
+    assert manager.cancel(job_id)
+    assert database.get_job(job_id)['state'] == 'cancelled'
+    # Завершенную задачу отменить нельзя, и взять ее в работу тоже
+    assert not manager.cancel(job_id)
+    assert not database.claim_job(job_id)
+
+def test_cancel_running_job(database):
+    handler = BlockingHandler()
+    manager = JobManager(database, handlers={'batch': handler})
+    try:
+        job_id = manager.submit('batch', {})
+        assert handler.started.wait(10)
+        assert database.get_job(job_id)['state'] == 'running'
+
+        assert manager.cancel(job_id)
+        assert handler.stopped.wait(10)
+        # Обработчик вернулся без ошибки, но итог задачи - cancelled, а не done
+        assert wait_for_state(database, job_id, ('cancelled', 'done'))['state'] == 'cancelled'
+    finally:
+        manager.shutdown()
+
+def test_requeue_stale_jobs(database):
+    running = database.create_job('batch', {})
+    cancelling = database.create_job('batch', {})
+    fresh = database.create_job('batch', {})
+    for job_id in (running, cancelling, fresh):
+        assert database.claim_job(job_id)
+    database.update_job(cancelling, state='cancelling')
+
+    # Задачи без обновлений с момента stale_before считаются прерванными перезапуском;
+    # сигнал жизни задачи (touch_job) это время сдвигает
+    stale_before = datetime.now()
+    time.sleep(0.01)
+    database.touch_job(fresh)
+    assert database.requeue_stale_jobs(stale_before) == 1
+    assert database.get_job(running)['state'] == 'queued'
+    assert database.get_job(cancelling)['state'] == 'cancelled'
+    assert database.get_job(fresh)['state'] == 'running'
+
+def test_requeued_job_stops_and_keeps_queued_state(database):
+    """Задача, возвращенная в очередь во время выполнения, останавливается и не получает итог done"""
+    handler = BlockingHandler()
+    manager = JobManager(database, handlers={'batch': handler})
+    try:
+        job_id = manager.submit('batch', {})
+        assert handler.started.wait(10)
+
+        database.requeue_stale_jobs(datetime.now() + timedelta(seconds=1))
+        assert handler.stopped.wait(10)
+        manager.shutdown()
+        manager._executor.shutdown(wait=True)
+
+        assert database.get_job(job_id)['state'] == 'queued'
+        assert not database.finish_job(job_id, 'done')
+    finally:
+        manager.shutdown()
+
+def test_requeued_job_runs_again(database):
+    handler = BlockingHandler()
+    manager = JobManager(database, handlers={'batch': handler})
+    job_id = database.create_job('batch', {})
+    assert database.claim_job(job_id)
+    database.requeue_stale_jobs(datetime.now() + timedelta(seconds=1))
+    try:
+        # Подхват очереди при старте, как после перезапуска процесса
+        manager._sweep()
+        assert handler.started.wait(10)
+        assert manager.cancel(job_id)
+        assert wait_for_state(database, job_id, ('cancelled', 'done'))['state'] == 'cancelled'
+        assert handler.runs == 1
+    finally:
+        manager.shutdown()
@@ -0,0 +1,27 @@
+import os
+import sys
+import pytest
+from extractor import ProductExtractor
+
+# Исходный перебор ключевых слов и тексты страниц берутся из бенчмарка
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from bench_matcher import build_texts, reference_find_products
+from common import PAGES_DIR
+
+@pytest.fixture(scope='module')
+def extractor():
+    extractor = ProductExtractor(use_cache=False)
+    yield extractor
+    extractor.close()
+
+@pytest.fixture(scope='module')
+def texts(extractor):
+    return build_texts(extractor)
+
+@pytest.mark.parametrize('name', sorted(name for name in os.listdir(PAGES_DIR) if name.endswith('.html')) + [
+    'catalog_x50', 'sparse_catalog'
+])
+def test_matcher_matches_reference_scan(extractor, texts, name):
+    """Поиск за один проход по тексту дает те же товары, что исходный перебор по словам"""
+    text = texts[name]
+    assert extractor._find_products_in_text(text) == reference_find_products(extractor.furniture_keywords, text)
@@ -0,0 +1,33 @@
+import gzip
+import json
+import os
+from extractor import ProductExtractor
+from metrics import Evaluator
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'pages')
+
+def test_offline_evaluation_matches_extractor(tmp_path):
+    """Офлайн-оценка в процессах разбора находит те же товары, что экстрактор в этом процессе"""
+    extractor = ProductExtractor(use_cache=False)
+    test_set = []
+    os.makedirs(tmp_path / 'snapshots')
+    for name in sorted(os.listdir(PAGES_DIR)):
+        with open(os.path.join(PAGES_DIR, name), 'rb') as f:
+            html = f.read()
+        with gzip.open(tmp_path / 'snapshots' / (name + '.gz'), 'wb') as f:
+            f.write(html)
+        products = [product['name'] for product in extractor.extract_products_from_html(html)]
+        test_set.append({'url': f'https://shop.example/{name}', 'products': products,
+                         'snapshot': os.path.join('snapshots', name + '.gz')})
+    with open(tmp_path / 'test_set.json', 'w', encoding='utf-8') as f:
+        json.dump(test_set, f, ensure_ascii=False)
+
+    try:
+        metrics = Evaluator(str(tmp_path / 'test_set.json')).evaluate_model(extractor, workers=2)
+    finally:
+        extractor.close()
+
+    assert metrics['mode'] == 'offline'
+    assert [result['status'] for result in metrics['url_results']] == ['success'] * len(test_set)
+    assert all(result['correct_count'] == result['true_count'] == result['predicted_count']
+               for result in metrics['url_results'])
@@ -0,0 +1,32 @@
+import os
+from page_cache import PageCache
+
+def pages(cache):
+    return [row[0] for row in cache._conn.execute('SELECT url FROM pages ORDER BY url')]
+
+def test_evicts_least_recently_used_over_limit(tmp_path):
+    body = os.urandom(1000)
+    cache = PageCache(str(tmp_path / 'cache.db'), max_bytes=2500, access_resolution=0)
+    try:
+        cache.put('https://shop.example/a', body)
+        cache.put('https://shop.example/b', body)
+        # Повторная запись того же URL не увеличивает размер кэша
+        cache.put('https://shop.example/b', body)
+        assert cache.get('https://shop.example/a').body == body
+        cache.put('https://shop.example/c', body)
+
+        assert pages(cache) == ['https://shop.example/a', 'https://shop.example/c']
+        assert cache._total == cache._sum_sizes()
+    finally:
+        cache.close()
+
+def test_hit_updates_access_time_once_per_resolution(tmp_path):
+    cache = PageCache(str(tmp_path / 'cache.db'), access_resolution=60)
+    try:
+        cache.put('https://shop.example/a', b'<p>Sofa</p>')
+        changes = cache._conn.total_changes
+        for _ in range(3):
+            assert cache.get('https://shop.example/a').body == b'<p>Sofa</p>'
+        assert cache._conn.total_changes == changes
+    finally:
+        cache.close()
@@ -0,0 +1,35 @@
+from extractor import ProductExtractor
+from pipeline import Pipeline
+
+URL = 'https://shop.example/sofa'
+
+def test_pipeline_reports_fetch_error(monkeypatch):
+    extractor = ProductExtractor(use_cache=False)
+
+    def timeout(url):
+        raise TimeoutError('timeout')
+
+    monkeypatch.setattr(extractor, 'fetch_page', timeout)
+    try:
+        with Pipeline(extractor, fetch_workers=1, cpu_workers=1) as pipeline:
+            result = pipeline.submit(URL).result(timeout=60)
+    finally:
+        extractor.close()
+
+    assert result == {'url': URL, 'status': 'error', 'error': 'timeout'}
+
+def test_known_hash_error_resolves_result():
+    """Ошибка чтения хеша из базы становится ошибкой URL, а не зависшим результатом"""
+    extractor = ProductExtractor(use_cache=False)
+    extractor.fetch_page = lambda url: '<p>Sofa Oslo in grey</p>'
+
+    def known_hash(url):
+        raise RuntimeError('database is locked')
+
+    try:
+        with Pipeline(extractor, fetch_workers=1, cpu_workers=1, known_hash=known_hash) as pipeline:
+            result = pipeline.submit(URL).result(timeout=60)
+    finally:
+        extractor.close()
+
+    assert result == {'url': URL, 'status': 'error', 'error': 'database is locked'}
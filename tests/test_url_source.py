@@ -0,0 +1,22 @@
+import gzip
+from timings import registry
+from url_source import _dedupe_capacity, iter_urls
+
+URLS = ['https://shop.example/sofa', 'https://shop.example/chair', 'https://shop.example/sofa',
+        'shop.example/chair', 'https://other.example/bed']
+
+def duplicates():
+    return registry.snapshot()['counters'].get('url_source.duplicates', 0)
+
+def test_filter_sized_by_file_and_duplicates_counted(tmp_path):
+    path = tmp_path / 'urls.txt.gz'
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write('\n'.join(URLS * 2000))
+
+    # Емкость фильтра - по размеру распакованного текста, а не по URL_DEDUPE_CAPACITY
+    assert 2000 <= _dedupe_capacity(str(path)) <= 10000
+
+    before = duplicates()
+    urls = list(iter_urls(str(path)))
+    assert urls == ['https://shop.example/sofa', 'https://shop.example/chair', 'https://other.example/bed']
+    assert duplicates() - before == len(URLS) * 2000 - 3
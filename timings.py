@@ -0,0 +1,190 @@
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from config import Config
+
+# Границы корзин гистограммы времени этапов (секунды)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class StageStats:
+    """Число вызовов, суммарное и максимальное время и гистограмма одного этапа"""
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        # Последняя корзина - все, что дольше BUCKETS[-1]
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def quantile(self, q):
+        """Оценка квантиля по гистограмме (верхняя граница корзины)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+class Registry:
+    """Таймеры этапов и счетчики в памяти процесса"""
+    def __init__(self, enabled=Config.TIMINGS_ENABLED):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = Counter()
+
+    def observe(self, stage, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats()
+            stats.observe(seconds)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] += value
+
+    @contextmanager
+    def timed(self, stage):
+        """Замер времени блока кода (работает и вокруг await)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        """Состояние для JSON: этапы в миллисекундах и счетчики"""
+        with self._lock:
+            stages = {
+                stage: {
+                    'count': stats.count,
+                    'total_ms': round(stats.total * 1000, 3),
+                    'avg_ms': round(stats.total / stats.count * 1000, 3) if stats.count else 0,
+                    'p50_ms': round(stats.quantile(0.5) * 1000, 3),
+                    'p99_ms': round(stats.quantile(0.99) * 1000, 3),
+                    'max_ms': round(stats.max * 1000, 3),
+                    'histogram': dict(zip([str(b) for b in BUCKETS] + ['+Inf'], stats.buckets))
+                }
+                for stage, stats in sorted(self._stages.items())
+            }
+            return {
+                'uptime_seconds': round(time.time() - self.started_at, 1),
+                'stages': stages,
+                'counters': dict(sorted(self._counters.items()))
+            }
+
+    def prometheus(self, prefix='furniture'):
+        """Состояние в текстовом формате Prometheus"""
+        with self._lock:
+            stages = sorted(self._stages.items())
+            counters = sorted(self._counters.items())
+
+        lines = [
+            f'# HELP {prefix}_stage_seconds Время этапов обработки',
+            f'# TYPE {prefix}_stage_seconds histogram'
+        ]
+        for stage, stats in stages:
+            cumulative = 0
+            for bound, n in zip(list(BUCKETS) + ['+Inf'], stats.buckets):
+                cumulative += n
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats.total:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats.count}')
+
+        lines.append(f'# HELP {prefix}_events_total Счетчики байтов, строк и событий')
+        lines.append(f'# TYPE {prefix}_events_total counter')
+        for name, value in counters:
+            lines.append(f'{prefix}_events_total{{name="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+class SamplingProfiler:
+    """Выборочный профилировщик одного потока.
+
+    Фоновый поток раз в interval секунд снимает стек целевого потока через
+    sys._current_frames() и считает одинаковые стеки. Накладные расходы не
+    зависят от числа вызовов функций, поэтому его можно включать на живом
+    запросе.
+    """
+    def __init__(self, thread_id=None, interval=Config.PROFILER_INTERVAL, max_depth=40):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = None
+        self._started = None
+        self.duration = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+        return self
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename.rsplit("/", 1)[-1]}:{frame.f_lineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def report(self, top=20):
+        """Самые частые стеки (формат collapsed stacks) и функции на вершине стека"""
+        leaves = Counter()
+        for stack, n in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += n
+        return {
+            'duration_ms': round(self.duration * 1000, 3),
+            'samples': self.samples,
+            'interval_ms': self.interval * 1000,
+            'top_functions': leaves.most_common(top),
+            'top_stacks': self.stacks.most_common(top)
+        }
+
+# Общий реестр процесса
+registry = Registry()
+timed = registry.timed
+count = registry.count
+observe = registry.observe
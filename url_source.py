@@ -0,0 +1,109 @@
+import csv
+import gzip
+import hashlib
+import io
+import os
+import random
+import struct
+from itertools import islice
+from bloom import BloomFilter
+from config import Config
+from timings import count
+from url_utils import normalize_url
+
+# Колонка с URL в исходном URL_list.csv
+URL_COLUMN = 'max(page)'
+
+def _open_text(path):
+    """Открытие файла как текста, .gz распаковывается на лету"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return io.open(path, 'r', encoding='utf-8', newline='')
+
+def _iter_raw(path, column):
+    """Сырые строки URL из CSV (по колонке column или первой) или текстового файла"""
+    name = path[:-3] if path.endswith('.gz') else path
+
+    with _open_text(path) as f:
+        if name.endswith('.csv'):
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            if column in header:
+                index = header.index(column)
+            else:
+                # Файл без заголовка: первая строка - уже URL
+                index = 0
+                if header and '.' in header[0]:
+                    yield header[0]
+            for row in reader:
+                if len(row) > index:
+                    yield row[index]
+        else:
+            for line in f:
+                yield line
+
+def _text_size(path):
+    """Размер текста файла в байтах; для .gz - из поля ISIZE в конце файла"""
+    size = os.path.getsize(path)
+    if path.endswith('.gz') and size >= 18:
+        with open(path, 'rb') as f:
+            f.seek(-4, os.SEEK_END)
+            # ISIZE хранит размер по модулю 2**32, поэтому для очень больших файлов
+            # оценка может оказаться меньше сжатого размера; тогда берем сжатый
+            size = max(size, struct.unpack('<I', f.read(4))[0])
+    return size
+
+def _dedupe_capacity(path):
+    """Число URL для фильтра повторов: оценка сверху по размеру файла"""
+    return max(1000, min(Config.URL_DEDUPE_CAPACITY, _text_size(path) // Config.URL_DEDUPE_BYTES_PER_URL))
+
+def url_key(url):
+    """Компактный 64-битный ключ для проверки повторов"""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big')
+
+def iter_urls(path, start=0, limit=None, column=URL_COLUMN, dedupe=True):
+    """Потоковое чтение URL из .txt, .csv или их .gz-версий.
+
+    URL нормализуются и по возможности дедуплицируются на лету; start и
+    limit отсчитываются по уже очищенному потоку. Файл целиком в память не
+    читается, а повторы проверяются фильтром Блума (как во фронтире) размером
+    по числу строк, оцененному по размеру файла. Ложное срабатывание пропускает
+    новый URL как повтор; их доля не больше URL_DEDUPE_ERROR_RATE, пока
+    уникальных URL не больше URL_DEDUPE_CAPACITY. Пропущенные URL (повторы
+    и ложные срабатывания) считаются в счетчике url_source.duplicates.
+    """
+    def cleaned():
+        seen = BloomFilter(_dedupe_capacity(path), Config.URL_DEDUPE_ERROR_RATE) if dedupe else None
+        skipped = 0
+        try:
+            for raw in _iter_raw(path, column):
+                raw = raw.strip()
+                if not raw or raw.startswith('#'):
+                    continue
+                url = normalize_url(raw)
+                # add возвращает False для ключа, который уже есть в фильтре
+                if dedupe and not seen.add(url_key(url)):
+                    skipped += 1
+                    continue
+                yield url
+        finally:
+            if skipped:
+                count('url_source.duplicates', skipped)
+                print(f"Пропущено повторов URL в {path}: {skipped}")
+
+    stop = start + limit if limit else None
+    return islice(cleaned(), start, stop)
+
+def sample_urls(urls, sample_size, rng=random):
+    """Случайная выборка из потока URL без загрузки его в память (reservoir sampling)"""
+    sample = []
+    for i, url in enumerate(urls):
+        if i < sample_size:
+            sample.append(url)
+        else:
+            j = rng.randint(0, i)
+            if j < sample_size:
+                sample[j] = url
+    return sample
@@ -0,0 +1,27 @@
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+def normalize_url(url):
+    """Приведение URL к каноническому виду для использования в качестве ключа.
+
+    Схема и хост приводятся к нижнему регистру, порт по умолчанию и
+    фрагмент отбрасываются, пустой путь заменяется на '/', параметры
+    запроса сортируются.
+    """
+    url = url.strip()
+    if not url.lower().startswith(('http://', 'https://')):
+        url = 'https://' + url
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+
+    port = parts.port
+    if port and port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{port}'
+
+    path = parts.path or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+
+    return urlunsplit((scheme, host, path, query, ''))